@@ -0,0 +1,168 @@
+# admission.py
+# Athena CAP Bridge – FalconForgeAI Implementation
+# Purpose: Admission control for the CAP ingest endpoints. A bounded number
+#          of ingest requests run at once per worker and every client draws
+#          from its own token bucket; anything beyond that is answered at
+#          once with 503 / 429 and Retry-After instead of queueing until it
+#          times out. Priority routes (/health, /verify_chain, ...) are never
+#          shed, and the ingest cap leaves them threads / loop time to run.
+
+import os, json, math, time, threading
+from collections import OrderedDict
+
+ADMISSION_MAX_INFLIGHT = int(os.environ.get("ADMISSION_MAX_INFLIGHT", "16")) # per worker; 0 = no limit
+ADMISSION_RATE = float(os.environ.get("ADMISSION_RATE", "20"))              # requests/s per client; 0 = no limit
+ADMISSION_BURST = int(os.environ.get("ADMISSION_BURST", "40"))              # bucket size per client
+ADMISSION_CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER", "X-Forwarded-For")  # "" = peer address
+ADMISSION_TRUSTED_PROXIES = int(os.environ.get("ADMISSION_TRUSTED_PROXIES", "1"))     # proxies appending to it; 0 = peer address
+ADMISSION_RETRY_AFTER = 1      # seconds suggested to clients shed for lack of capacity
+ADMISSION_MAX_CLIENTS = 10000  # token buckets kept (least recently seen dropped first)
+
+# ---------------------------------------------------------------------
+# Token buckets
+# ---------------------------------------------------------------------
+class TokenBuckets:
+    """One bucket per client key: `burst` tokens, refilled at `rate` per second."""
+
+    def __init__(self, rate, burst, max_clients=None):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients or ADMISSION_MAX_CLIENTS
+        self._buckets = OrderedDict()  # client -> (tokens, last refill)
+        self._lock = threading.Lock()
+
+    def take(self, client, now=None):
+        """0.0 if a token was taken, else the seconds until the client has one."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+            self._buckets[client] = (tokens - 1 if not wait else tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+            return wait
+
+# ---------------------------------------------------------------------
+# Controller
+# ---------------------------------------------------------------------
+class Rejected:
+    """Why a request was shed: HTTP status, Retry-After seconds and a message."""
+
+    def __init__(self, status, retry_after, reason):
+        self.status = status
+        self.retry_after = retry_after
+        self.reason = reason
+
+    def body(self):
+        return json.dumps({"error": self.reason, "retry_after": self.retry_after}).encode()
+
+
+class AdmissionController:
+    """
+    Routes in `limited` are rate limited per client and capped at
+    max_inflight concurrent requests; routes in `priority` always pass.
+    Anything else passes too. admit() returns (admitted, Rejected or None);
+    an admitted request must be release()d when its response is done.
+    """
+
+    def __init__(self, limited, priority=(), max_inflight=None, rate=None, burst=None):
+        self.limited = frozenset(limited)
+        self.priority = frozenset(priority)
+        self.max_inflight = ADMISSION_MAX_INFLIGHT if max_inflight is None else max_inflight
+        rate = ADMISSION_RATE if rate is None else rate
+        self.buckets = TokenBuckets(rate, burst or ADMISSION_BURST) if rate > 0 else None
+        self._inflight = 0
+        self._lock = threading.Lock()
+        self.stats = {"admitted": 0, "priority": 0, "rate_limited": 0, "overloaded": 0}
+
+    def inflight(self):
+        return self._inflight
+
+    def admit(self, path, client):
+        if path in self.priority:
+            self.stats["priority"] += 1
+            return False, None
+        if path not in self.limited:
+            return False, None
+        if self.buckets is not None:
+            wait = self.buckets.take(client)
+            if wait:
+                self.stats["rate_limited"] += 1
+                return False, Rejected(429, max(1, math.ceil(wait)), "Rate limit exceeded for this client")
+        with self._lock:
+            if self.max_inflight and self._inflight >= self.max_inflight:
+                self.stats["overloaded"] += 1
+                return False, Rejected(503, ADMISSION_RETRY_AFTER, "Ingest is at capacity; retry shortly")
+            self._inflight += 1
+            self.stats["admitted"] += 1
+        return True, None
+
+    def release(self):
+        with self._lock:
+            self._inflight -= 1
+
+
+def client_key(header_value, peer):
+    """
+    The client address in ADMISSION_CLIENT_HEADER, else the peer address.
+    Each proxy appends the address it received from, so only the rightmost
+    ADMISSION_TRUSTED_PROXIES hops are ours (Render's proxy: the last one);
+    anything left of them came from the client and can be forged.
+    """
+    if ADMISSION_CLIENT_HEADER and ADMISSION_TRUSTED_PROXIES > 0 and header_value:
+        hops = [h.strip() for h in header_value.split(",")]
+        if len(hops) >= ADMISSION_TRUSTED_PROXIES and hops[-ADMISSION_TRUSTED_PROXIES]:
+            return hops[-ADMISSION_TRUSTED_PROXIES]
+    return peer or "unknown"
+
+# ---------------------------------------------------------------------
+# Framework adapters
+# ---------------------------------------------------------------------
+def instrument_flask(flask_app, controller):
+    """Shed requests before the view runs; release the slot once the response is done."""
+    from flask import Response, g, request
+
+    @flask_app.before_request
+    def _admission_check():
+        # Repeated headers read as one list, in order, as proxies append them.
+        header = ", ".join(request.headers.getlist(ADMISSION_CLIENT_HEADER)) if ADMISSION_CLIENT_HEADER else None
+        admitted, rejected = controller.admit(request.path, client_key(header, request.remote_addr))
+        if rejected is not None:
+            return Response(rejected.body(), status=rejected.status, mimetype="application/json",
+                            headers={"Retry-After": str(rejected.retry_after)})
+        g._admitted = admitted
+
+    @flask_app.teardown_request
+    def _admission_release(exc):
+        if g.pop("_admitted", False):
+            controller.release()
+
+
+class ASGIAdmissionMiddleware:
+    """The same for an ASGI (FastAPI) app."""
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+        self.header = ADMISSION_CLIENT_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = ", ".join(v.decode("latin-1") for k, v in scope.get("headers") or () if k == self.header) \
+            if ADMISSION_CLIENT_HEADER else None
+        peer = (scope.get("client") or (None,))[0]
+        admitted, rejected = self.controller.admit(scope.get("path", ""), client_key(header, peer))
+        if rejected is not None:
+            await send({"type": "http.response.start", "status": rejected.status,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"retry-after", str(rejected.retry_after).encode())]})
+            await send({"type": "http.response.body", "body": rejected.body()})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if admitted:
+                self.controller.release()
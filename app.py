@@ -2,41 +2,224 @@
 # Athena CAP Bridge v3.4.1 – FalconForgeAI Implementation
 # Purpose: Securely validate CAP ledger requests against the private FalconForge Canon
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
-import os, requests, json, datetime, uvicorn
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, Response
+import os, json, hashlib, tempfile, datetime, httpx, uvicorn
+from cap_stream import iter_json_array, iter_ndjson, StreamFormatError
+from manifest_store import ManifestStore, ManifestUnavailable
+from cap_dedupe import DedupeIndex, dedupe_keys
+from response_cache import ResponseCache, cache_key
+import admission
+import telemetry
+from telemetry import span, timed
 
 # ---------------------------------------------------------------------
 #  CONFIGURATION
 # ---------------------------------------------------------------------
 GITHUB_PAT = os.getenv("GITHUB_PAT")  # read-only token set in Render
+GITHUB_API = os.getenv("GITHUB_API_URL", "https://api.github.com")
 REPO = "falconforgeai-rgb/falconforge-codex"
 CANON_PATH = "governance/canon_v3_4_1/FalconForge_Integrity_Manifest_v3.4.1.json"
+MANIFEST_TTL = float(os.getenv("MANIFEST_TTL_SECONDS", "300"))  # fresh window before revalidation
+MANIFEST_MAX_STALE = os.getenv("MANIFEST_MAX_STALE_SECONDS")    # unset = serve stale while GitHub is down; else 502 past ttl + this
 
-app = FastAPI(
-    title="Athena CAP Bridge",
-    description="Secure CAP Ledger Interface for FalconForge Canon v3.4.1",
-    version="3.4.1"
-)
+# Batch sealing (/sendcap/batch)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100000"))
+BATCH_MAX_ITEM_BYTES = int(os.getenv("BATCH_MAX_ITEM_BYTES", str(256 * 1024)))
+BATCH_SPOOL_BYTES = int(os.getenv("BATCH_SPOOL_BYTES", str(4 * 1024 * 1024)))
+BATCH_FLUSH_EVERY = 500  # result lines per spool write
+
+# Outbound HTTP pool (one per worker process)
+HTTP_TIMEOUT = httpx.Timeout(float(os.getenv("HTTP_TIMEOUT_SECONDS", "10")),
+                             connect=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "3")))
+HTTP_LIMITS = httpx.Limits(max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", "20")),
+                           max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", "10")),
+                           keepalive_expiry=30)
+
+def _http2_available():
+    """HTTP/2 needs the optional h2 package (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
 
 # ---------------------------------------------------------------------
 #  CANON FETCHER
 # ---------------------------------------------------------------------
-def fetch_manifest():
-    """Pull the latest integrity manifest from the private falconforge-codex repo."""
+manifest_store = ManifestStore(
+    url=f"{GITHUB_API}/repos/{REPO}/contents/{CANON_PATH}",
+    headers={"Authorization": f"token {GITHUB_PAT}"},
+    ttl=MANIFEST_TTL,
+    max_stale=float(MANIFEST_MAX_STALE) if MANIFEST_MAX_STALE else None,
+)
+
+# /manifest responses per manifest blob, with ETag / 304 (see response_cache.py).
+responses = ResponseCache()
+
+async def fetch_manifest():
+    """Return the integrity manifest from the in-process cache (see manifest_store.py)."""
     if not GITHUB_PAT:
         raise HTTPException(status_code=500, detail="GITHUB_PAT not configured")
+    try:
+        return await manifest_store.get()
+    except ManifestUnavailable:
+        raise HTTPException(status_code=502, detail="Failed to fetch manifest from GitHub")
+
+# ---------------------------------------------------------------------
+#  CAP SEALING
+# ---------------------------------------------------------------------
+# Sealed cap_ids (see cap_dedupe.py): a retry gets the original seal result back.
+seals = DedupeIndex("app")
 
-    headers = {"Authorization": f"token {GITHUB_PAT}"}
-    url = f"https://api.github.com/repos/{REPO}/contents/{CANON_PATH}"
+class CapRejected(ValueError):
+    """A payload failed validation against the manifest."""
 
-    r = requests.get(url, headers=headers)
-    if r.status_code != 200:
-        raise HTTPException(status_code=502, detail="Failed to fetch manifest from GitHub")
+def seal_cap(payload, expected_version):
+    """Validate one payload and return its seal result, or raise CapRejected."""
+    if not isinstance(payload, dict):
+        raise CapRejected("payload must be a JSON object")
+
+    cap_id = payload.get("cap_id")
+    if not cap_id:
+        raise CapRejected("cap_id required")
+
+    # Minimal verification: ensure schema version alignment
+    if payload.get("laurie_version") != expected_version:
+        raise CapRejected("Schema version mismatch")
+
+    return {
+        "cap_id": cap_id,
+        "status": "sealed",
+        "verified": True,
+        "domain": payload.get("domain", "Unknown"),
+        "context_mode": payload.get("context_mode", "Command"),
+        "laurie_version": expected_version,
+        "source": "falconforge-codex",
+        "timestamp": datetime.datetime.utcnow().isoformat()
+    }
+
+def replayed(earlier):
+    """An earlier seal result, returned again for a retried cap_id."""
+    return dict(earlier, replayed=True)
+
+def _remember_sealed(out, fresh):
+    """Record this chunk's seals; lines for cap_ids sealed before are marked replayed."""
+    earlier = seals.remember([(keys, result) for _, keys, result in fresh])
+    for (line, _, _), prior in zip(fresh, earlier):
+        if prior is not None:
+            line["replayed"] = True
+    return sum(prior is not None for prior in earlier)
+
+async def _seal_batch(items, expected_version, spool):
+    """
+    Seal items one by one, writing one NDJSON result line per item to
+    `spool` (flushed every BATCH_FLUSH_EVERY items). Returns the summary.
+    cap_ids sealed before (in an earlier request or this batch) count as
+    sealed and are marked "replayed".
+    """
+    digest = hashlib.sha256()
+    counts = {"received": 0, "sealed": 0, "rejected": 0, "replayed": 0}
+    out, fresh, error = [], [], None
+
+    try:
+        async for item, parse_error in items:
+            index = counts["received"]
+            if index >= BATCH_MAX_ITEMS:
+                error = f"batch limit of {BATCH_MAX_ITEMS} items exceeded; remaining items not processed"
+                break
+            counts["received"] += 1
+            cap_id = item.get("cap_id") if isinstance(item, dict) else None
+            try:
+                if parse_error:
+                    raise CapRejected(parse_error)
+                result = seal_cap(item, expected_version)
+            except CapRejected as e:
+                counts["rejected"] += 1
+                out.append({"index": index, "cap_id": cap_id, "status": "rejected", "error": str(e)})
+            else:
+                counts["sealed"] += 1
+                digest.update(str(cap_id).encode() + b"\n")
+                out.append({"index": index, "cap_id": cap_id, "status": "sealed"})
+                fresh.append((out[-1], dedupe_keys(item), result))
+            if len(out) >= BATCH_FLUSH_EVERY:
+                counts["replayed"] += _remember_sealed(out, fresh)
+                spool.write("".join(json.dumps(r) + "\n" for r in out).encode())
+                out, fresh = [], []
+    except StreamFormatError as e:
+        error = f"malformed batch body: {e}"
+
+    if out:
+        counts["replayed"] += _remember_sealed(out, fresh)
+        spool.write("".join(json.dumps(r) + "\n" for r in out).encode())
+
+    if counts["sealed"] and not counts["rejected"] and not error:
+        status = "sealed"
+    elif counts["sealed"]:
+        status = "partial"
+    else:
+        status = "rejected"
+    summary = dict(counts, status=status, laurie_version=expected_version,
+                   batch_digest="SHA256:" + digest.hexdigest(),
+                   source="falconforge-codex",
+                   timestamp=datetime.datetime.utcnow().isoformat())
+    if error:
+        summary["error"] = error
+    return summary
+
+def _stream_spool(summary, spool):
+    """Summary line first, then the spooled per-item results."""
+    try:
+        yield json.dumps({"batch": summary}) + "\n"
+        spool.seek(0)
+        while True:
+            chunk = spool.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
 
-    file_meta = r.json()
-    content = requests.get(file_meta["download_url"], headers=headers)
-    return json.loads(content.text)
+# ---------------------------------------------------------------------
+#  LIFESPAN
+# ---------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app):
+    """Open the pooled keep-alive client on startup, close it on shutdown."""
+    async with httpx.AsyncClient(http2=_http2_available(), limits=HTTP_LIMITS,
+                                 timeout=HTTP_TIMEOUT) as client:
+        manifest_store.client = client
+        yield
+    manifest_store.client = None
+
+app = FastAPI(
+    title="Athena CAP Bridge",
+    description="Secure CAP Ledger Interface for FalconForge Canon v3.4.1",
+    version="3.4.1",
+    lifespan=lifespan
+)
+
+# Admission control (see admission.py): sealing is capped per worker and rate
+# limited per client with fast 503 / 429 answers; health and metrics always run.
+admission_control = admission.AdmissionController(
+    limited={"/sendcap", "/sendcap/batch"},
+    priority={"/", "/metrics", "/manifest/cache"})
+app.add_middleware(admission.ASGIAdmissionMiddleware, controller=admission_control)
+
+# Per-route latency histograms and opt-in sampled span timing (see telemetry.py);
+# added last so it also times the requests admission control sheds.
+app.add_middleware(telemetry.ASGIMetricsMiddleware, app_name="app")
+telemetry.REGISTRY.gauge("athena_manifest_cache_age_seconds", "Age of the cached canon manifest.",
+                         fn=lambda: manifest_store.snapshot()["age_seconds"])
+telemetry.REGISTRY.gauge("athena_admission_in_flight", "Admitted ingest requests being served.",
+                         fn=admission_control.inflight)
+telemetry.REGISTRY.counter("athena_admission_total", "Admission decisions in this worker.",
+                           ("outcome",), fn=lambda: {(k,): v for k, v in admission_control.stats.items()})
+telemetry.REGISTRY.counter("athena_response_cache_total", "Cached read responses in this worker by outcome.",
+                           ("outcome",), fn=lambda: {(k,): v for k, v in responses.stats.items()})
+telemetry.REGISTRY.counter("athena_dedupe_total", "Ingest dedupe lookups in this worker by outcome.",
+                           ("outcome",), fn=lambda: {(k,): v for k, v in seals.stats.items()})
 
 # ---------------------------------------------------------------------
 #  ROUTES
@@ -47,45 +230,107 @@ def root():
     return {"status": "Athena CAP Bridge v3.4.1 Active", "timestamp": datetime.datetime.utcnow().isoformat()}
 
 @app.get("/manifest")
-def get_manifest_summary():
-    """Returns metadata summary, not full manifest (for transparency without exposure)."""
-    manifest = fetch_manifest()
-    return {
-        "version": manifest.get("version", "unknown"),
-        "modules": len(manifest.get("modules", [])),
-        "validators": manifest.get("validator_signatures", {}).keys(),
-        "timestamp": datetime.datetime.utcnow().isoformat()
-    }
+async def get_manifest_summary(request: Request):
+    """
+    Returns metadata summary, not full manifest (for transparency without exposure).
+    Built once per manifest blob; ETag / If-None-Match for pollers.
+    """
+    manifest = await fetch_manifest()
+    version = manifest_store.version()
+
+    def build():
+        summary = {
+            "version": manifest.get("version", "unknown"),
+            "modules": len(manifest.get("modules", [])),
+            "validators": list(manifest.get("validator_signatures", {}).keys()),
+            "timestamp": datetime.datetime.utcnow().isoformat()
+        }
+        return summary, 200, version
+
+    status, body, headers = responses.respond(
+        cache_key(request.url.path, request.query_params.multi_items()), version,
+        request.headers.get("if-none-match"), build)
+    return Response(content=body, status_code=status, media_type="application/json", headers=headers)
+
+@app.get("/manifest/cache")
+def get_manifest_cache_stats():
+    """Hit / miss / revalidation counters for the manifest cache."""
+    return manifest_store.snapshot()
 
 @app.post("/sendcap")
 async def send_cap(request: Request):
-    """Receives and validates a CAP ledger payload."""
-    payload = await request.json()
-    manifest = fetch_manifest()
+    """Receives and validates a CAP ledger payload; a cap_id sealed before gets its original result."""
+    body = await request.body()
+    with timed("json_parse"):
+        payload = json.loads(body)
+    keys = dedupe_keys(payload) if isinstance(payload, dict) and payload.get("cap_id") else None
+    if keys:
+        with timed("dedupe"):
+            earlier = seals.lookup(keys)
+        if earlier is not None:
+            return JSONResponse(status_code=200, content=replayed(earlier))
 
-    cap_id = payload.get("cap_id")
-    if not cap_id:
-        raise HTTPException(status_code=400, detail="cap_id required")
+    with span("manifest"):
+        manifest = await fetch_manifest()
 
-    # Minimal verification: ensure schema version alignment
+    try:
+        with span("seal"):
+            sealed = seal_cap(payload, manifest.get("version", "3.4.1"))
+    except CapRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # A concurrent request may have sealed it meanwhile: the first result wins.
+    earlier = seals.remember([(keys, sealed)])[0]
+    if earlier is not None:
+        return JSONResponse(status_code=200, content=replayed(earlier))
+    return JSONResponse(status_code=200, content=sealed)
+
+@app.post("/sendcap/batch")
+async def send_cap_batch(request: Request):
+    """
+    Validates many CAP payloads against one manifest snapshot.
+
+    Body: a JSON array (application/json) or one payload per line
+    (application/x-ndjson); both are parsed incrementally. Per-item results
+    are spooled (memory first, disk beyond BATCH_SPOOL_BYTES) and returned
+    as NDJSON: a {"batch": {...}} summary line, then one line per item,
+    {"index", "cap_id", "status": "sealed"} or {..., "status": "rejected", "error"}.
+
+    Items are sealed independently, so a rejected item never voids the
+    others. HTTP status: 200 all sealed, 207 partial, 400 nothing sealed
+    (or the body was unreadable). batch_digest seals the ordered list of
+    accepted cap_ids.
+    """
+    with span("manifest"):
+        manifest = await fetch_manifest()
     expected_version = manifest.get("version", "3.4.1")
-    if payload.get("laurie_version") != expected_version:
-        raise HTTPException(status_code=400, detail="Schema version mismatch")
-
-    # Response payload
-    return JSONResponse(
-        status_code=200,
-        content={
-            "cap_id": cap_id,
-            "status": "sealed",
-            "verified": True,
-            "domain": payload.get("domain", "Unknown"),
-            "context_mode": payload.get("context_mode", "Command"),
-            "laurie_version": expected_version,
-            "source": "falconforge-codex",
-            "timestamp": datetime.datetime.utcnow().isoformat()
-        }
-    )
+
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        items = iter_ndjson(request.stream(), BATCH_MAX_ITEM_BYTES)
+    else:
+        items = iter_json_array(request.stream(), BATCH_MAX_ITEM_BYTES)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=BATCH_SPOOL_BYTES)
+    with span("seal_batch"):
+        summary = await _seal_batch(items, expected_version, spool)
+    status_code = {"sealed": 200, "partial": 207}.get(summary["status"], 400)
+    return StreamingResponse(_stream_spool(summary, spool), status_code=status_code,
+                             media_type="application/x-ndjson")
+
+@app.get("/metrics")
+def metrics(request: Request):
+    """Prometheus text exposition for this worker (Bearer METRICS_TOKEN if set)."""
+    if not telemetry.authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return PlainTextResponse(telemetry.REGISTRY.render(), media_type=telemetry.CONTENT_TYPE)
+
+@app.get("/debug/traces")
+def debug_traces(request: Request, limit: int = 20):
+    """Most recent sampled request traces in this worker."""
+    if not telemetry.authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return {"sample_rate": telemetry.tracer.rate(), "traces": telemetry.tracer.recent_traces(limit)}
 
 # ---------------------------------------------------------------------
 #  ENTRY POINT
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+bench_app_concurrency.py
+----------------------------------------
+Load benchmark for app.py against a local stub GitHub server.
+
+Compares three request paths under the same concurrency:
+  legacy    – the pre-async handler: blocking requests.get x2 inside `async def`
+  uncached  – app.py with TTL=0 / max-stale=0, so every request awaits a
+              revalidation on the pooled async client
+  cached    – app.py with its default manifest TTL
+
+Usage: bench_app_concurrency.py [--requests N] [--concurrency C] [--latency S] [--json out.json]
+"""
+
+import argparse, asyncio, json, os, statistics, sys, threading, time, uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx, uvicorn
+from stub_servers import StubGitHub
+
+PAYLOAD = {"laurie_version": "3.4.1", "domain": "Governance", "context_mode": "Advisor"}
+
+
+def new_payload():
+    """PAYLOAD under a fresh cap_id: a repeated one is answered from the dedupe index (cap_dedupe.py)."""
+    return dict(PAYLOAD, cap_id=str(uuid.uuid4()))
+
+
+def legacy_app(github_api):
+    """The request path as it was before the async client: sync I/O on the event loop."""
+    import requests
+    from fastapi import FastAPI, Request
+
+    app = FastAPI()
+
+    @app.post("/sendcap")
+    async def send_cap(request: Request):
+        payload = await request.json()
+        r = requests.get(f"{github_api}/repos/x/y/contents/manifest.json")
+        manifest = requests.get(r.json()["download_url"]).json()
+        return {"cap_id": payload["cap_id"], "verified": payload["laurie_version"] == manifest["version"]}
+
+    return app
+
+
+def current_app(github_api, ttl, max_stale):
+    os.environ.update(GITHUB_PAT="bench", GITHUB_API_URL=github_api,
+                      MANIFEST_TTL_SECONDS=str(ttl),
+                      ADMISSION_RATE="0", ADMISSION_MAX_INFLIGHT="0")  # admission is load_admission.py's job
+    if max_stale is None:
+        os.environ.pop("MANIFEST_MAX_STALE_SECONDS", None)
+    else:
+        os.environ["MANIFEST_MAX_STALE_SECONDS"] = str(max_stale)
+    sys.modules.pop("app", None)
+    import app as app_module
+    return app_module.app
+
+
+class ServerThread:
+    """Runs one uvicorn server in a background thread."""
+
+    def __init__(self, app):
+        config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def drive(base_url, total, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await client.post("/sendcap", json=new_payload())  # warm-up
+
+        async def one():
+            async with sem:
+                t0 = time.perf_counter()
+                r = await client.post("/sendcap", json=new_payload())
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--latency", type=float, default=0.05, help="stub GitHub latency per call (s)")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    stub = StubGitHub(latency=args.latency).start()
+    results = {"stub_latency_s": args.latency, "scenarios": {}}
+    scenarios = [
+        ("legacy", lambda: legacy_app(stub.url)),
+        ("uncached", lambda: current_app(stub.url, ttl=0, max_stale=0)),
+        ("cached", lambda: current_app(stub.url, ttl=300, max_stale=None)),
+    ]
+    try:
+        for name, factory in scenarios:
+            before = dict(stub.calls)
+            with ServerThread(factory()) as base_url:
+                res = asyncio.run(drive(base_url, args.requests, args.concurrency))
+            res["github_calls"] = {k: v - before.get(k, 0) for k, v in stub.calls.items()}
+            results["scenarios"][name] = res
+            print(f"{name:9s} {res['throughput_rps']:>9.1f} req/s  p50={res['p50_ms']:>8.2f}ms  "
+                  f"p99={res['p99_ms']:>8.2f}ms  github_calls={res['github_calls']}")
+    finally:
+        stub.stop()
+
+    legacy_rps = results["scenarios"]["legacy"]["throughput_rps"]
+    for name in ("uncached", "cached"):
+        print(f"speed-up {name} vs legacy: x{results['scenarios'][name]['throughput_rps'] / legacy_rps:.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
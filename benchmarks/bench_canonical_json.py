@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+bench_canonical_json.py
+----------------------------------------
+Throughput benchmark for canonical_json.py on synthetic CAP records.
+
+Measures canonical hashing (normalize + serialize + SHA-256) through each
+serialiser — the exact stringify() fallback, the stdlib C encoder and the
+orjson fast path — next to the old
+json.dumps(sort_keys=True) hash for scale, and to normalize.js itself: one
+node process per record (how Python tooling used to re-normalize) and a
+single node process for the whole batch.
+
+Usage: bench_canonical_json.py [--records 20000] [--node-sample 20] [--json out.json]
+"""
+
+import argparse, hashlib, json, os, subprocess, sys, tempfile, time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import canonical_json
+
+NODE_BATCH = r"""
+const fs = require('fs'), path = require('path'), Module = require('module'), crypto = require('crypto');
+const file = path.resolve(process.argv[1]);
+const mod = new Module(file);
+mod.filename = file;
+mod.paths = Module._nodeModulePaths(path.dirname(file));
+mod._compile(fs.readFileSync(file, 'utf8'), file);
+const records = JSON.parse(fs.readFileSync(0, 'utf8'));
+const t0 = process.hrtime.bigint();
+for (const r of records) {
+  crypto.createHash('sha256').update(JSON.stringify(mod.exports.normalizeValue(r))).digest('hex');
+}
+process.stdout.write(String(Number(process.hrtime.bigint() - t0) / 1e9));
+"""
+
+
+def make_records(n):
+    records = []
+    for i in range(n):
+        records.append({
+            "cap_id": f"00000000-0000-4000-8000-{i:012d}",
+            "timestamp": f"2025-{1 + i % 12:02d}-01T00:00:{i % 60:02d}Z",
+            "domain": ["Governance", "Audit", "Civic Ethics"][i % 3],
+            "context_mode": "Advisor",
+            "ems": 0.84, "cw": 0.23, "ad": 0.17, "hci": 0.82, "hs": 0.9 - (i % 100) / 1000,
+            "haa": 0.93, "er_delta": 0.03 + (i % 7) / 10000,
+            "validator_ethics": "compliant", "validator_empathy": "aligned",
+            "validator_signatures": {"validator": "Athena-Audit-Core",
+                                     "ethics_signature": "%064x" % (i * 2654435761),
+                                     "empathy_signature": "%064x" % (i * 40503)},
+            "laurie_version": "v3.4",
+            "governance_chain": {"hash_prev": "SHA256:" + "%064x" % i, "hash_next": "SHA256:" + "0" * 64},
+            "reasoning_summary": f"Athena executed  standard CAP logging cycle  #{i}.\n",
+            "status": "pending",
+        })
+    return records
+
+
+def timed(fn, records):
+    t0 = time.perf_counter()
+    for r in records:
+        fn(r)
+    return time.perf_counter() - t0
+
+
+def node_per_record(records, sample):
+    """One `node` per record, normalizing through a temp file like normalize.js's CLI."""
+    harness = ("const fs=require('fs'),path=require('path'),Module=require('module');"
+               "const f=path.resolve(process.argv[1]);const m=new Module(f);m.filename=f;"
+               "m._compile(fs.readFileSync(f,'utf8'),f);"
+               "process.stdout.write(require('crypto').createHash('sha256').update("
+               "JSON.stringify(m.exports.normalizeValue(JSON.parse(fs.readFileSync(process.argv[2],'utf8')))))"
+               ".digest('hex'));")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cap.json")
+        t0 = time.perf_counter()
+        for r in records[:sample]:
+            with open(path, "w") as f:
+                json.dump(r, f)
+            subprocess.run(["node", "-e", harness, str(ROOT / "normalize.js"), path],
+                           capture_output=True, check=True)
+        return (time.perf_counter() - t0) * len(records) / sample
+
+
+def node_batch(records):
+    proc = subprocess.run(["node", "-e", NODE_BATCH, str(ROOT / "normalize.js")],
+                          input=json.dumps(records), capture_output=True, text=True, check=True)
+    return float(proc.stdout)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark canonical JSON hashing.")
+    ap.add_argument("--records", type=int, default=20000)
+    ap.add_argument("--node-sample", type=int, default=20, help="records timed for node-per-record (0 to skip)")
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args(argv)
+
+    records = make_records(args.records)
+    size = sum(len(canonical_json.canonical_bytes(r)) for r in records)
+    fast = canonical_json.orjson
+    results = {}
+
+    results["json.dumps(sort_keys) sha256 (old bridge hash)"] = timed(
+        lambda r: hashlib.sha256(json.dumps(r, sort_keys=True).encode()).hexdigest(), records)
+    results["canonical (exact stringify fallback)"] = timed(
+        lambda r: hashlib.sha256(canonical_json.stringify(canonical_json.normalize_value(r)).encode()).hexdigest(),
+        records)
+    canonical_json.orjson = None
+    results["canonical_hash (stdlib json encoder)"] = timed(canonical_json.canonical_hash, records)
+    canonical_json.orjson = fast
+    if fast is not None:
+        results["canonical_hash (orjson fast path)"] = timed(canonical_json.canonical_hash, records)
+    try:
+        results["normalize.js (one node process, in-process loop)"] = node_batch(records)
+        if args.node_sample:
+            results[f"normalize.js (node per record, extrapolated from {args.node_sample})"] = \
+                node_per_record(records, args.node_sample)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[WARN] node benchmarks skipped: {e}")
+
+    print(f"{args.records} CAP records, {size / 1e6:.1f} MB canonical JSON")
+    print(f"{'method':<62}{'records/s':>12}{'MB/s':>9}")
+    out = []
+    for name, seconds in results.items():
+        rate = args.records / seconds
+        print(f"{name:<62}{rate:>12,.0f}{size / seconds / 1e6:>9.1f}")
+        out.append({"method": name, "seconds": round(seconds, 4), "records_per_sec": round(rate, 1)})
+    if args.json:
+        Path(args.json).write_text(json.dumps({"records": args.records, "bytes": size, "results": out}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+bench_hashing.py
+----------------------------------------
+Scaling benchmark for hash_engine.py on a synthetic CAP_LOGS ledger.
+
+Generates <records> linked CAP files under <dir>/CAP_LOGS/<year>/<month>/
+with generate_ledger.py (reused if already present), then hashes the whole ledger with thread and
+process pools of 1, 2, 4, ... up to --max-jobs workers and reports files/s,
+MB/s and speed-up over a single worker. Finishes with a cold and a warm
+pass through a fresh HashCache (the warm pass only stats files).
+
+Usage: bench_hashing.py [--records 1000000] [--dir /tmp/athena_bench] [--max-jobs N] [--json out.json]
+"""
+
+import argparse, json, os, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from hash_engine import HashCache, hash_files
+from generate_ledger import MARKER, generate
+
+
+def run(paths, jobs, processes, cache=None):
+    t0 = time.perf_counter()
+    errors = 0
+    for path, digest, error in hash_files(paths, jobs=jobs, processes=processes, cache=cache):
+        errors += error is not None
+    elapsed = time.perf_counter() - t0
+    return elapsed, errors
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=1_000_000)
+    ap.add_argument("--dir", default="/tmp/athena_bench_hashing")
+    ap.add_argument("--max-jobs", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--json", help="write results to this file")
+    args = ap.parse_args()
+
+    root = Path(args.dir) / "CAP_LOGS"
+    print(f"Preparing {args.records} records under {root} ...")
+    generate(root, args.records)
+    paths = sorted(str(p) for p in root.rglob("*.json") if p.name != MARKER)
+    total_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+
+    jobs_list, j = [], 1
+    while j <= args.max_jobs:
+        jobs_list.append(j)
+        j *= 2
+    if jobs_list[-1] != args.max_jobs:
+        jobs_list.append(args.max_jobs)
+
+    results = {"records": len(paths), "megabytes": round(total_mb, 1), "cpu_count": os.cpu_count(), "runs": []}
+    baseline = None
+    for processes in (False, True):
+        for jobs in jobs_list:
+            elapsed, errors = run(paths, jobs, processes)
+            baseline = baseline or elapsed
+            row = {"pool": "process" if processes else "thread", "jobs": jobs,
+                   "seconds": round(elapsed, 3), "files_per_s": round(len(paths) / elapsed),
+                   "mb_per_s": round(total_mb / elapsed, 1), "speedup": round(baseline / elapsed, 2),
+                   "errors": errors}
+            results["runs"].append(row)
+            print(f"{row['pool']:7s} jobs={jobs:<3d} {row['seconds']:>8.2f}s  {row['files_per_s']:>9d} files/s  "
+                  f"{row['mb_per_s']:>7.1f} MB/s  x{row['speedup']}")
+
+    cache_db = Path(args.dir) / "hash_cache.sqlite3"
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(cache_db) + suffix).unlink(missing_ok=True)
+    cache = HashCache(cache_db)
+    for label in ("cold", "warm"):
+        elapsed, errors = run(paths, args.max_jobs, False, cache)
+        row = {"pool": f"cache-{label}", "jobs": args.max_jobs, "seconds": round(elapsed, 3),
+               "files_per_s": round(len(paths) / elapsed), "speedup": round(baseline / elapsed, 2),
+               "errors": errors}
+        results["runs"].append(row)
+        print(f"{row['pool']:10s} jobs={args.max_jobs:<3d} {row['seconds']:>8.2f}s  {row['files_per_s']:>9d} files/s"
+              f"  x{row['speedup']}")
+    cache.close()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+bench_suite.py
+----------------------------------------
+End-to-end benchmark suite for the CAP ledger hot paths on synthetic data.
+
+Generates (or reuses) two ledgers with generate_ledger.py — a bridge-profile
+tree for the chain / ingestion / analytics paths and a v3.5-profile tree
+for schema validation — then times:
+
+  index_rebuild         cold LedgerIndex build (rglob scan + hash of every file)
+  get_latest_cap        chain head lookup on a warm index (per call)
+  get_latest_cap_rglob  the old full-tree rglob + mtime scan, for scale (--legacy)
+  verify_full           verify_chain_integrity(full=True)
+  verify_incremental    verify_chain_integrity() with nothing new
+  cap_ingest            POST /cap through bridge.py's Flask app, one CAP per request
+  dispatch_drain        queued CAPs delivered to a stub GitHub /dispatches
+  verify_chain_poll     GET /verify_chain polled with If-None-Match, nothing new appended
+  validate_cap_payloads schema validation of the v3.5 tree
+  export_dtl            NDJSON Decision Trace Ledger export
+  civic_drift_cold      compute_civic_drift --rebuild
+  civic_drift_warm      compute_civic_drift with nothing new
+  query_index_rebuild   cap_query.py secondary indexes built from scratch
+  query                 an indexed domain + mode + month + hs threshold page (per query)
+  notify_signatures_cold  notify_missing_signatures.py --rebuild against a stub Slack webhook
+  notify_signatures_warm  notify_missing_signatures.py with nothing new
+  nightly_pipeline      scripts/nightly_pipeline.py: validate, hash, drift, signatures and export in one pass
+
+GitHub and Slack are local stub servers (stub_servers.py), so no network
+is used. Results go to JSON with the commit they were measured on;
+--compare flags anything slower than a previous run by more than
+--tolerance (exit code 1), so runs can be compared between commits.
+
+Usage: bench_suite.py [--records 10000] [--dir /tmp/athena_bench_suite] [--ingest 500]
+                      [--only NAME ...] [--legacy] [--json out.json]
+                      [--compare baseline.json] [--tolerance 0.2]
+"""
+
+import argparse, contextlib, io, json, os, platform, shutil, subprocess, sys, time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from generate_ledger import generate
+from stub_servers import StubGitHub, StubSlack
+from ledger_index import LedgerIndex
+from ledger_store import FileLedger
+
+SCHEMA = ROOT / "schemas" / "ATHENA_CAP_SCHEMA_v3_5.json"
+
+
+class Context:
+    """Paths and shared state for one suite run."""
+
+    def __init__(self, base, records, ingest, jobs):
+        self.base = Path(base)
+        self.records = records
+        self.ingest = ingest
+        self.jobs = jobs
+        self.bridge_root = self.base / f"bridge_{records}"
+        self.v35_root = self.base / f"v35_{records}"
+        self.state = self.base / "state"
+        self.ledger = None
+        self.bridge = None
+        self.github = None
+        self.slack = None
+
+    def fresh_state(self):
+        shutil.rmtree(self.state, ignore_errors=True)
+        self.state.mkdir(parents=True)
+        os.environ["LEDGER_STATE_DIR"] = str(self.state)
+
+    def open_ledger(self):
+        if self.ledger is None:
+            index = LedgerIndex(self.bridge_root, db_path=self.state / "ledger_index.sqlite3", jobs=self.jobs)
+            self.ledger = FileLedger(self.bridge_root, index=index)
+            self.ledger.verifier.checkpoint_path = self.state / "verify_checkpoint.json"
+        return self.ledger
+
+
+def quiet(fn, *args):
+    """Run fn(*args) with its stdout swallowed; returns its result."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args)
+
+# ---------------------------------------------------------------------
+# Benchmarks: each returns (seconds, items processed, extra info)
+# ---------------------------------------------------------------------
+def bench_index_rebuild(ctx):
+    t0 = time.perf_counter()
+    head = ctx.open_ledger().head()
+    return time.perf_counter() - t0, ctx.records, {"head_position": head.position if head else None}
+
+def bench_get_latest_cap(ctx):
+    ledger = ctx.open_ledger()
+    ledger.head()
+    calls = 2000
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        ledger.head()
+    return time.perf_counter() - t0, calls, {}
+
+def bench_get_latest_cap_rglob(ctx):
+    t0 = time.perf_counter()
+    latest = max(ctx.bridge_root.rglob("*.json"), key=os.path.getmtime)
+    return time.perf_counter() - t0, 1, {"latest": latest.name}
+
+def bench_verify_full(ctx):
+    ledger = ctx.open_ledger()
+    ledger.head()  # index built outside the timing, even under --only
+    t0 = time.perf_counter()
+    result = ledger.verify(full=True)
+    seconds = time.perf_counter() - t0
+    if result["status"] != "valid":
+        raise RuntimeError(f"synthetic chain did not verify: {result.get('breaks', result)[:3]}")
+    return seconds, result["checked"], {"status": result["status"]}
+
+def bench_verify_incremental(ctx):
+    ledger = ctx.open_ledger()
+    ledger.head()
+    t0 = time.perf_counter()
+    result = ledger.verify()
+    return time.perf_counter() - t0, ctx.records, {"mode": result.get("mode"), "checked": result.get("checked")}
+
+def _bridge(ctx):
+    if ctx.bridge is None:
+        ingest_root = ctx.base / "ingest"
+        shutil.rmtree(ingest_root, ignore_errors=True)
+        os.environ.update(LEDGER_PATH=str(ingest_root), LEDGER_BACKEND="files", GITHUB_PAT="bench",
+                          ADMISSION_RATE="0",  # one test client; admission is load_admission.py's job
+                          GITHUB_DISPATCH_URL=f"{ctx.github.url}/repos/x/y/dispatches")
+        ingest_root.mkdir(parents=True)
+        sys.modules.pop("bridge", None)
+        ctx.bridge = quiet(__import__, "bridge")
+    return ctx.bridge
+
+def bench_cap_ingest(ctx):
+    bridge = _bridge(ctx)
+    client = bridge.app.test_client()
+    run = f"{time.time_ns():x}"  # fresh cap_ids: the dedupe index (cap_dedupe.py) outlives the run
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(ctx.ingest):
+            r = client.post("/cap", json={"cap_id": f"bench-{run}-{i:08d}", "timestamp": "2025-06-01T00:00:00Z",
+                                          "domain": "Governance", "context_mode": "Advisor",
+                                          "reasoning_summary": "Benchmark ingestion."})
+            if r.status_code != 202:
+                raise RuntimeError(f"/cap returned {r.status_code}: {r.get_data(as_text=True)[:200]}")
+    seconds = time.perf_counter() - t0
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = client.get("/verify_chain?full=true").get_json()
+    if result["status"] != "valid":
+        raise RuntimeError(f"bridge-appended chain did not verify: {result.get('breaks', result)[:3]}")
+    return seconds, ctx.ingest, {}
+
+def bench_dispatch_drain(ctx):
+    bridge = _bridge(ctx)
+    before = ctx.github.calls.get("dispatches", 0)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bridge.dispatch.start()
+        drained = bridge.dispatch.drain(timeout=120)
+    seconds = time.perf_counter() - t0
+    return seconds, ctx.ingest, {"drained": drained,
+                                 "dispatch_calls": ctx.github.calls.get("dispatches", 0) - before}
+
+def bench_validate_cap_payloads(ctx):
+    import validate_cap_payloads
+    out = ctx.base / "validate.json"
+    argv = [str(SCHEMA), str(ctx.v35_root), "--format", "json", "--output", str(out)]
+    if ctx.jobs:
+        argv += ["--jobs", str(ctx.jobs)]
+    t0 = time.perf_counter()
+    rc = quiet(validate_cap_payloads.main, argv)
+    seconds = time.perf_counter() - t0
+    if rc:
+        raise RuntimeError(f"validate_cap_payloads reported invalid records (see {out})")
+    return seconds, ctx.records, {}
+
+def bench_export_dtl(ctx):
+    import export_dtl
+    out = ctx.base / "exports"
+    shutil.rmtree(out, ignore_errors=True)
+    t0 = time.perf_counter()
+    quiet(export_dtl.main, [str(ctx.bridge_root), str(out), "--format", "ndjson"])
+    seconds = time.perf_counter() - t0
+    size = sum(p.stat().st_size for p in out.iterdir())
+    return seconds, ctx.records, {"bytes": size}
+
+def _civic_drift(ctx, rebuild):
+    import compute_civic_drift
+    argv = [str(ctx.bridge_root), "--db", str(ctx.state / "civic_drift.sqlite3"), "--json"]
+    if rebuild:
+        argv.append("--rebuild")
+    t0 = time.perf_counter()
+    quiet(compute_civic_drift.main, argv)
+    return time.perf_counter() - t0, ctx.records, {}
+
+def bench_civic_drift_cold(ctx):
+    return _civic_drift(ctx, True)
+
+def bench_civic_drift_warm(ctx):
+    return _civic_drift(ctx, False)
+def bench_verify_chain_poll(ctx):
+    """A monitor polling /verify_chain with If-None-Match while nothing is appended."""
+    bridge = _bridge(ctx)
+    client = bridge.app.test_client()
+    polls, not_modified, etag = 200, 0, None
+    before = bridge.ledger.count()
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(polls):
+            r = client.get("/verify_chain", headers={"If-None-Match": etag} if etag else {})
+            not_modified += r.status_code == 304
+            etag = r.headers.get("ETag") or etag
+    seconds = time.perf_counter() - t0
+    return seconds, polls, {"not_modified": not_modified, "audit_caps": bridge.ledger.count() - before}
+
+def bench_query_index_rebuild(ctx):
+    from cap_query import QueryIndex
+    index = QueryIndex(db_path=ctx.state / "bench_query.sqlite3", jobs=ctx.jobs, processes=True)
+    t0 = time.perf_counter()
+    count = index.rebuild(ctx.open_ledger())
+    seconds = time.perf_counter() - t0
+    index.close()
+    return seconds, count, {}
+
+def bench_query(ctx):
+    from cap_query import QueryIndex, parse_threshold
+    index = QueryIndex(db_path=ctx.state / "bench_query.sqlite3", jobs=ctx.jobs)
+    index.sync(ctx.open_ledger())
+    thresholds = [parse_threshold("hs<0.8")]
+    calls, matched = 500, 0
+    t0 = time.perf_counter()
+    for i in range(calls):
+        rows, _ = index.query(domains=["Governance"], context_modes=["Evidence Engine"],
+                              since=f"2025-{i % 12 + 1:02d}", until=f"2025-{i % 12 + 1:02d}",
+                              thresholds=thresholds, limit=100)
+        matched += len(rows)
+    seconds = time.perf_counter() - t0
+    index.close()
+    return seconds, calls, {"rows_per_query": round(matched / calls, 1)}
+
+def _notify_signatures(ctx, rebuild):
+    before = ctx.slack.calls.get("webhook", 0)
+    env = dict(os.environ, LEDGER_PATH=str(ctx.bridge_root))
+    argv = [sys.executable, str(ROOT / "scripts" / "notify_missing_signatures.py"), ctx.slack.url,
+            "--db", str(ctx.state / "signature_scan.sqlite3")]
+    if rebuild:
+        argv.append("--rebuild")
+    if ctx.jobs:
+        argv += ["--jobs", str(ctx.jobs)]
+    t0 = time.perf_counter()
+    subprocess.run(argv, env=env, capture_output=True)
+    seconds = time.perf_counter() - t0
+    return seconds, ctx.records, {"slack_posts": ctx.slack.calls.get("webhook", 0) - before}
+
+def bench_notify_signatures_cold(ctx):
+    return _notify_signatures(ctx, True)
+
+def bench_notify_signatures_warm(ctx):
+    return _notify_signatures(ctx, False)
+
+def bench_nightly_pipeline(ctx):
+    out = ctx.base / "pipeline_exports"
+    shutil.rmtree(out, ignore_errors=True)
+    env = {k: v for k, v in os.environ.items() if k != "SLACK_WEBHOOK_URL"}
+    argv = [sys.executable, str(ROOT / "scripts" / "nightly_pipeline.py"), str(ctx.bridge_root),
+            "--stages", "validate,hash,drift,signatures,export", "--schema", str(SCHEMA),
+            "--validate-output", str(ctx.base / "pipeline_validate.txt"), "--export-dir", str(out),
+            "--export-format", "ndjson"]
+    if ctx.jobs:
+        argv += ["--jobs", str(ctx.jobs)]
+    t0 = time.perf_counter()
+    subprocess.run(argv, env=env, capture_output=True)
+    seconds = time.perf_counter() - t0
+    return seconds, ctx.records, {"bytes": sum(p.stat().st_size for p in out.iterdir())}
+
+BENCHMARKS = [
+    ("index_rebuild", bench_index_rebuild),
+    ("get_latest_cap", bench_get_latest_cap),
+    ("get_latest_cap_rglob", bench_get_latest_cap_rglob),
+    ("verify_full", bench_verify_full),
+    ("verify_incremental", bench_verify_incremental),
+    ("cap_ingest", bench_cap_ingest),
+    ("dispatch_drain", bench_dispatch_drain),
+    ("verify_chain_poll", bench_verify_chain_poll),
+    ("validate_cap_payloads", bench_validate_cap_payloads),
+    ("export_dtl", bench_export_dtl),
+    ("civic_drift_cold", bench_civic_drift_cold),
+    ("civic_drift_warm", bench_civic_drift_warm),
+    ("query_index_rebuild", bench_query_index_rebuild),
+    ("query", bench_query),
+    ("notify_signatures_cold", bench_notify_signatures_cold),
+    ("notify_signatures_warm", bench_notify_signatures_warm),
+    ("nightly_pipeline", bench_nightly_pipeline),
+]
+LEGACY = {"get_latest_cap_rglob"}
+
+# ---------------------------------------------------------------------
+# Reporting
+# ---------------------------------------------------------------------
+def run_metadata(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {"commit": commit, "dirty": dirty, "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "records": args.records, "ingest": args.ingest, "jobs": args.jobs}
+
+def compare(results, baseline_path, tolerance):
+    """Print per-benchmark change vs a previous JSON run; returns the names that regressed."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nvs {baseline_path} (commit {str(baseline['meta'].get('commit'))[:10]}, "
+          f"{baseline['meta'].get('records')} records)")
+    regressed = []
+    for name, row in results.items():
+        old = baseline["results"].get(name)
+        if not old or "per_sec" not in old or "per_sec" not in row:
+            continue
+        change = row["per_sec"] / old["per_sec"] - 1
+        mark = "✅"
+        if change < -tolerance:
+            mark = "❌"
+            regressed.append(name)
+        print(f"{mark} {name:<24}{old['per_sec']:>14,.1f} → {row['per_sec']:>14,.1f}/s  ({change:+.1%})")
+    return regressed
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the CAP ledger hot paths on a synthetic ledger.")
+    ap.add_argument("--records", type=int, default=10000)
+    ap.add_argument("--dir", default="/tmp/athena_bench_suite")
+    ap.add_argument("--ingest", type=int, default=500, help="CAPs posted to /cap")
+    ap.add_argument("--jobs", "-j", type=int, default=None, help="worker count for pooled paths")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--only", nargs="+", metavar="NAME", help="run only these benchmarks")
+    ap.add_argument("--legacy", action="store_true", help="also time the old rglob head scan")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--compare", metavar="BASELINE", help="compare against a previous --json run")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a regression")
+    args = ap.parse_args(argv)
+
+    names = [n for n, _ in BENCHMARKS]
+    for n in args.only or ():
+        if n not in names:
+            ap.error(f"unknown benchmark {n!r} (choose from {', '.join(names)})")
+    selected = [(n, fn) for n, fn in BENCHMARKS
+                if (n in args.only if args.only else n not in LEGACY or args.legacy)]
+
+    ctx = Context(args.dir, args.records, args.ingest, args.jobs)
+    ctx.base.mkdir(parents=True, exist_ok=True)
+    results = {}
+    print(f"Preparing {args.records} synthetic records under {ctx.base} ...")
+    for label, root, profile in (("generate_bridge", ctx.bridge_root, "bridge"),
+                                 ("generate_v35", ctx.v35_root, "v3.5")):
+        seconds = generate(root, args.records, profile, seed=args.seed, jobs=args.jobs)
+        if seconds:
+            results[label] = {"seconds": round(seconds, 4), "items": args.records,
+                              "per_sec": round(args.records / seconds, 1)}
+    ctx.fresh_state()
+
+    ctx.github = StubGitHub().start()
+    ctx.slack = StubSlack().start()
+    failed = []
+    try:
+        print(f"{'benchmark':<24}{'seconds':>10}{'items':>10}{'per sec':>14}")
+        for name, fn in selected:
+            try:
+                seconds, items, extra = fn(ctx)
+            except Exception as e:
+                print(f"❌ {name}: {type(e).__name__}: {e}")
+                failed.append(name)
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            row = {"seconds": round(seconds, 4), "items": items,
+                   "per_sec": round(items / seconds, 1) if seconds else None}
+            row.update(extra)
+            results[name] = row
+            print(f"{name:<24}{seconds:>10.3f}{items:>10}{row['per_sec'] or 0:>14,.1f}")
+    finally:
+        if ctx.bridge is not None:
+            ctx.bridge.dispatch.stop()
+        ctx.github.stop()
+        ctx.slack.stop()
+
+    report = {"meta": run_metadata(args), "results": results}
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.json}")
+    regressed = compare(results, args.compare, args.tolerance) if args.compare else []
+    if regressed:
+        print(f"❌ {len(regressed)} regression(s) beyond {args.tolerance:.0%}: {', '.join(regressed)}")
+    return 1 if failed or regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
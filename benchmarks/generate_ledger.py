@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+generate_ledger.py
+----------------------------------------
+Synthetic CAP ledger generator for the benchmarks (10k to 10M records).
+
+Profiles:
+  bridge  records as bridge.py writes them (v3.4 fields, hs / er_delta / cai
+          scores, validator signatures) chained through governance_chain:
+          each hash_prev is the SHA-256 of the previous record's bytes, so
+          verify_chain_integrity() passes. hash_next stays the null
+          placeholder, since filling it in would change the bytes the next
+          record links to.
+  v3.5    records valid against schemas/ATHENA_CAP_SCHEMA_v3_5.json. The
+          schema forbids extra top-level keys, so there is no
+          governance_chain; the same hash_prev link is carried in
+          integrity.root_hash_reference and in
+          cap_extensions.bridge_metadata.integrity_meta.
+
+Files go to <root>/<year>/<month>/<cap_id>.json with strictly increasing
+mtimes (chain order on an index rebuild). Records are encoded on a process
+pool with a fixed-width hash_prev placeholder; the main process only swaps
+in the real link, hashes and writes, so the chain stays sequential while
+JSON encoding scales with --jobs. --backend segments appends the same
+records to a segment ledger instead. Output is deterministic for a given
+--seed (whatever --jobs is), and a tree generated with the same parameters
+is reused.
+
+Usage: generate_ledger.py <root> [--records 10000] [--profile bridge|v3.5]
+                          [--backend files|segments] [--seed 1] [--jobs N] [--check 100]
+"""
+
+import argparse, hashlib, json, os, random, shutil, sys, time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+from hash_engine import parallel_map
+from ledger_store import NULL_HASH, SegmentLedger, encode_record
+
+SCHEMA_PATH = ROOT / "schemas" / "ATHENA_CAP_SCHEMA_v3_5.json"
+MARKER = ".generator.json"
+PLACEHOLDER = "SHA256:" + "x" * 64  # same width as a real link, never valid hex
+CHUNK = 2000
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+DOMAINS = ["Governance", "Audit", "Civic", "Research", "Education", "Sales"]
+CONTEXT_MODES = ["Evidence Engine", "Advisor", "Technical", "Executive", "Board", "Regulator"]
+
+# ---------------------------------------------------------------------
+# Record builders
+# ---------------------------------------------------------------------
+def _cap_id(rng, i):
+    return "%08x-%04x-7%03x-%04x-%012x" % (i, rng.getrandbits(16), rng.getrandbits(12),
+                                           0x8000 | rng.getrandbits(14), rng.getrandbits(48))
+
+def bridge_record(rng, i, when, hash_prev):
+    return {
+        "cap_id": _cap_id(rng, i),
+        "timestamp": when.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "domain": DOMAINS[i % len(DOMAINS)],
+        "context_mode": CONTEXT_MODES[i % len(CONTEXT_MODES)],
+        "ems": round(rng.uniform(0.6, 1.0), 3),
+        "cw": round(rng.uniform(0.0, 0.5), 3),
+        "ad": round(rng.uniform(0.0, 0.5), 3),
+        "hci": round(rng.uniform(0.6, 1.0), 3),
+        "hs": round(rng.uniform(0.6, 1.0), 3),
+        "haa": round(rng.uniform(0.6, 1.0), 3),
+        "er_delta": round(rng.uniform(-0.1, 0.1), 4),
+        "cai": round(rng.uniform(0.5, 1.0), 3),
+        "validator_ethics": "compliant",
+        "validator_empathy": "aligned",
+        "validator_signatures": {
+            "validator": "Athena-Audit-Core",
+            "ethics_signature": "SHA256:%064x" % rng.getrandbits(256),
+            "empathy_signature": "%064x" % rng.getrandbits(256),
+        },
+        "laurie_version": "v3.4",
+        "governance_chain": {"hash_prev": hash_prev, "hash_next": NULL_HASH},
+        "reasoning_summary": f"Synthetic CAP logging cycle #{i} ({DOMAINS[i % len(DOMAINS)]}).",
+        "status": "pending",
+    }
+
+def v35_record(rng, i, when, hash_prev):
+    stamp = when.strftime("%Y-%m-%dT%H:%M:%SZ")
+    steps = rng.randrange(1, 4)
+    return {
+        "cap_id": _cap_id(rng, i),
+        "timestamp": stamp,
+        "domain": DOMAINS[i % len(DOMAINS)],
+        "context_mode": CONTEXT_MODES[i % len(CONTEXT_MODES)],
+        "advisor_of_record": "HUMAN",
+        "outputs": {
+            "summary": f"Synthetic audit pass #{i}.",
+            "evidence": [{"claim": f"Claim {i}.{k}", "support": "Synthetic supporting evidence.",
+                          "source_type": rng.choice(["file", "web", "calculation", "reasoning"])}
+                         for k in range(rng.randrange(1, 4))],
+            "limitations": ["Synthetic benchmark data."],
+            "recommendations": ["Human review before action."],
+            "confidence": rng.choice(["Low", "Med", "High"]),
+        },
+        "cap_extensions": {
+            "bridge_metadata": {
+                "bridge_version": "3.5.0",
+                "validated_at": stamp,
+                "validator_id": "Athena-Audit-Core",
+                "validation_signature": "SHA256:%064x" % rng.getrandbits(256),
+                "integrity_meta": {"hash_prev": hash_prev},
+            },
+            "CAP_EXT13_DecisionTraceLedger": {
+                "enabled": True,
+                "trace": [{"step": s + 1, "inputs": [f"input-{s}"], "method": "synthetic",
+                           "output": f"step {s + 1} output", "assumptions": ["benchmark"],
+                           "confidence": rng.choice(["Low", "Med", "High"])} for s in range(steps)],
+            },
+        },
+        "integrity": {
+            "signature_status": rng.choice(["pending", "sealed", "validated"]),
+            "root_hash_reference": hash_prev,
+            "audit_source": "generate_ledger.py",
+        },
+    }
+
+PROFILES = {"bridge": bridge_record, "v3.5": v35_record}
+
+# ---------------------------------------------------------------------
+# Generation
+# ---------------------------------------------------------------------
+def _build_chunk(start, stop, count, profile, seed, span_days):
+    rng = random.Random(f"{seed}:{start}")  # per chunk, so output does not depend on --jobs
+    build = PROFILES[profile]
+    step = timedelta(days=span_days) / max(1, count)
+    for i in range(start, stop):
+        when = START + step * i
+        yield build(rng, i, when, PLACEHOLDER), when
+
+def iter_records(count, profile="bridge", seed=1, span_days=365):
+    """(record, when) in chain order, hash_prev set to PLACEHOLDER."""
+    for start in range(0, count, CHUNK):
+        yield from _build_chunk(start, min(count, start + CHUNK), count, profile, seed, span_days)
+
+def _encode_chunk(job):
+    """Worker: [(relative path, encoded bytes with PLACEHOLDER links)] for one chunk."""
+    return [(f"{when.year:04d}/{when.month:02d}/{record['cap_id']}.json", encode_record(record))
+            for record, when in _build_chunk(*job)]
+
+def _set_prev(record, profile, hash_prev):
+    if profile == "bridge":
+        record["governance_chain"]["hash_prev"] = hash_prev
+    else:
+        record["integrity"]["root_hash_reference"] = hash_prev
+        record["cap_extensions"]["bridge_metadata"]["integrity_meta"]["hash_prev"] = hash_prev
+
+def generate(root, records, profile="bridge", backend="files", seed=1, span_days=365, jobs=None, quiet=False):
+    """Build (or reuse) a synthetic ledger at `root`; returns seconds spent (0.0 if reused)."""
+    root = Path(root)
+    params = {"records": records, "profile": profile, "backend": backend, "seed": seed, "span_days": span_days}
+    marker = root / MARKER
+    if marker.exists() and json.loads(marker.read_text()) == params:
+        return 0.0
+    shutil.rmtree(root, ignore_errors=True)
+    t0 = time.perf_counter()
+    if backend == "segments":
+        _generate_segments(root, records, profile, seed, span_days, quiet)
+    else:
+        _generate_files(root, records, profile, seed, span_days, jobs, quiet)
+    marker.write_text(json.dumps(params))
+    return time.perf_counter() - t0
+
+def _generate_files(root, records, profile, seed, span_days, jobs, quiet):
+    root.mkdir(parents=True)
+    made = set()
+    placeholder = PLACEHOLDER.encode()
+    prev = NULL_HASH.encode()
+    base_ns = time.time_ns() - records * 1000 - 10 ** 10  # older than any racy-clean window
+    chunks = ((start, min(records, start + CHUNK), records, profile, seed, span_days)
+              for start in range(0, records, CHUNK))
+    i = 0
+    for chunk in parallel_map(_encode_chunk, chunks, jobs=jobs, processes=True, chunksize=1):
+        for name, raw in chunk:
+            raw = raw.replace(placeholder, prev)
+            path = os.path.join(root, name)
+            month_dir = os.path.dirname(path)
+            if month_dir not in made:
+                os.makedirs(month_dir, exist_ok=True)
+                made.add(month_dir)
+            with open(path, "wb") as f:
+                f.write(raw)
+            stamp = base_ns + i * 1000
+            os.utime(path, ns=(stamp, stamp))
+            prev = b"SHA256:" + hashlib.sha256(raw).hexdigest().encode()
+            i += 1
+            if not quiet and i % 100000 == 0:
+                print(f"  generated {i} records...")
+
+def _generate_segments(root, records, profile, seed, span_days, quiet):
+    ledger = SegmentLedger.create(root)
+    batch, done = [], 0
+    for record, _ in iter_records(records, profile, seed, span_days):
+        _set_prev(record, profile, None)
+        batch.append(record)
+        if len(batch) == 1000:
+            done += _append_segment_batch(ledger, batch, profile)
+            batch = []
+            if not quiet and done % 100000 == 0:
+                print(f"  generated {done} records...")
+    if batch:
+        _append_segment_batch(ledger, batch, profile)
+    ledger.flush()
+
+def _append_segment_batch(ledger, batch, profile):
+    if profile == "bridge":
+        ledger.append_chain(batch)  # links governance_chain itself
+        return len(batch)
+    head = ledger.head()
+    for record in batch:
+        _set_prev(record, profile, f"SHA256:{head.sha256}" if head is not None else NULL_HASH)
+        head = ledger.append(record)
+    return len(batch)
+
+def check_sample(root, count=100):
+    """Validate up to `count` generated v3.5 records against the schema; returns the error messages."""
+    from jsonschema.validators import validator_for
+    from ledger_store import iter_ledger_records
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    validator = validator_for(schema)(schema)
+    errors = []
+    for n, (name, record) in enumerate(iter_ledger_records(root)):
+        if n >= count:
+            break
+        errors += [f"{name}: {e.message}" for e in validator.iter_errors(record)]
+    return errors
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate a synthetic, chain-linked CAP ledger.")
+    ap.add_argument("root")
+    ap.add_argument("--records", type=int, default=10000)
+    ap.add_argument("--profile", choices=sorted(PROFILES), default="bridge")
+    ap.add_argument("--backend", choices=["files", "segments"], default="files")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--span-days", type=int, default=365, help="timestamps are spread evenly over this many days")
+    ap.add_argument("--jobs", "-j", type=int, default=None, help="encoding processes (default: one per core)")
+    ap.add_argument("--check", type=int, default=0, metavar="N", help="schema-check N records afterwards (v3.5)")
+    args = ap.parse_args(argv)
+    if args.check and args.profile != "v3.5":
+        ap.error("--check applies to the v3.5 profile (bridge records carry v3.4 fields by design)")
+
+    seconds = generate(args.root, args.records, args.profile, args.backend, args.seed, args.span_days,
+                       jobs=args.jobs)
+    if seconds:
+        print(f"✅ {args.records} {args.profile} records in {seconds:.1f}s ({args.records / seconds:,.0f}/s)")
+    else:
+        print(f"✅ Reusing existing ledger at {args.root}")
+    if args.check:
+        errors = check_sample(args.root, args.check)
+        for e in errors[:10]:
+            print(f"❌ {e}")
+        if errors:
+            return 1
+        print(f"✅ {args.check} records valid against {SCHEMA_PATH.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+load_admission.py
+----------------------------------------
+Load test for admission control (admission.py) on the bridge's POST /cap.
+
+The bridge runs in a child process on a fixed pool of request threads (as
+under gunicorn --worker-class gthread), with a throwaway ledger and a stub
+GitHub. Requests arrive open-loop at --rate per second from --clients
+distinct addresses (X-Forwarded-For) for --duration seconds, each with a
+--deadline, well past what the worker can seal; /health is probed every
+100 ms throughout. Each scenario reports goodput (CAPs sealed within the
+deadline per second), how much was shed with 429/503, how much timed out,
+and /health latency:
+
+  unprotected   ADMISSION_MAX_INFLIGHT=0, ADMISSION_RATE=0 (accept everything)
+  admission     the defaults (or --max-inflight / --client-rate)
+
+Usage: load_admission.py [--rate 400] [--duration 10] [--deadline 2] [--clients 50]
+                         [--threads 32] [--max-inflight 16] [--client-rate 20] [--json out.json]
+"""
+
+import argparse, asyncio, json, os, socket, statistics, subprocess, sys, tempfile, time, uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+HEALTH_EVERY = 0.1
+
+
+# ---------------------------------------------------------------------
+# Server side (child process)
+# ---------------------------------------------------------------------
+def serve(port, threads):
+    """Run bridge.app on a bounded thread pool until killed."""
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+    import bridge
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """Accept loop plus a fixed pool of request threads (queued beyond it), like gthread."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._work, request, client_address)
+
+        def _work(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+        def handle_error(self, request, client_address):
+            pass  # broken pipes from clients past their deadline
+
+    import logging
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    sys.stdout = open(os.devnull, "w")  # [CHAIN] lines
+    PooledWSGIServer("127.0.0.1", port, bridge.app).serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class BridgeProcess:
+    def __init__(self, threads, env):
+        self.threads = threads
+        self.env = env
+        self.port = free_port()
+
+    def __enter__(self):
+        self.tmp = tempfile.TemporaryDirectory(prefix="athena_load_")
+        ledger = Path(self.tmp.name) / "CAP_LOGS"
+        ledger.mkdir()
+        env = dict(os.environ, LEDGER_PATH=str(ledger), LEDGER_STATE_DIR=str(Path(self.tmp.name) / "state"),
+                   **self.env)
+        self.proc = subprocess.Popen([sys.executable, __file__, "--serve", str(self.port),
+                                      "--threads", str(self.threads)], env=env, cwd=str(ROOT),
+                                     stderr=subprocess.DEVNULL)  # broken pipes past the deadline
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return self.port
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("bridge did not start")
+
+    def __exit__(self, *exc):
+        self.proc.kill()
+        self.proc.wait()
+        self.tmp.cleanup()
+
+# ---------------------------------------------------------------------
+# Load side
+# ---------------------------------------------------------------------
+async def request(host, port, method, path, body=b"", headers=None):
+    """One HTTP/1.0 request on a fresh connection (cheap enough not to starve the server); the status code."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        head = f"{method} {path} HTTP/1.0\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+        for key, value in (headers or {}).items():
+            head += f"{key}: {value}\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        status = await reader.readline()
+        await reader.read()  # until the server closes
+        return int(status.split()[1])
+    finally:
+        writer.close()
+
+
+async def drive(host, port, rate, duration, deadline, clients):
+    outcomes = {"sealed": 0, "rate_limited": 0, "overloaded": 0, "timeout": 0, "error": 0}
+    latencies, health = [], []
+    health_failures = 0
+
+    async def one(i):
+        body = json.dumps({"cap_id": str(uuid.uuid4()), "timestamp": "2026-01-01T00:00:00Z",
+                           "domain": "Governance", "context_mode": "Advisor"}).encode()
+        headers = {"Content-Type": "application/json",
+                   "X-Forwarded-For": f"10.0.{i % clients // 250}.{i % clients % 250}"}
+        t0 = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(request(host, port, "POST", "/cap", body, headers), deadline)
+        except asyncio.TimeoutError:
+            outcomes["timeout"] += 1
+            return
+        except (OSError, ValueError, IndexError):
+            outcomes["error"] += 1
+            return
+        if status == 202:
+            outcomes["sealed"] += 1
+            latencies.append(time.perf_counter() - t0)
+        elif status == 429:
+            outcomes["rate_limited"] += 1
+        elif status == 503:
+            outcomes["overloaded"] += 1
+        else:
+            outcomes["error"] += 1
+
+    async def probe(stop):
+        nonlocal health_failures
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                if await asyncio.wait_for(request(host, port, "GET", "/health"), deadline) == 200:
+                    health.append(time.perf_counter() - t0)
+                else:
+                    health_failures += 1
+            except (asyncio.TimeoutError, OSError, ValueError, IndexError):
+                health_failures += 1
+            await asyncio.sleep(HEALTH_EVERY)
+
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(stop))
+    tasks, t0 = [], time.perf_counter()
+    for i in range(int(rate * duration)):
+        delay = t0 + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(i)))
+    await asyncio.gather(*tasks)
+    stop.set()
+    await prober
+
+    def pct(values, q):
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1) if values else None
+
+    return dict(outcomes, offered=len(tasks), offered_rps=rate,
+                goodput_rps=round(outcomes["sealed"] / duration, 1),
+                p50_ms=round(statistics.median(latencies) * 1000, 1) if latencies else None,
+                p99_ms=pct(latencies, 0.99),
+                health_p50_ms=round(statistics.median(health) * 1000, 1) if health else None,
+                health_p99_ms=pct(health, 0.99), health_failures=health_failures)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rate", type=float, default=400, help="offered POST /cap per second")
+    ap.add_argument("--duration", type=float, default=10)
+    ap.add_argument("--deadline", type=float, default=2.0, help="client timeout per request (s)")
+    ap.add_argument("--clients", type=int, default=50, help="distinct client addresses")
+    ap.add_argument("--threads", type=int, default=32, help="bridge request threads")
+    ap.add_argument("--max-inflight", type=int, default=None)
+    ap.add_argument("--client-rate", type=float, default=None, help="per-client requests/s")
+    ap.add_argument("--json", help="write results to this file")
+    ap.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.threads)
+
+    from stub_servers import StubGitHub
+    stub = StubGitHub().start()
+    admission = {}
+    if args.max_inflight is not None:
+        admission["ADMISSION_MAX_INFLIGHT"] = str(args.max_inflight)
+    if args.client_rate is not None:
+        admission["ADMISSION_RATE"] = str(args.client_rate)
+    scenarios = [
+        ("unprotected", {"ADMISSION_MAX_INFLIGHT": "0", "ADMISSION_RATE": "0"}),
+        ("admission", admission),
+    ]
+    results = {"rate": args.rate, "duration_s": args.duration, "deadline_s": args.deadline,
+               "threads": args.threads, "scenarios": {}}
+    try:
+        for name, env in scenarios:
+            env = dict(env, GITHUB_DISPATCH_URL=f"{stub.url}/repos/x/y/dispatches", GITHUB_PAT="load")
+            with BridgeProcess(args.threads, env) as port:
+                res = asyncio.run(drive("127.0.0.1", port, args.rate, args.duration, args.deadline, args.clients))
+            results["scenarios"][name] = res
+            print(f"{name:12s} goodput {res['goodput_rps']:>7.1f}/s of {res['offered_rps']:.0f}/s offered  "
+                  f"sealed={res['sealed']} shed={res['rate_limited'] + res['overloaded']} "
+                  f"timeout={res['timeout']} error={res['error']}  p99={res['p99_ms']}ms  "
+                  f"/health p99={res['health_p99_ms']}ms failures={res['health_failures']}")
+    finally:
+        stub.stop()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+stub_servers.py
+----------------------------------------
+Local stand-ins for the GitHub API and the Slack incoming webhook used by
+the bridge benchmarks.
+Each stub runs a ThreadingHTTPServer on 127.0.0.1 with a configurable
+per-request latency and counts the calls it receives.
+"""
+
+import json, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+STUB_MANIFEST = {
+    "version": "3.4.1",
+    "modules": [{"name": "ATHENA_CAP_SCHEMA_v3_5.json", "sha256": "SHA256:" + "0" * 64}],
+    "validator_signatures": {"ethics": "stub", "empathy": "stub"},
+}
+
+
+class _StubServer:
+    """Base class: start()/stop() a threaded HTTP server with a request counter."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_port}"
+
+    def count(self, key):
+        with self._lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                stub.handle(self, "GET")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.body = self.rfile.read(length) if length else b""
+                if stub.latency:
+                    time.sleep(stub.latency)
+                stub.handle(self, "POST")
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    def handle(self, req, method):
+        raise NotImplementedError
+
+
+class StubGitHub(_StubServer):
+    """Contents API + raw download + repository_dispatch."""
+
+    def __init__(self, latency=0.0, manifest=None):
+        super().__init__(latency)
+        self.manifest = manifest or STUB_MANIFEST
+        self.etag = '"stub-etag-1"'
+        self.sha = "stubsha1"
+
+    def handle(self, req, method):
+        path = req.path.split("?", 1)[0]
+        if method == "GET" and "/contents/" in path:
+            self.count("contents")
+            if req.headers.get("If-None-Match") == self.etag:
+                return req._send(304, headers={"ETag": self.etag})
+            body = json.dumps({"sha": self.sha, "download_url": f"{self.url}/download"}).encode()
+            return req._send(200, body, {"ETag": self.etag, "Content-Type": "application/json"})
+        if method == "GET" and path == "/download":
+            self.count("download")
+            return req._send(200, json.dumps(self.manifest).encode(), {"Content-Type": "application/json"})
+        if method == "POST" and path.endswith("/dispatches"):
+            self.count("dispatches")
+            return req._send(204)
+        self.count("other")
+        req._send(404)
+
+
+class StubSlack(_StubServer):
+    """Slack incoming webhook: accepts any POST, keeps the last message."""
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.last_message = None
+
+    def handle(self, req, method):
+        if method == "POST":
+            self.count("webhook")
+            try:
+                self.last_message = json.loads(req.body or b"null")
+            except ValueError:
+                return req._send(400, b"invalid_payload")
+            return req._send(200, b"ok", {"Content-Type": "text/plain"})
+        self.count("other")
+        req._send(404)
@@ -1,73 +1,114 @@
 import os
 import json
-import requests
-import hashlib
+import uuid
+import traceback
+import threading
 from pathlib import Path
 from datetime import datetime
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
+from canonical_json import ethics_signature
+from ledger_store import open_ledger, ChainAppender, NULL_HASH
+from merkle_log import MerkleLog
+from cap_query import QueryIndex, parse_threshold
+from cap_tail import LedgerTail, Subscription, TailFull
+from cap_dedupe import DedupeIndex, PENDING, dedupe_keys
+from dispatch_queue import DispatchQueue
+from ledger_index import LEDGER_STATE_DIR
+from response_cache import ResponseCache, SharedResult, cache_key
+import admission
+import telemetry
+from telemetry import timed
 
 app = Flask(__name__)
 
+# Per-route latency histograms and opt-in sampled span timing (see telemetry.py);
+# scraped from /metrics.
+telemetry.instrument_flask(app, "bridge")
+
+# Admission control (see admission.py): CAP ingest is capped per worker and rate
+# limited per client with fast 503 / 429 answers; the priority routes always run.
+admission_control = admission.AdmissionController(
+    limited={"/cap", "/wake_listener"},
+    priority={"/health", "/status", "/verify_chain", "/metrics"})
+admission.instrument_flask(app, admission_control)
+
 # ---------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------
 GITHUB_TOKEN = os.environ.get("GITHUB_PAT")
 OWNER = "falconforgeai-rgb"
 REPO  = "Athena"
-LEDGER_PATH = "./CAP_LOGS"
+LEDGER_PATH = os.environ.get("LEDGER_PATH", "./CAP_LOGS")
 
-# ---------------------------------------------------------------------
-# Utility: compute SHA256 of file
-# ---------------------------------------------------------------------
-def compute_file_hash(file_path):
-    with open(file_path, "rb") as f:
-        return hashlib.sha256(f.read()).hexdigest()
+# Ledger storage (see ledger_store.py): LEDGER_BACKEND=files keeps the CAP_LOGS
+# tree (indexed in LEDGER_STATE_DIR); a segment ledger is detected automatically.
+ledger = open_ledger(LEDGER_PATH)
 
-# ---------------------------------------------------------------------
-# Utility: get latest CAP file + hash
-# ---------------------------------------------------------------------
-def get_latest_cap():
-    try:
-        p = Path(LEDGER_PATH)
-        cap_files = sorted(p.rglob("*.json"), key=lambda x: x.stat().st_mtime, reverse=True)
-        if not cap_files:
-            return None, "SHA256:" + "0" * 64
-        latest = cap_files[0]
-        digest = compute_file_hash(latest)
-        return latest, f"SHA256:{digest}"
-    except Exception as e:
-        print(f"[WARN] Could not get latest CAP: {e}")
-        return None, "SHA256:" + "0" * 64
+# New CAPs are linked onto the chain head and written under the ledger lock;
+# concurrent requests in a worker share one commit (see ChainAppender).
+chain = ChainAppender(ledger)
 
-# ---------------------------------------------------------------------
-# Update previous CAP's hash_next
-# ---------------------------------------------------------------------
-def update_previous_cap_hash_next(prev_path, new_hash):
-    if not prev_path or not prev_path.exists():
-        return
-    try:
-        with open(prev_path, "r") as f:
-            cap_data = json.load(f)
-        cap_data["governance_chain"]["hash_next"] = f"SHA256:{new_hash}"
-        with open(prev_path, "w") as f:
-            json.dump(cap_data, f, indent=2)
-        print(f"[CHAIN] Updated hash_next in {prev_path.name}")
-    except Exception as e:
-        print(f"[WARN] Failed to update previous CAP hash_next: {e}")
+# Secondary indexes for GET /cap/query (see cap_query.py): records this worker
+# appends are indexed on write; others are picked up by a sync before each query.
+cap_index = QueryIndex()
 
-# ---------------------------------------------------------------------
-# Build and send a CAP payload
-# ---------------------------------------------------------------------
-def send_cap_payload(reasoning_summary, domain="Governance", context="Advisor"):
-    headers = {
+# Ingest dedupe (see cap_dedupe.py): a cap_id (and with DEDUPE_CONTENT=1 the
+# same content under another cap_id) is sealed once; retries get the original result.
+seals = DedupeIndex("bridge")
+
+# Live tail for GET /cap/stream (see cap_tail.py): records this worker appends
+# are pushed at once, other workers' every TAIL_POLL_INTERVAL seconds.
+tail = LedgerTail(ledger)
+
+# Read responses keyed on the chain head (see response_cache.py): ETag / 304 for
+# pollers, and /verify_chain verifies and seals its Audit CAP once per chain state.
+responses = ResponseCache()
+verify_results = SharedResult(Path(LEDGER_STATE_DIR) / "verify_result.json")
+_verify_lock = threading.Lock()
+
+# Merkle commitments over the ledger (see merkle_log.py); tree heads are signed
+# with MERKLE_SIGNING_KEY and re-published at most every MERKLE_PUBLISH_INTERVAL.
+merkle_log = MerkleLog()
+
+# Outbound repository_dispatch events go through a durable queue (see
+# dispatch_queue.py): CAPs are acknowledged once queued and a background sender
+# delivers them in batches, retrying 5xx/429 and honouring GitHub rate limits.
+dispatch = DispatchQueue(
+    os.environ.get("GITHUB_DISPATCH_URL", f"https://api.github.com/repos/{OWNER}/{REPO}/dispatches"),
+    headers={
         "Accept": "application/vnd.github+json",
         "Authorization": f"Bearer {GITHUB_TOKEN}"
     }
+)
+# Start sending at once: CAPs still queued when the last process stopped go out
+# without waiting for the next one to arrive.
+dispatch.start()
 
-    prev_file, prev_hash = get_latest_cap()
+telemetry.REGISTRY.gauge("athena_dispatch_queue_depth", "CAPs queued or in flight to GitHub.",
+                         fn=dispatch.depth)
+telemetry.REGISTRY.counter("athena_dispatch_events_total", "Dispatch sender events in this worker.",
+                           ("event",), fn=lambda: {(k,): v for k, v in dispatch.stats.items()})
+telemetry.REGISTRY.gauge("athena_merkle_tree_size", "Leaves in the Merkle log.", fn=merkle_log.size)
+telemetry.REGISTRY.gauge("athena_admission_in_flight", "Admitted ingest requests being served.",
+                         fn=admission_control.inflight)
+telemetry.REGISTRY.counter("athena_admission_total", "Admission decisions in this worker.",
+                           ("outcome",), fn=lambda: {(k,): v for k, v in admission_control.stats.items()})
+telemetry.REGISTRY.counter("athena_dedupe_total", "Ingest dedupe lookups in this worker by outcome.",
+                           ("outcome",), fn=lambda: {(k,): v for k, v in seals.stats.items()})
+telemetry.REGISTRY.counter("athena_response_cache_total", "Cached read responses in this worker by outcome.",
+                           ("outcome",), fn=lambda: {(k,): v for k, v in responses.stats.items()})
+telemetry.REGISTRY.gauge("athena_tail_subscribers", "Clients connected to /cap/stream in this worker.",
+                         fn=tail.subscribers)
+telemetry.REGISTRY.counter("athena_tail_events_total", "Live tail events in this worker.",
+                           ("event",), fn=lambda: {(k,): v for k, v in tail.stats.items()})
 
+# ---------------------------------------------------------------------
+# Build a CAP payload and append it to the chain
+# ---------------------------------------------------------------------
+def build_cap_payload(reasoning_summary, domain="Governance", context="Advisor", cap_id=None):
+    """Seal a CAP into the chain; returns (payload, ledger entry)."""
     cap_payload = {
-        "cap_id": "123e4567-e89b-12d3-a456-426614174000",
+        "cap_id": cap_id or str(uuid.uuid4()),
         "timestamp": datetime.utcnow().isoformat() + "Z",
         "domain": domain,
         "context_mode": context,
@@ -82,109 +123,337 @@ def send_cap_payload(reasoning_summary, domain="Governance", context="Advisor"):
         "validator_empathy": "aligned",
         "validator_signatures": {
             "validator": "Athena-Audit-Core",
-            "ethics_signature": "a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6e7f8a9b0c1d2e3f4a5b6c7d8e9f0a1b2",
+            "ethics_signature": None,  # signed below, as sign_cap.js does
             "empathy_signature": "abcdef1234567890fedcba0987654321aabbccddeeff11223344556677889900"
         },
         "laurie_version": "v3.4",
         "governance_chain": {
-            "hash_prev": prev_hash,
+            "hash_prev": None,  # set by the chain append
             "hash_next": "SHA256:" + "0" * 64
         },
         "reasoning_summary": reasoning_summary,
         "status": "pending"
     }
 
-    data = {
-        "event_type": "wake_listener",
-        "client_payload": {"cap_payload": cap_payload}
-    }
+    with timed("sign"):
+        cap_payload["validator_signatures"]["ethics_signature"] = ethics_signature(cap_payload)
 
-    r = requests.post(
-        f"https://api.github.com/repos/{OWNER}/{REPO}/dispatches",
-        headers=headers,
-        json=data
-    )
+    entry = chain.append(cap_payload)
+    cap_index.add(entry, cap_payload)
+    tail.notify()
+    print(f"[CHAIN] Appended {ledger.describe(entry)} after {cap_payload['governance_chain']['hash_prev']}")
+    return cap_payload, entry
 
-    if prev_file:
-        try:
-            new_hash = hashlib.sha256(json.dumps(cap_payload, sort_keys=True).encode()).hexdigest()
-            update_previous_cap_hash_next(prev_file, new_hash)
-        except Exception as e:
-            print(f"[WARN] Could not update previous CAP hash_next: {e}")
-
-    print(f"[{datetime.utcnow().isoformat()}] CAP dispatched ({r.status_code}) — {reasoning_summary}")
-    return r.status_code
+# ---------------------------------------------------------------------
+# Queue a CAP payload for dispatch
+# ---------------------------------------------------------------------
+def send_cap_payload(reasoning_summary, domain="Governance", context="Advisor"):
+    """Build a CAP and queue it for GitHub; returns the tracking id."""
+    tracking_id = dispatch.enqueue([build_cap_payload(reasoning_summary, domain, context)[0]])
+    print(f"[{datetime.utcnow().isoformat()}] CAP queued ({tracking_id}) — {reasoning_summary}")
+    return tracking_id
 
 # ---------------------------------------------------------------------
 # Verify chain integrity
 # ---------------------------------------------------------------------
-def verify_chain_integrity():
-    p = Path(LEDGER_PATH)
-    cap_files = sorted(p.rglob("*.json"), key=lambda x: x.stat().st_mtime)
-    if not cap_files:
-        return {"status": "empty", "message": "No CAP files found."}
-
-    issues = []
-    for i in range(1, len(cap_files)):
-        prev_file = cap_files[i - 1]
-        curr_file = cap_files[i]
-        with open(prev_file, "r") as f1, open(curr_file, "r") as f2:
-            prev_data = json.load(f1)
-            curr_data = json.load(f2)
-        actual_prev_hash = "SHA256:" + compute_file_hash(prev_file)
-        expected_prev_hash = curr_data["governance_chain"]["hash_prev"]
-        if actual_prev_hash != expected_prev_hash:
-            issues.append({
-                "previous_file": prev_file.name,
-                "current_file": curr_file.name,
-                "expected": expected_prev_hash,
-                "actual": actual_prev_hash
-            })
-
-    if issues:
-        return {"status": "invalid", "breaks": issues}
-    else:
-        return {"status": "valid", "message": "All CAP links verified successfully."}
+def verify_chain_integrity(full=False):
+    """Checkpointed verification (see chain_verify.py); full=True re-audits every record."""
+    with timed("verify_full" if full else "verify_chain"):
+        return ledger.verify(full=full)
+
+def chain_version():
+    """[position, sha256] of the chain head; every append moves it."""
+    head = ledger.head()
+    return [head.position, head.sha256] if head is not None else [0, ""]
+
+def verify_and_audit(full=False):
+    """
+    Verify the chain and seal an Audit CAP with the outcome; returns
+    (result, version). The result is kept for every worker under the head
+    *after* that Audit CAP, so until something else is appended it is served
+    again without re-verifying or dispatching. full=True always runs; version
+    is None when another append raced the audit (nothing is kept then).
+    """
+    with _verify_lock:
+        before = ledger.head()
+        version = chain_version()
+        if not full:
+            result = verify_results.get(version)
+            if result is not None:
+                return result, version
+        result = verify_chain_integrity(full=full)
+        reasoning = (
+            "Ledger verification complete: "
+            f"{result['status'].upper()}. "
+            f"Details: {result.get('message') or len(result.get('breaks', []))} breaks detected."
+        )
+        send_cap_payload(reasoning_summary=reasoning, domain="Audit", context="Self-Audit")
+        audit = ledger.head()
+        if audit is None or audit.hash_prev != ("SHA256:" + before.sha256 if before is not None else NULL_HASH):
+            return result, None
+        version = chain_version()
+        verify_results.put(version, result)
+        return result, version
 
 # ---------------------------------------------------------------------
 # Flask routes
 # ---------------------------------------------------------------------
 @app.post("/wake_listener")
 def wake_listener():
-    status = send_cap_payload("Athena executed standard CAP logging cycle.")
-    return jsonify({"github_status": status}), 200
+    tracking_id = send_cap_payload("Athena executed standard CAP logging cycle.")
+    return jsonify({"status": "queued", "tracking_id": tracking_id}), 202
 
 @app.get("/verify_chain")
 def verify_chain():
-    """Verify local CAP ledger chain and log the result."""
-    result = verify_chain_integrity()
-    reasoning = (
-        "Ledger verification complete: "
-        f"{result['status'].upper()}. "
-        f"Details: {result.get('message') or len(result.get('breaks', []))} breaks detected."
-    )
-    send_cap_payload(reasoning_summary=reasoning, domain="Audit", context="Self-Audit")
-    return jsonify(result), 200
+    """
+    Verify local CAP ledger chain and log the result, once per chain state
+    (ETag / If-None-Match keyed on the head). ?full=true forces a full re-audit.
+    """
+    if request.args.get("full", "").lower() in ("1", "true", "yes"):
+        return jsonify(verify_and_audit(full=True)[0]), 200
+
+    def build():
+        result, version = verify_and_audit()
+        return result, 200, version
+
+    status, body, headers = responses.respond(
+        cache_key(request.path, request.args.items(multi=True)), chain_version(),
+        request.headers.get("If-None-Match"), build)
+    return Response(body, status=status, mimetype="application/json", headers=headers)
+
+# ---------------------------------------------------------------------
+# Merkle commitments
+# ---------------------------------------------------------------------
+def _merkle_head():
+    """Fold new records into the Merkle log and return the latest signed tree head."""
+    with timed("merkle_sync"):
+        merkle_log.sync(ledger)
+    return merkle_log.publish()
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None or value == "":
+        return default
+    return int(value)
+
+@app.get("/merkle/root")
+def merkle_root():
+    """Latest signed tree head; ?history=N lists the N most recent."""
+    head = _merkle_head()
+    if head is None:
+        return jsonify({"error": "Ledger is empty"}), 404
+    try:
+        history = _int_arg("history", 0)
+    except ValueError:
+        return jsonify({"error": "history must be an integer"}), 400
+    if history:
+        return jsonify({"latest": head, "history": merkle_log.heads(limit=history)}), 200
+    return jsonify(head), 200
+
+@app.get("/merkle/proof/inclusion")
+def merkle_inclusion_proof():
+    """Audit path for ?cap_id= or ?leaf_index=, against the signed head or ?tree_size=."""
+    head = _merkle_head()
+    try:
+        tree_size = _int_arg("tree_size", head["tree_size"] if head else merkle_log.size())
+        if request.args.get("cap_id"):
+            matches = merkle_log.find(request.args["cap_id"])
+            if not matches:
+                return jsonify({"error": "cap_id not found in the Merkle log"}), 404
+            idx = matches[-1]
+        else:
+            idx = _int_arg("leaf_index")
+            if idx is None:
+                return jsonify({"error": "cap_id or leaf_index is required"}), 400
+        path = merkle_log.inclusion_proof(idx, tree_size)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    proof = merkle_log.leaf(idx)
+    proof.update(tree_size=tree_size, root_hash=merkle_log.root(tree_size).hex(),
+                 audit_path=[h.hex() for h in path])
+    if head and head["tree_size"] == tree_size:
+        proof["tree_head"] = head
+    return jsonify(proof), 200
+
+@app.get("/merkle/proof/consistency")
+def merkle_consistency_proof():
+    """Proof that tree ?first= is a prefix of tree ?second= (default: the signed head)."""
+    head = _merkle_head()
+    try:
+        first = _int_arg("first")
+        second = _int_arg("second", head["tree_size"] if head else merkle_log.size())
+        if first is None:
+            return jsonify({"error": "first is required"}), 400
+        proof = merkle_log.consistency_proof(first, second)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    body = {"first": first, "second": second,
+            "first_root": merkle_log.root(first).hex(), "second_root": merkle_log.root(second).hex(),
+            "proof": [h.hex() for h in proof]}
+    if head and head["tree_size"] == second:
+        body["tree_head"] = head
+    return jsonify(body), 200
+
+# ---------------------------------------------------------------------
+# Query API
+# ---------------------------------------------------------------------
+@app.get("/cap/query")
+def cap_query():
+    """
+    Indexed CAP lookup: ?cap_id=, ?domain= / ?context_mode= (repeatable),
+    ?since= / ?until=, ?validator_ethics=, ?validator_empathy=, ?status=,
+    ?metric=hs<0.8 (repeatable), ?limit= (max 1000), ?cursor=, ?order=desc|asc,
+    ?view=full|summary, ?format=json|ndjson. Streams the page; the next
+    cursor is in the body (json) and the X-Next-Cursor header.
+    """
+    args = request.args
+    try:
+        thresholds = [parse_threshold(m) for m in args.getlist("metric")]
+        with timed("query_sync"):
+            cap_index.sync(ledger)
+        with timed("query"):
+            rows, next_cursor = cap_index.query(
+                cap_id=args.get("cap_id"), domains=args.getlist("domain"),
+                context_modes=args.getlist("context_mode"), since=args.get("since"), until=args.get("until"),
+                validator_ethics=args.getlist("validator_ethics"),
+                validator_empathy=args.getlist("validator_empathy"), status=args.getlist("status"),
+                thresholds=thresholds, limit=_int_arg("limit", 100), cursor=args.get("cursor"),
+                order=args.get("order", "desc"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if args.get("view", "full") == "summary":
+        items = iter(rows)
+    else:
+        items = (record for _, record in cap_index.records(ledger, rows))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if args.get("format") == "ndjson":
+        return Response((json.dumps(item) + "\n" for item in items),
+                        mimetype="application/x-ndjson", headers=headers)
+
+    def stream():
+        yield '{"next_cursor": %s, "results": [' % json.dumps(next_cursor)
+        for i, item in enumerate(items):
+            yield ("," if i else "") + json.dumps(item)
+        yield "]}"
+    return Response(stream(), mimetype="application/json", headers=headers)
+
+# ---------------------------------------------------------------------
+# Live tail
+# ---------------------------------------------------------------------
+def _sse(event, data, event_id=None):
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _ndjson(event, data):
+    return json.dumps(dict(data, event=event)) + "\n"
+
+@app.get("/cap/stream")
+def cap_stream():
+    """
+    Push newly sealed CAPs as server-sent events (default) or ?format=ndjson.
+    Starts at the chain head; ?after=<position>, ?cap_id= or the SSE
+    Last-Event-ID header resume after that record instead. Events: head
+    (on connect), cap (id = chain position), and slow_consumer, sent before
+    the stream is closed on a client more than TAIL_BUFFER events behind.
+    """
+    args = request.args
+    ndjson = args.get("format") == "ndjson"
+    try:
+        head = tail.head()
+        after = _int_arg("after")
+        if after is None and request.headers.get("Last-Event-ID", "").strip():
+            after = int(request.headers["Last-Event-ID"])
+        if after is None and args.get("cap_id"):
+            with timed("query_sync"):
+                cap_index.sync(ledger)
+            rows, _ = cap_index.query(cap_id=args["cap_id"], limit=1000)
+            if not rows:
+                return jsonify({"error": "cap_id not found"}), 404
+            after = max(max(r["position"] for r in rows), 0)  # archived records are not replayed
+        if after is None:
+            after = head["position"] if head else 0
+    except ValueError:
+        return jsonify({"error": "after / Last-Event-ID must be a chain position"}), 400
+    try:
+        sub = tail.subscribe()
+    except TailFull as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+    def stream():
+        last = after
+        yield _ndjson("head", head or {}) if ndjson else "retry: 3000\n" + _sse("head", head or {})
+        for event in tail.follow(sub, after_position=after):
+            if event is Subscription.HEARTBEAT:
+                yield _ndjson("heartbeat", {}) if ndjson else ": keep-alive\n\n"
+            elif event is Subscription.SLOW_CONSUMER:
+                body = {"error": "slow consumer dropped", "resume_after": last}
+                yield _ndjson("slow_consumer", body) if ndjson else _sse("slow_consumer", body)
+            else:
+                last = event["position"]
+                yield _ndjson("cap", event) if ndjson else _sse("cap", event, event_id=last)
+
+    response = Response(stream(), mimetype="application/x-ndjson" if ndjson else "text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: tail.unsubscribe(sub))  # also when the stream never started
+    return response
 
 @app.get("/health")
 def health_check():
     """Basic health check for uptime and ping monitoring."""
     return jsonify({"status": "ok", "message": "Athena bridge alive"}), 200
 
+# ---------------------------------------------------------------------
+# Metrics and traces
+# ---------------------------------------------------------------------
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition for this worker (Bearer METRICS_TOKEN if set)."""
+    if not telemetry.authorized(request.headers.get("Authorization")):
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(telemetry.REGISTRY.render(), mimetype=telemetry.CONTENT_TYPE)
+
+@app.get("/debug/traces")
+def debug_traces():
+    """Most recent sampled request traces in this worker (?limit=N)."""
+    if not telemetry.authorized(request.headers.get("Authorization")):
+        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        limit = _int_arg("limit", 20)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify({"sample_rate": telemetry.tracer.rate(),
+                    "traces": telemetry.tracer.recent_traces(limit)}), 200
+
 
 @app.post("/cap")
 def receive_cap():
-    """Accept one or many CAP payloads and forward them to GitHub."""
+    """
+    Accept one or many CAP payloads and queue them for GitHub (202 + tracking id).
+    A cap_id sealed before is not sealed again: its original result comes back
+    with "replayed": true (200 if nothing in the request was new).
+    """
+    claimed = []  # claimed, nothing in the ledger yet
+    sealed = []   # in the ledger, not yet queued
     try:
-        data = request.get_json(silent=True)
+        with timed("json_parse"):
+            data = request.get_json(silent=True)
         if not data:
             return jsonify({"error": "Empty or invalid JSON payload"}), 400
 
         # Normalize single CAP vs multiple CAPs
         payloads = data if isinstance(data, list) else [data]
+        tracking_id = uuid.uuid4().hex
         results = []
+        queued = []
+        here = {}
+        replayed = 0
 
         for payload in payloads:
+            if not isinstance(payload, dict):
+                results.append({"cap_id": "unknown", "error": "CAP payload must be a JSON object"})
+                continue
             required = ["cap_id", "timestamp", "domain", "context_mode"]
             missing = [f for f in required if f not in payload]
             if missing:
@@ -194,23 +463,57 @@ def receive_cap():
                 })
                 continue
 
+            keys = dedupe_keys(payload)
+            earlier = next((here[k] for k in keys if k in here), None)  # repeated within this request
+            if earlier is None:
+                with timed("dedupe"):
+                    earlier = seals.claim(keys)
+            if earlier == PENDING:
+                results.append({"cap_id": payload.get("cap_id"), "status": "in_progress",
+                                "error": "Another request is sealing this CAP"})
+                continue
+            if earlier is not None:
+                results.append(dict(earlier, replayed=True))
+                replayed += 1
+                continue
+            claimed.append(keys)
+
             reasoning = payload.get(
                 "reasoning_summary",
                 f"CAP received from domain '{payload.get('domain')}'."
             )
-            status = send_cap_payload(reasoning)
-
-            results.append({
+            sealed_payload, entry = build_cap_payload(reasoning, cap_id=payload.get("cap_id"))
+            queued.append(sealed_payload)
+            claimed.remove(keys)
+            result = {
                 "cap_id": payload.get("cap_id"),
                 "domain": payload.get("domain"),
-                "github_status": status
-            })
+                "sha256": entry.sha256,  # of the sealed record as written: what the next hash_prev links to
+                "status": "queued",
+                "tracking_id": tracking_id
+            }
+            sealed.append((keys, result))
+            results.append(result)
+            here.update(dict.fromkeys(keys, result))
 
+        if not queued:
+            if replayed:
+                return jsonify({"status": "duplicate", "processed": len(results), "results": results}), 200
+            return jsonify({"status": "rejected", "processed": len(results), "results": results}), 400
+
+        # All CAPs of one request share a tracking id and one durable commit.
+        with timed("dispatch_enqueue"):
+            dispatch.enqueue(queued, tracking_id=tracking_id)
+        seals.complete(sealed)
+        sealed = []
+        print(f"[{datetime.utcnow().isoformat()}] {len(queued)} CAP(s) queued ({tracking_id})")
         return jsonify({
-            "status": "received",
+            "status": "queued",
+            "tracking_id": tracking_id,
             "processed": len(results),
+            "queued": len(queued),
             "results": results
-        }), 200
+        }), 202
 
     except Exception as e:
         tb = traceback.format_exc()
@@ -219,6 +522,22 @@ def receive_cap():
             "error": str(e),
             "traceback": tb
         }), 500
+    finally:
+        if sealed:  # in the ledger already: a retry must replay, not append a second record
+            seals.complete([(keys, dict(result, status="sealed", tracking_id=None,
+                                        error="Sealed in the ledger but not queued for dispatch"))
+                            for keys, result in sealed])
+        for keys in claimed:  # not sealed: let a retry have them
+            seals.release(keys)
+
+
+@app.get("/cap/status/<tracking_id>")
+def cap_status(tracking_id):
+    """Delivery state of the CAPs queued under a tracking id."""
+    result = dispatch.status(tracking_id)
+    if result is None:
+        return jsonify({"error": "Unknown tracking id"}), 404
+    return jsonify(result), 200
 
 
 @app.get("/status")
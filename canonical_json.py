@@ -0,0 +1,402 @@
+# canonical_json.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Python twin of normalize.js (and sign_cap.js's canonical form).
+#          Produces the same bytes, and therefore the same SHA-256, as the
+#          Node tooling without spawning node: deep key sorting in JS order,
+#          whitespace collapsing with JS's \s, Number(x.toFixed(6)) rounding
+#          and JSON.stringify number/string formatting. orjson (when installed)
+#          or the stdlib C encoder serialise values in the range where their
+#          output is identical; stringify() handles everything else.
+#
+# Usage:
+#   python canonical_json.py normalize <input.json> [output.json]   # = node normalize.js
+#   python canonical_json.py hash <input.json>                      # canonical SHA-256
+#   python canonical_json.py sign <input.json> [output.json]        # = node sign_cap.js (cap_id required)
+
+import re, sys, json, hashlib, argparse
+from bisect import bisect_left
+
+try:
+    import orjson
+except ImportError:  # optional fast path
+    orjson = None
+
+# JavaScript's \s (and String.prototype.trim) — narrower than Python's.
+_JS_SPACE = re.compile("[\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff]+")
+_SURROGATE = re.compile("[\ud800-\udfff]")
+_MAX_SAFE_INT = 2 ** 53
+_MAX_INDEX = 4294967295  # keys below this that look like integers are JS array indices
+
+_quote = json.encoder.encode_basestring  # escapes exactly what JSON.stringify escapes
+
+
+class _Unsafe(Exception):
+    """Raised while preparing a C encoder fast path for values it formats differently."""
+
+class _JSObject(dict):
+    """A normalized object whose prototype normalize.js replaced (result["__proto__"] = {...})."""
+    proto = None
+
+_OBJECT_PROTOTYPE = object()  # Object.prototype, as reached through "__proto__"
+_UNDEFINED = object()
+
+# ---------------------------------------------------------------------
+# normalize.js: normalizeValue / sortObjectKeys
+# ---------------------------------------------------------------------
+def normalize_value(value, round_numbers=True):
+    """normalizeValue(): sorted keys, collapsed whitespace, numbers rounded to 6 decimals."""
+    return _normalize(value, round_numbers, None)
+
+def sort_object_keys(obj, round_numbers=True):
+    """sortObjectKeys(): a new dict in the order JavaScript would enumerate it."""
+    return _normalize_object(obj, round_numbers, None)
+
+def _normalize(value, rnd, check):
+    t = type(value)
+    if t is str:
+        return _normalize_string(value)
+    if t is dict:
+        return _normalize_object(value, rnd, check)
+    if t is float or t is int:
+        value = js_round(value) if rnd else _as_js_number(value)
+        return check(value) if check else value
+    if t is list or t is tuple:
+        return [_normalize(v, rnd, check) for v in value]
+    if value is None or t is bool:
+        return value
+    if isinstance(value, str):
+        return _normalize_string(str(value))
+    if isinstance(value, dict):
+        return _normalize_object(value, rnd, check)
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v, rnd, check) for v in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _normalize(float(value) if isinstance(value, float) else int(value), rnd, check)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _normalize_string(s):
+    if not s.isascii() and _SURROGATE.search(s):
+        s = _join_surrogates(s)
+    return _JS_SPACE.sub(" ", s).strip(" ")
+
+def _normalize_object(obj, rnd, check):
+    keys = _js_sorted(obj)
+    if "__proto__" not in obj:
+        return _index_keys_first({k: _normalize(obj[k], rnd, check) for k in keys}, keys)
+    out, proto = {}, None
+    for key in keys:
+        if key == "__proto__":
+            # result["__proto__"] = v never creates an own key: objects and arrays
+            # become the prototype, anything else is ignored.
+            value = _normalize(obj[key], rnd, check)
+            if isinstance(value, (dict, list)):
+                proto = value
+            continue
+        out[key] = _normalize(obj[key], rnd, check)
+    out = _index_keys_first(out, [k for k in keys if k != "__proto__"])
+    if proto is not None:
+        out = _JSObject(out)
+        out.proto = proto
+    return out
+
+def _js_sorted(obj):
+    """Object.keys(obj).sort(): UTF-16 code unit order."""
+    keys = sorted(obj)
+    try:
+        ascii_only = "".join(keys).isascii()
+    except TypeError:
+        raise TypeError("CAP object keys must be strings") from None
+    if ascii_only:
+        return keys
+    return sorted(keys, key=lambda k: k.encode("utf-16-be", "surrogatepass"))
+
+def _is_index(key):
+    return key.isascii() and key.isdigit() and (key == "0" or key[0] != "0") and int(key) < _MAX_INDEX
+
+def _index_keys_first(obj, sorted_keys=None):
+    """JS objects enumerate integer-like keys first, ascending, then strings in insertion order."""
+    if sorted_keys is not None:
+        # Keys starting with a digit are contiguous in sorted order.
+        lo, hi = bisect_left(sorted_keys, "0"), bisect_left(sorted_keys, ":")
+        if lo == hi:
+            return obj
+        indices = [k for k in sorted_keys[lo:hi] if _is_index(k)]
+    else:
+        indices = [k for k in obj if k[:1].isdigit() and _is_index(k)]
+    if not indices:
+        return obj
+    out = {k: obj[k] for k in sorted(indices, key=int)}
+    out.update((k, v) for k, v in obj.items() if k not in out)
+    return out
+
+def _join_surrogates(s):
+    """Python may hold a UTF-16 pair as two code points; JS sees one character."""
+    return s.encode("utf-16-le", "surrogatepass").decode("utf-16-le", "surrogatepass")
+
+# ---------------------------------------------------------------------
+# Numbers
+# ---------------------------------------------------------------------
+def _as_js_number(x):
+    """What JSON.parse would have produced for this number (an IEEE double)."""
+    if isinstance(x, int) and not -_MAX_SAFE_INT <= x <= _MAX_SAFE_INT:
+        return float(x)
+    return x
+
+def js_round(x):
+    """Number(x.toFixed(6)): exact decimal rounding of the double, ties away from zero."""
+    if type(x) is int:
+        return x if -_MAX_SAFE_INT <= x <= _MAX_SAFE_INT else js_round(float(x))
+    if not -1e21 < x < 1e21:
+        return x  # NaN, infinities and |x| >= 1e21 come back unchanged
+    # x is exactly halfway between two multiples of 1e-6 only if its reduced
+    # denominator is 2**7 (2e6 = 2**7 * 5**6); round() would pick the even one.
+    if (x * 128).is_integer() and not (x * 64).is_integer():
+        n = (abs(x.as_integer_ratio()[0]) * 15625 + 1) // 2  # x * 2e6 = num * 15625, exactly
+        return float(f"{'-' if x < 0 else ''}{n}e-6")
+    return round(x, 6)
+
+def js_number(x):
+    """Number::toString as used by JSON.stringify."""
+    if isinstance(x, int):
+        if -_MAX_SAFE_INT <= x <= _MAX_SAFE_INT:
+            return str(x)
+        x = float(x)
+    if x != x or x in (float("inf"), float("-inf")):
+        return "null"
+    if x == 0:
+        return "0"
+    if abs(x) <= _MAX_SAFE_INT and x.is_integer():
+        return str(int(x))
+    sign = "-" if x < 0 else ""
+    mantissa, _, exp = repr(abs(x)).partition("e")
+    whole, _, frac = mantissa.partition(".")
+    digits = (whole + frac).lstrip("0")
+    n = len(whole) + int(exp or 0) - (len(whole) + len(frac) - len(digits))
+    digits = digits.rstrip("0")
+    k = len(digits)
+    if k <= n <= 21:
+        return sign + digits + "0" * (n - k)
+    if 0 < n <= 21:
+        return sign + digits[:n] + "." + digits[n:]
+    if -6 < n <= 0:
+        return sign + "0." + "0" * -n + digits
+    e = n - 1
+    return sign + digits[0] + ("." + digits[1:] if k > 1 else "") + "e" + ("+" if e >= 0 else "-") + str(abs(e))
+
+def _fast_number(low):
+    """
+    Number check for a C encoder fast path: integral values become ints, and
+    fractions outside [low, 1e15) — which orjson / float.__repr__ write in
+    exponent form, unlike JSON.stringify — abort it.
+    """
+    def check(x):
+        if type(x) is int:
+            if -_MAX_SAFE_INT <= x <= _MAX_SAFE_INT:
+                return x
+            raise _Unsafe
+        if x.is_integer() and -_MAX_SAFE_INT <= x <= _MAX_SAFE_INT:
+            return int(x)
+        if low <= abs(x) < 1e15:
+            return x
+        raise _Unsafe
+    return check
+
+_orjson_number = _fast_number(1e-5)
+_json_number = _fast_number(1e-4)
+
+# ---------------------------------------------------------------------
+# JSON.stringify
+# ---------------------------------------------------------------------
+def stringify(value, indent=None, keys=None):
+    """
+    JSON.stringify(value, keys, indent) for JSON-compatible Python values.
+    `keys` is the property-list replacer: only those names, in that order,
+    at every nesting level.
+    """
+    parts = []
+    if keys is not None:
+        keys = list(dict.fromkeys(str(k) for k in keys))
+    _emit(value, parts, "\n" if indent else None, " " * (indent or 0), keys)
+    return "".join(parts)
+
+def _emit(value, parts, nl, step, keys):
+    if isinstance(value, str):
+        parts.append(_quote_js(value))
+    elif value is None:
+        parts.append("null")
+    elif value is True:
+        parts.append("true")
+    elif value is False:
+        parts.append("false")
+    elif isinstance(value, (int, float)):
+        parts.append(js_number(value))
+    elif isinstance(value, dict) or value is _OBJECT_PROTOTYPE:
+        if keys is None:
+            items = list(_index_keys_first(value).items())
+        else:
+            # The replacer reads obj[key], so inherited properties count too.
+            items = [(k, v) for k in keys for v in (_js_get(value, k),) if v is not _UNDEFINED]
+        if not items:
+            parts.append("{}")
+            return
+        inner = nl + step if nl else None
+        parts.append("{")
+        for i, (k, v) in enumerate(items):
+            if i:
+                parts.append(",")
+            if inner:
+                parts.append(inner)
+            parts.append(_quote_js(k))
+            parts.append(": " if nl else ":")
+            _emit(v, parts, inner, step, keys)
+        if nl:
+            parts.append(nl)
+        parts.append("}")
+    elif isinstance(value, (list, tuple)):
+        if not value:
+            parts.append("[]")
+            return
+        inner = nl + step if nl else None
+        parts.append("[")
+        for i, v in enumerate(value):
+            if i:
+                parts.append(",")
+            if inner:
+                parts.append(inner)
+            _emit(v, parts, inner, step, keys)
+        if nl:
+            parts.append(nl)
+        parts.append("]")
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _js_get(obj, key):
+    """obj[key] as JavaScript resolves it through the prototype chain (_UNDEFINED if absent)."""
+    if key == "__proto__" and not (isinstance(obj, dict) and key in obj):
+        return None if obj is _OBJECT_PROTOTYPE else _proto_of(obj)
+    while True:
+        if obj is _OBJECT_PROTOTYPE:
+            return _UNDEFINED  # everything else on Object.prototype is a function
+        if isinstance(obj, list):
+            if key == "length":
+                return len(obj)
+            return obj[int(key)] if _is_index(key) and int(key) < len(obj) else _UNDEFINED
+        if key in obj:
+            return obj[key]
+        obj = _proto_of(obj)
+
+def _proto_of(obj):
+    proto = getattr(obj, "proto", None)
+    return _OBJECT_PROTOTYPE if proto is None else proto
+
+def _quote_js(s):
+    quoted = _quote(s)
+    if _SURROGATE.search(quoted):
+        # Well-formed JSON.stringify escapes lone surrogates.
+        quoted = _SURROGATE.sub(lambda m: "\\u%04x" % ord(m.group()), _join_surrogates(quoted))
+    return quoted
+
+# ---------------------------------------------------------------------
+# Canonical forms and hashes
+# ---------------------------------------------------------------------
+def canonical_bytes(value, round_numbers=True):
+    """UTF-8 of JSON.stringify(normalizeValue(value)) — compact, hashed by canonical_hash()."""
+    return _serialize(value, round_numbers, None)
+
+def canonical_json(value, round_numbers=True):
+    return canonical_bytes(value, round_numbers).decode("utf-8", "surrogatepass")
+
+def canonical_hash(value, round_numbers=True):
+    """SHA-256 hex of the canonical form; identical for a CAP whichever tool touched it."""
+    return hashlib.sha256(canonical_bytes(value, round_numbers)).hexdigest()
+
+def normalized_bytes(value):
+    """The file normalize.js writes: JSON.stringify(normalizeValue(v), null, 2) + "\n"."""
+    return _serialize(value, True, 2) + b"\n"
+
+def _serialize(value, rnd, indent):
+    """orjson, then the stdlib C encoder, then stringify(): the first that is exact for `value`."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(_normalize(value, rnd, _orjson_number),
+                                option=orjson.OPT_INDENT_2 if indent else 0)
+        except (_Unsafe, TypeError, orjson.JSONEncodeError):
+            pass
+    try:
+        return json.dumps(_normalize(value, rnd, _json_number), ensure_ascii=False, indent=indent,
+                          separators=(",", ": ") if indent else (",", ":"),
+                          check_circular=False).encode("utf-8")
+    except (_Unsafe, UnicodeEncodeError):
+        pass  # out-of-range numbers or lone surrogates
+    return stringify(normalize_value(value, rnd), indent=indent).encode("utf-8", "surrogatepass")
+
+def signing_bytes(record):
+    """
+    sign_cap.js's canonical form: JSON.stringify(normalizeValue(data), Object.keys(data).sort()).
+    The key list acts as a replacer at every level, so nested objects keep
+    only keys that also appear at the top level — reproduced as-is.
+    """
+    keys = sorted(record, key=lambda k: k.encode("utf-16-be", "surrogatepass"))
+    return stringify(normalize_value(record), keys=keys).encode("utf-8", "surrogatepass")
+
+def ethics_signature(record):
+    """validator_signatures.ethics_signature as sign_cap.js computes it."""
+    return "SHA256:" + hashlib.sha256(signing_bytes(record)).hexdigest()
+
+def verify_ethics_signature(record):
+    """True if a sign_cap.js-style ("SHA256:...") ethics_signature matches the record."""
+    signatures = record.get("validator_signatures")
+    signature = signatures.get("ethics_signature") if isinstance(signatures, dict) else None
+    if not isinstance(signature, str):
+        return False
+    if ethics_signature(record) == signature:
+        return True
+    # sign_cap.js creates validator_signatures when missing, so the signed form had no such key.
+    if set(signatures) == {"ethics_signature"}:
+        return ethics_signature({k: v for k, v in record.items() if k != "validator_signatures"}) == signature
+    return False
+
+# ---------------------------------------------------------------------
+# CLI (mirrors normalize.js / sign_cap.js)
+# ---------------------------------------------------------------------
+def normalize_file(input_path, output_path=None):
+    with open(input_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    target = output_path or input_path
+    with open(target, "wb") as f:
+        f.write(normalized_bytes(data))
+    return target
+
+def sign_file(input_path, output_path=None):
+    with open(input_path, "r", encoding="utf-8") as f:
+        data = json.loads(normalized_bytes(json.load(f)))
+    if not data.get("cap_id"):
+        raise ValueError("cap_id is required (sign_cap.js would generate a UUIDv7)")
+    signature = ethics_signature(data)
+    data.setdefault("validator_signatures", {})["ethics_signature"] = signature
+    target = output_path or input_path
+    with open(target, "wb") as f:
+        f.write((stringify(data, indent=2) + "\n").encode("utf-8", "surrogatepass"))
+    return target, signature
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canonical JSON for CAP payloads (normalize.js compatible).")
+    parser.add_argument("cmd", choices=["normalize", "hash", "sign"])
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?")
+    args = parser.parse_args()
+
+    try:
+        if args.cmd == "normalize":
+            print(f"✅ Normalized JSON written to {normalize_file(args.input, args.output)}")
+        elif args.cmd == "hash":
+            with open(args.input, "r", encoding="utf-8") as f:
+                print(canonical_hash(json.load(f)))
+        else:
+            target, signature = sign_file(args.input, args.output)
+            print(f"🔐 {signature}")
+            print(f"📄 Signed payload written to: {target}")
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,321 @@
+# cap_dedupe.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Ingest-time duplicate and replay detection. Every accepted cap_id
+#          (and, optionally, the canonical hash of its content) is kept with
+#          its seal result in SQLite; a Bloom filter in front answers "never
+#          seen" without touching the database, so new CAPs cost one bit test
+#          and retries get the original result back instead of a second seal.
+#
+# Usage:
+#   python cap_dedupe.py stats <name>            # rows, filter size and fill
+#   python cap_dedupe.py seed <name> [ledger]    # remember every cap_id already in a ledger
+#   python cap_dedupe.py rebuild-filter <name>   # rebuild the Bloom filter from the index
+
+import os, json, math, time, struct, hashlib, sqlite3, argparse, threading
+from pathlib import Path
+from canonical_json import canonical_hash
+
+DEDUPE_CAPACITY = int(os.environ.get("DEDUPE_CAPACITY", "1000000"))        # keys before the filter is resized
+DEDUPE_ERROR_RATE = float(os.environ.get("DEDUPE_ERROR_RATE", "0.001"))    # Bloom false-positive target
+DEDUPE_CONTENT = os.environ.get("DEDUPE_CONTENT", "").lower() in ("1", "true", "yes")  # also match content
+DEDUPE_SAVE_EVERY = 10000  # new keys between Bloom filter snapshots
+DEDUPE_CLAIM_TIMEOUT = float(os.environ.get("DEDUPE_CLAIM_TIMEOUT", "300"))  # seconds before an unfinished claim lapses
+
+PENDING = "pending"  # claimed by a request that has not finished sealing yet
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    key         TEXT PRIMARY KEY,      -- id:<cap_id> or content:<canonical hash>
+    cap_id      TEXT,
+    result      TEXT,                  -- JSON seal result; NULL while pending
+    created_at  REAL NOT NULL          -- when stored, or when claimed while pending
+);
+"""
+
+_HEADER = struct.Struct("<8sQIq")  # magic, bits, hashes, rowid folded in
+_MAGIC = b"CAPBLOOM"
+
+# ---------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------
+def dedupe_keys(payload, content=None):
+    """The keys a payload is known by: its cap_id and, with content=True, a hash of everything else."""
+    keys = [f"id:{payload.get('cap_id')}"]
+    if DEDUPE_CONTENT if content is None else content:
+        body = {k: v for k, v in payload.items() if k != "cap_id"}
+        keys.append(f"content:{canonical_hash(body)}")
+    return keys
+
+# ---------------------------------------------------------------------
+# Bloom filter
+# ---------------------------------------------------------------------
+class BloomFilter:
+    """Fixed-size bit array with k positions per key (double hashing over one BLAKE2b digest)."""
+
+    def __init__(self, bits, hashes, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        return cls(bits, hashes)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return ((h1 + i * h2) % self.bits for i in range(self.hashes))
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.data[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, key):
+        return all(self.data[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def capacity(self, error_rate):
+        """Keys this filter holds at `error_rate`."""
+        return int(self.bits * math.log(2) ** 2 / -math.log(error_rate))
+
+    def fill(self):
+        """Fraction of bits set."""
+        return sum(bin(b).count("1") for b in self.data) / self.bits
+
+# ---------------------------------------------------------------------
+# Dedupe index
+# ---------------------------------------------------------------------
+class DedupeIndex:
+    """
+    Keys -> the first seal result, in LEDGER_STATE_DIR/cap_dedupe_<name>.sqlite3.
+
+    remember() stores new results and returns earlier ones; a caller whose
+    seal has side effects (the bridge appends to the ledger) claim()s its
+    keys first and complete()s or release()s them afterwards; a claim left
+    pending for DEDUPE_CLAIM_TIMEOUT (its request died) can be taken over. The Bloom
+    filter is snapshotted next to the database with the highest row folded
+    into it; rows written since, by this or any other process, are folded
+    in before a negative answer is trusted, so it never misses a key.
+    """
+
+    def __init__(self, name, db_path=None, capacity=None, error_rate=None):
+        from ledger_index import LEDGER_STATE_DIR
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / f"cap_dedupe_{name}.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.bloom_path = self.db_path.with_suffix(".bloom")
+        self.capacity = capacity or DEDUPE_CAPACITY
+        self.error_rate = error_rate or DEDUPE_ERROR_RATE
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._data_version = None
+        self._unsaved = 0
+        self._rows = 0  # highest rowid seen: rows ever stored, give or take released claims
+        self._claims = {}  # (thread, key) -> created_at of the claims this process holds
+        self.stats = {"new": 0, "replayed": 0, "pending": 0, "reclaimed": 0,
+                      "filter_negative": 0, "filter_false_positive": 0}
+        self._bloom, self._folded = self._load_filter()
+        self._catch_up(force=True)
+
+    def close(self):
+        with self._lock:
+            self.save_filter()
+            self._db.close()
+
+    # -----------------------------------------------------------------
+    # Lookups and writes
+    # -----------------------------------------------------------------
+    def lookup(self, keys):
+        """The earlier result (dict, or PENDING) for any of `keys`, else None."""
+        with self._lock:
+            return self._lookup(keys)
+
+    def remember(self, items):
+        """
+        Store (keys, result) pairs in one transaction, in order. Returns one
+        entry per pair: None if it was new (now stored), otherwise the
+        earlier result (dict, or PENDING), which is left untouched.
+        """
+        out = []
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._catch_up()  # under the write lock: nothing can commit unseen until we do
+                for keys, result in items:
+                    earlier = self._lookup(keys, caught_up=True)
+                    if earlier is None:
+                        self._insert(keys, result)
+                        self.stats["new"] += 1
+                    else:
+                        self.stats["pending" if earlier == PENDING else "replayed"] += 1
+                    out.append(earlier)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if self._rows > self._bloom.capacity(self.error_rate):
+                self.rebuild_filter()  # doubles it; amortised over the keys that filled it
+            elif self._unsaved >= DEDUPE_SAVE_EVERY:
+                self.save_filter()
+        return out
+
+    def claim(self, keys):
+        """Reserve `keys` before a seal with side effects; returns None, or the earlier result."""
+        return self.remember([(keys, None)])[0]
+
+    def complete(self, items):
+        """Attach results to claimed keys: (keys, result) pairs."""
+        thread = threading.get_ident()
+        with self._lock:
+            for keys, _ in items:
+                for k in keys:
+                    self._claims.pop((thread, k), None)
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.executemany("UPDATE seen SET result = ? WHERE key = ? AND result IS NULL",
+                                     [(json.dumps(result), k) for keys, result in items for k in keys])
+
+    def release(self, keys):
+        """Give up claims whose seal failed, so a retry can seal them (not one taken over since)."""
+        thread = threading.get_ident()
+        with self._lock:
+            self._db.executemany("DELETE FROM seen WHERE key = ? AND result IS NULL AND created_at = ?",
+                                 [(k, self._claims.pop((thread, k), None)) for k in keys])
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM seen").fetchone()[0]
+
+    def _lookup(self, keys, caught_up=False):
+        if not any(k in self._bloom for k in keys):
+            if not caught_up and self._catch_up() and any(k in self._bloom for k in keys):
+                return self._lookup(keys, caught_up=True)
+            self.stats["filter_negative"] += 1
+            return None
+        lapsed = False
+        for key in keys:
+            row = self._db.execute("SELECT result, created_at FROM seen WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                continue
+            if row[0] is not None:
+                return json.loads(row[0])
+            if row[1] >= time.time() - DEDUPE_CLAIM_TIMEOUT:
+                return PENDING
+            lapsed = True  # claimed by a request that never finished: free to take over
+        self.stats["reclaimed" if lapsed else "filter_false_positive"] += 1
+        return None
+
+    def _insert(self, keys, result):
+        cap_id = keys[0][len("id:"):] if keys[0].startswith("id:") else None
+        value = json.dumps(result) if result is not None else None
+        now = time.time()
+        thread = threading.get_ident()
+        for key in keys:
+            # A lapsed claim is overwritten in place; a stored result never is.
+            cur = self._db.execute("INSERT INTO seen VALUES (?, ?, ?, ?) ON CONFLICT(key) DO UPDATE SET "
+                                   "cap_id = excluded.cap_id, result = excluded.result, "
+                                   "created_at = excluded.created_at WHERE seen.result IS NULL",
+                                   (key, cap_id, value, now))
+            self._rows = max(self._rows, cur.lastrowid or 0)
+            self._bloom.add(key)
+            if value is None:
+                self._claims[(thread, key)] = now
+        self._unsaved += len(keys)
+
+    # -----------------------------------------------------------------
+    # Filter persistence
+    # -----------------------------------------------------------------
+    def _catch_up(self, force=False):
+        """Fold in rows other connections committed since the last look; True if there were any."""
+        version = self._db.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version and not force:
+            return False
+        self._data_version = version
+        rows = self._db.execute("SELECT rowid, key FROM seen WHERE rowid > ? ORDER BY rowid",
+                                (self._folded,)).fetchall()
+        for rowid, key in rows:
+            self._bloom.add(key)
+            self._folded = rowid
+        self._rows = max(self._rows, self._folded)
+        self._unsaved += len(rows)
+        return bool(rows)
+
+    def _load_filter(self):
+        """The snapshot on disk if it matches the index, else a filter rebuilt from every row."""
+        rows = self.count()
+        try:
+            with open(self.bloom_path, "rb") as f:
+                magic, bits, hashes, folded = _HEADER.unpack(f.read(_HEADER.size))
+                data = f.read()
+            max_rowid = self._db.execute("SELECT COALESCE(MAX(rowid), 0) FROM seen").fetchone()[0]
+            bloom = BloomFilter(bits, hashes, data)
+            if magic == _MAGIC and len(data) == (bits + 7) // 8 and folded <= max_rowid \
+                    and rows <= bloom.capacity(self.error_rate):
+                return bloom, folded
+        except (OSError, struct.error):
+            pass
+        return self._build_filter(rows)
+
+    def _build_filter(self, rows):
+        bloom = BloomFilter.for_capacity(max(self.capacity, 2 * rows), self.error_rate)
+        self._unsaved = 1
+        return bloom, 0  # _catch_up() folds every row in
+
+    def rebuild_filter(self):
+        with self._lock:
+            self._bloom, self._folded = self._build_filter(self.count())
+            self._catch_up(force=True)
+            self.save_filter()
+
+    def save_filter(self):
+        """Snapshot the filter (atomically) if keys were added since the last one."""
+        from ledger_store import write_atomic
+        with self._lock:
+            if not self._unsaved:
+                return
+            header = _HEADER.pack(_MAGIC, self._bloom.bits, self._bloom.hashes, self._folded)
+            write_atomic(self.bloom_path, header + bytes(self._bloom.data))
+            self._unsaved = 0
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+def seed(index, ledger_path):
+    """Remember the cap_id of every record already in a ledger (result: its ledger name)."""
+    from ledger_store import iter_ledger_records
+    batch, added = [], 0
+    for name, record in iter_ledger_records(ledger_path):
+        if record.get("cap_id"):
+            batch.append(([f"id:{record['cap_id']}"], {"cap_id": record["cap_id"], "status": "sealed",
+                                                        "ledger_name": name}))
+        if len(batch) >= 5000:
+            added += index.remember(batch).count(None)
+            batch = []
+    added += index.remember(batch).count(None)
+    index.save_filter()
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or seed a CAP dedupe index.")
+    parser.add_argument("cmd", choices=["stats", "seed", "rebuild-filter"])
+    parser.add_argument("name", help="index name (bridge, app)")
+    parser.add_argument("ledger", nargs="?", default=os.environ.get("LEDGER_PATH", "./CAP_LOGS"))
+    args = parser.parse_args()
+
+    index = DedupeIndex(args.name)
+    try:
+        if args.cmd == "seed":
+            print(f"✅ {seed(index, args.ledger)} cap_id(s) added from {args.ledger}")
+        elif args.cmd == "rebuild-filter":
+            index.rebuild_filter()
+            print(f"✅ Bloom filter rebuilt over {index.count()} key(s)")
+        else:
+            print(json.dumps({"keys": index.count(), "filter_bits": index._bloom.bits,
+                              "filter_hashes": index._bloom.hashes, "filter_fill": round(index._bloom.fill(), 4),
+                              "db": str(index.db_path)}, indent=2))
+    finally:
+        index.close()
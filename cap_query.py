@@ -0,0 +1,369 @@
+# cap_query.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Secondary indexes over CAP records (cap_id, domain, context mode,
+#          timestamp, validator status, CAP scores) so "all Governance CAPs in
+#          Advisor mode last month with hs < 0.8" is an index range scan with
+#          keyset (cursor) pagination instead of a walk over every JSON file.
+#
+# Usage:
+#   python cap_query.py sync [ledger]       # index records appended since the last sync
+#   python cap_query.py rebuild [ledger]    # re-index the whole ledger
+#   (queries: scripts/query_caps.py or GET /cap/query on the bridge)
+
+import os, re, json, base64, sqlite3, threading, argparse
+from pathlib import Path
+from datetime import datetime, timedelta
+from hash_engine import parallel_map
+from civic_drift import METRICS, extract_metrics
+from ledger_scan import parse_when
+
+SYNC_BATCH = 5000
+MAX_LIMIT = 1000
+
+# CAP score columns, named after the record keys (hs, er_delta, cai, ...).
+METRIC_COLUMNS = tuple(key for key, _ in METRICS.values())
+# Accepted spellings in a threshold: the column itself or the civic_drift name (HS, ERD, ...).
+_METRIC_NAMES = dict({c: c for c in METRIC_COLUMNS}, **{m.lower(): key for m, (key, _) in METRICS.items()})
+_OPS = {"<": "<", "<=": "<=", ">": ">", ">=": ">=", "=": "=", "==": "=", "!=": "<>"}
+_THRESHOLD = re.compile(r"^\s*([A-Za-z_]+)\s*(<=|>=|==|!=|<|>|=)\s*(\S+)\s*$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS caps (
+    position           INTEGER PRIMARY KEY,        -- ledger chain position
+    path               TEXT NOT NULL,              -- entry path (file or <segment>@<offset>)
+    cap_id             TEXT,
+    timestamp          TEXT,                       -- as written in the record
+    ts                 INTEGER NOT NULL,           -- microseconds since the epoch, -1 if unusable
+    domain             TEXT COLLATE NOCASE,
+    context_mode       TEXT COLLATE NOCASE,
+    validator_ethics   TEXT COLLATE NOCASE,
+    validator_empathy  TEXT COLLATE NOCASE,
+    status             TEXT COLLATE NOCASE,
+    %s
+);
+CREATE INDEX IF NOT EXISTS caps_cap_id ON caps(cap_id);
+CREATE INDEX IF NOT EXISTS caps_ts ON caps(ts);
+CREATE INDEX IF NOT EXISTS caps_domain ON caps(domain, context_mode, ts);
+CREATE INDEX IF NOT EXISTS caps_context_mode ON caps(context_mode, ts);
+CREATE INDEX IF NOT EXISTS caps_ethics ON caps(validator_ethics, ts);
+CREATE INDEX IF NOT EXISTS caps_empathy ON caps(validator_empathy, ts);
+CREATE INDEX IF NOT EXISTS caps_status ON caps(status, ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+""" % ",\n    ".join(f"{c} REAL" for c in METRIC_COLUMNS)
+
+_COLUMNS = ("position", "path", "cap_id", "timestamp", "ts", "domain", "context_mode",
+            "validator_ethics", "validator_empathy", "status") + METRIC_COLUMNS
+_INSERT = "INSERT OR REPLACE INTO caps (%s) VALUES (%s)" % (", ".join(_COLUMNS), ",".join("?" * len(_COLUMNS)))
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# ---------------------------------------------------------------------
+# Index rows
+# ---------------------------------------------------------------------
+def micros(value, end=False):
+    """Timestamp (any form parse_when() takes) as microseconds since the epoch; -1 if unusable."""
+    try:
+        when = parse_when(value, end=end)
+    except (TypeError, ValueError):
+        return -1
+    return -1 if when is None else (when - _EPOCH) // _MICROSECOND
+
+def _bound(value, end=False):
+    """micros() for a query bound; unlike record timestamps, a bad one is an error."""
+    try:
+        return (parse_when(value, end=end) - _EPOCH) // _MICROSECOND
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid {'until' if end else 'since'}: {value!r} (use YYYY, YYYY-MM, YYYY-MM-DD or ISO)")
+
+def _text(value):
+    return None if value is None else str(value)
+
+def index_row(position, path, record):
+    """The caps row for one parsed record."""
+    status = record.get("status")
+    if status is None and isinstance(record.get("integrity"), dict):
+        status = record["integrity"].get("signature_status")  # v3.5 records
+    _, _, values = extract_metrics(record)
+    return (position, path, _text(record.get("cap_id")), _text(record.get("timestamp")),
+            micros(record.get("timestamp")), _text(record.get("domain")), _text(record.get("context_mode")),
+            _text(record.get("validator_ethics")), _text(record.get("validator_empathy")),
+            _text(status)) + values
+
+def _scan_file(job):
+    """Worker: index row for one CAP file, or None if unreadable."""
+    root, position, path = job
+    try:
+        with open(os.path.join(root, path), "rb") as f:
+            record = json.loads(f.read())
+    except (OSError, ValueError, UnicodeDecodeError):
+        return None
+    return index_row(position, path, record) if isinstance(record, dict) else None
+
+def parse_threshold(text):
+    """'hs<0.8' -> ('hs', '<', 0.8). Raises ValueError for unknown metrics or operators."""
+    m = _THRESHOLD.match(text or "")
+    if not m:
+        raise ValueError(f"metric filter must look like 'hs<0.8', got {text!r}")
+    name, op, value = m.groups()
+    column = _METRIC_NAMES.get(name.lower())
+    if column is None:
+        raise ValueError(f"unknown metric {name!r} (choose from {', '.join(METRIC_COLUMNS)})")
+    try:
+        return column, _OPS[op], float(value)
+    except ValueError:
+        raise ValueError(f"metric filter {text!r} needs a numeric threshold")
+
+def encode_cursor(row, order):
+    raw = json.dumps([row["ts"], row["position"], order], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor, order):
+    try:
+        ts, position, cursor_order = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if cursor_order != order:
+            raise ValueError
+        return int(ts), int(position)
+    except (TypeError, ValueError):
+        raise ValueError("invalid cursor (cursors are only valid with the order they were issued for)")
+
+# ---------------------------------------------------------------------
+# Query index
+# ---------------------------------------------------------------------
+class QueryIndex:
+    """
+    SQLite table with one row per CAP (keyed by ledger position) and a
+    secondary index per filterable field, each ending in ts so a time range
+    and the sort order come from the same index. Writers call add() for
+    records they append; sync() then only has to pick up what other
+    processes wrote. Results are ordered by (ts, position) and paged with
+    an opaque cursor over that key, so page N costs the same as page 1.
+
+    Files are parsed on a thread pool; processes=True (the CLI) uses worker
+    processes instead, which must not be forked from a threaded server.
+    """
+
+    def __init__(self, db_path=None, jobs=None, processes=False):
+        from ledger_index import LEDGER_STATE_DIR
+        self.jobs = jobs
+        self.processes = processes
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "cap_query.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM caps").fetchone()[0]
+
+    # -----------------------------------------------------------------
+    # Maintenance
+    # -----------------------------------------------------------------
+    def add(self, entry, record):
+        """Index a record that was just appended at `entry` (the write path)."""
+        position = entry.position
+        with self._lock:
+            self._db.execute(_INSERT, index_row(position, entry.path, record))
+            # Advance the sync watermark only if this closes the gap behind it.
+            self._db.execute("UPDATE meta SET value = ? WHERE key = 'position' AND value = ?",
+                             (str(position), str(position - 1)))
+
+    def sync(self, ledger):
+        """Index ledger records after the watermark not already added on write; returns the number indexed."""
+        with self._lock:
+            after = int(self._meta("position") or 0)
+            if self._meta("root") != str(Path(ledger.root).resolve()) or not self._still_valid(ledger, after):
+                return self.rebuild(ledger)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                count = self._load(ledger, after)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return count
+
+    def rebuild(self, ledger):
+        """Drop everything and index the whole ledger."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM caps")
+                self._db.execute("DELETE FROM meta")
+                self._db.execute("INSERT INTO meta VALUES ('root', ?)", (str(Path(ledger.root).resolve()),))
+                count = self._load_cold(ledger) + self._load(ledger, 0)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("PRAGMA optimize")
+            return count
+
+    def _still_valid(self, ledger, after):
+        """False when the ledger was reindexed or truncated under the watermark."""
+        if not after:
+            return True
+        row = self._db.execute("SELECT path FROM caps WHERE position = ?", (after,)).fetchone()
+        if row is None:
+            return False
+        entry = ledger.at(after)
+        if entry is None:
+            cold = getattr(ledger, "cold", None)
+            return cold is not None and cold.covers(row[0])
+        return entry.path == row[0]
+
+    def _load_cold(self, ledger):
+        """Index archived records (ledger_archive.py) at positions -N..-1, ahead of the hot chain."""
+        cold = getattr(ledger, "cold", None)
+        total = cold.count() if cold is not None else 0
+        if not total:
+            return 0
+        rows, position = [], -total
+        for name, raw in cold.iter_raw():
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                record = None
+            if isinstance(record, dict):
+                rows.append(index_row(position, name, record))
+            position += 1
+        self._db.executemany(_INSERT, rows)
+        return len(rows)
+
+    def _load(self, ledger, after):
+        known = {r[0] for r in self._db.execute("SELECT position FROM caps WHERE position > ?", (after,))}
+        count, last, batch = 0, after, []
+        for entry in ledger.iter_chain(after_position=after):
+            last = entry.position
+            if entry.position not in known:
+                batch.append(entry)
+            if len(batch) == SYNC_BATCH:
+                count += self._load_batch(ledger, batch)
+                batch = []
+        count += self._load_batch(ledger, batch)
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('position', ?)", (str(last),))
+        return count
+
+    def _load_batch(self, ledger, batch):
+        if not batch:
+            return 0
+        if ledger.backend == "files":
+            root = str(ledger.root)
+            rows = parallel_map(_scan_file, [(root, e.position, e.path) for e in batch],
+                                jobs=self.jobs, processes=self.processes, chunksize=256)
+        else:
+            rows = (self._read_row(ledger, e) for e in batch)
+        rows = [r for r in rows if r is not None]
+        self._db.executemany(_INSERT, rows)
+        return len(rows)
+
+    @staticmethod
+    def _read_row(ledger, entry):
+        try:
+            record = json.loads(ledger.read_raw(entry))
+        except (OSError, ValueError):
+            return None
+        return index_row(entry.position, entry.path, record) if isinstance(record, dict) else None
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    # -----------------------------------------------------------------
+    # Queries
+    # -----------------------------------------------------------------
+    def query(self, cap_id=None, domains=None, context_modes=None, since=None, until=None,
+              validator_ethics=None, validator_empathy=None, status=None, thresholds=(),
+              limit=100, cursor=None, order="desc"):
+        """
+        One page of matching index rows (dicts) in (ts, position) order and
+        the cursor for the next page (None on the last). String filters are
+        case-insensitive; since/until take anything parse_when() does, until
+        inclusive. thresholds are (column, op, value) from parse_threshold().
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        limit = max(1, min(int(limit), MAX_LIMIT))
+        where, params = [], []
+        for column, values in (("cap_id", cap_id), ("domain", domains), ("context_mode", context_modes),
+                               ("validator_ethics", validator_ethics),
+                               ("validator_empathy", validator_empathy), ("status", status)):
+            if values is None or values == []:
+                continue
+            values = [values] if isinstance(values, str) else list(values)
+            if len(values) == 1:
+                where.append(f"{column} = ?")
+            else:
+                where.append(f"{column} IN (%s)" % ",".join("?" * len(values)))
+            params += values
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(_bound(since))
+        if until is not None:
+            where.append("ts <> -1 AND ts <= ?")
+            params.append(_bound(until, end=True))
+        for column, op, value in thresholds:
+            if column not in METRIC_COLUMNS or op not in _OPS.values():
+                raise ValueError(f"bad metric filter: {column} {op} {value}")
+            where.append(f"{column} {op} ?")
+            params.append(value)
+        if cursor:
+            ts, position = decode_cursor(cursor, order)
+            where.append("(ts, position) %s (?, ?)" % ("<" if order == "desc" else ">"))
+            params += [ts, position]
+
+        direction = "DESC" if order == "desc" else "ASC"
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM caps"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY ts {direction}, position {direction} LIMIT ?"
+        rows = [dict(zip(_COLUMNS, r)) for r in self._db.execute(sql, params + [limit + 1])]
+        next_cursor = encode_cursor(rows[limit - 1], order) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def records(self, ledger, rows):
+        """
+        (row, record) for query rows, reading each record from the ledger
+        (or its cold tier, once archived); skips vanished ones.
+        """
+        cold = getattr(ledger, "cold", None)
+        for row in rows:
+            entry = ledger.at(row["position"]) if row["position"] > 0 else None
+            try:
+                if entry is not None and entry.path == row["path"]:
+                    record = ledger.get(entry)
+                else:
+                    record = cold.get(row["path"]) if cold is not None else None
+            except (OSError, ValueError):
+                continue
+            if record is None:
+                print(f"[WARN] Query index is stale at position {row['position']}; run cap_query.py rebuild")
+                continue
+            yield row, record
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    from ledger_store import open_ledger
+    parser = argparse.ArgumentParser(description="Maintain the CAP query index.")
+    parser.add_argument("cmd", choices=["sync", "rebuild"])
+    parser.add_argument("ledger", nargs="?", default=os.environ.get("LEDGER_PATH", "./CAP_LOGS"))
+    parser.add_argument("--jobs", "-j", type=int, default=None)
+    args = parser.parse_args()
+
+    ledger = open_ledger(args.ledger)
+    index = QueryIndex(jobs=args.jobs, processes=True)
+    if args.cmd == "rebuild":
+        print(f"✅ Indexed {index.rebuild(ledger)} CAP records from {args.ledger}")
+    else:
+        print(f"✅ {index.sync(ledger)} record(s) indexed; {index.count()} CAP records total")
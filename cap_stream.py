@@ -0,0 +1,136 @@
+# cap_stream.py
+# Athena CAP Bridge – FalconForgeAI Implementation
+# Purpose: Incremental parsers for bulk CAP uploads (JSON array or NDJSON),
+#          so a batch is never held in memory as a whole.
+
+import codecs, json
+
+_WS = " \t\n\r"
+
+# ---------------------------------------------------------------------
+#  ERRORS
+# ---------------------------------------------------------------------
+class StreamFormatError(ValueError):
+    """The body is not a well-formed JSON array / NDJSON stream."""
+
+# ---------------------------------------------------------------------
+#  NDJSON
+# ---------------------------------------------------------------------
+async def iter_ndjson(chunks, max_item_bytes):
+    """
+    Yield (item, error) per non-empty line of an NDJSON byte stream.
+    A bad line yields (None, message) and parsing continues with the next one.
+    """
+    buf, dropping = b"", False
+    async for chunk in chunks:
+        if dropping:
+            # Skip the rest of an oversized record up to its newline, then carry on.
+            nl = chunk.find(b"\n")
+            if nl < 0:
+                continue
+            chunk, dropping = chunk[nl + 1:], False
+        buf += chunk
+        if b"\n" in chunk:
+            *lines, buf = buf.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _decode_line(line, max_item_bytes)
+        if len(buf) > max_item_bytes:
+            yield None, f"record exceeds {max_item_bytes} bytes"
+            buf, dropping = b"", True
+    if buf.strip():
+        yield _decode_line(buf, max_item_bytes)
+
+def _decode_line(line, max_item_bytes):
+    if len(line) > max_item_bytes:
+        return None, f"record exceeds {max_item_bytes} bytes"
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        return None, f"invalid JSON: {e}"
+
+# ---------------------------------------------------------------------
+#  JSON ARRAY
+# ---------------------------------------------------------------------
+async def iter_json_array(chunks, max_item_bytes):
+    """
+    Yield (item, None) for each element of a top-level JSON array, decoding
+    elements as soon as they are complete. A lone top-level object is
+    treated as a one-element batch. Structural errors raise StreamFormatError
+    since the array cannot be resynchronised after them.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos = "", 0
+    state = "start"   # start -> item|close -> comma|close -> ... -> done
+    eof = False
+    it = chunks.__aiter__()
+
+    while state != "done":
+        while pos < len(buf) and buf[pos] in _WS:
+            pos += 1
+        if pos >= len(buf):
+            if eof:
+                raise StreamFormatError("unexpected end of JSON body")
+            try:
+                buf = buf[pos:] + utf8.decode(await it.__anext__())
+            except StopAsyncIteration:
+                buf = buf[pos:] + utf8.decode(b"", final=True)
+                eof = True
+            pos = 0
+            continue
+
+        ch = buf[pos]
+        if state == "start":
+            if ch == "[":
+                pos += 1
+                state = "first"
+                continue
+            if ch != "{":
+                raise StreamFormatError("body must be a JSON array or object")
+            state = "single"
+        elif state in ("first", "comma_or_close"):
+            if ch == "]":
+                pos += 1
+                state = "done"
+                continue
+            if state == "comma_or_close":
+                if ch != ",":
+                    raise StreamFormatError(f"expected ',' or ']' at offset {pos}")
+                pos += 1
+                state = "item"
+                continue
+
+        # Decode one element, pulling more data until it is complete.
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+            if end == len(buf) and not eof and not isinstance(item, (dict, list)):
+                raise ValueError("scalar may continue in the next chunk")
+        except ValueError as e:
+            if eof:
+                raise StreamFormatError(f"invalid JSON element: {e}")
+            if len(buf) - pos > max_item_bytes:
+                raise StreamFormatError(f"record exceeds {max_item_bytes} bytes")
+            try:
+                buf = buf[pos:] + utf8.decode(await it.__anext__())
+            except StopAsyncIteration:
+                buf = buf[pos:] + utf8.decode(b"", final=True)
+                eof = True
+            pos = 0
+            continue
+
+        yield item, None
+        pos = end
+        state = "done" if state == "single" else "comma_or_close"
+
+    while True:
+        while pos < len(buf) and buf[pos] in _WS:
+            pos += 1
+        if pos < len(buf):
+            raise StreamFormatError("trailing data after JSON body")
+        if eof:
+            return
+        try:
+            buf, pos = utf8.decode(await it.__anext__()), 0
+        except StopAsyncIteration:
+            return
@@ -0,0 +1,215 @@
+# cap_tail.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Live tail of newly sealed CAP records (GET /cap/stream on the
+#          bridge). One follower thread per worker reads every new record
+#          once and fans it out through bounded per-subscriber buffers; a
+#          subscriber that falls behind is dropped, never waited on, so
+#          ingestion is not slowed by slow readers.
+
+import os, json, time, hashlib, threading
+from collections import deque
+
+TAIL_BUFFER = int(os.environ.get("TAIL_BUFFER", "1000"))                  # events buffered per subscriber
+TAIL_POLL_INTERVAL = float(os.environ.get("TAIL_POLL_INTERVAL", "1.0"))   # seconds; other workers' appends
+TAIL_HEARTBEAT = float(os.environ.get("TAIL_HEARTBEAT_SECONDS", "15"))   # keep-alive while idle
+TAIL_MAX_SUBSCRIBERS = int(os.environ.get("TAIL_MAX_SUBSCRIBERS", "8"))   # per worker; each holds a thread
+
+# ---------------------------------------------------------------------
+# Errors
+# ---------------------------------------------------------------------
+class TailFull(RuntimeError):
+    """Every subscriber slot in this worker is taken."""
+
+# ---------------------------------------------------------------------
+# Subscriptions
+# ---------------------------------------------------------------------
+class Subscription:
+    """
+    One subscriber's bounded buffer. The follower offer()s events and never
+    blocks: when the buffer is full the subscription is marked dropped and
+    emptied, and the reader gets SLOW_CONSUMER instead of the next event.
+    """
+
+    HEARTBEAT = "heartbeat"
+    SLOW_CONSUMER = "slow_consumer"
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.attached = False  # receives live events only once caught up (see LedgerTail.follow)
+        self.dropped = False
+        self._events = deque()
+        self._cond = threading.Condition()
+
+    def offer(self, event):
+        with self._cond:
+            if self.dropped:
+                return False
+            if len(self._events) >= self.maxsize:
+                self.dropped = True
+                self._events.clear()
+                self._cond.notify()
+                return False
+            self._events.append(event)
+            self._cond.notify()
+            return True
+
+    def get(self, timeout):
+        """The next event, HEARTBEAT after `timeout` seconds without one, or SLOW_CONSUMER."""
+        with self._cond:
+            if not self._events and not self.dropped:
+                self._cond.wait(timeout)
+            if self.dropped:
+                return self.SLOW_CONSUMER
+            return self._events.popleft() if self._events else self.HEARTBEAT
+
+# ---------------------------------------------------------------------
+# Follower
+# ---------------------------------------------------------------------
+class LedgerTail:
+    """
+    Follows one ledger (either backend) for this process. notify() after an
+    in-process append publishes at once; appends by other workers are
+    picked up every poll_interval seconds. Events are dicts:
+    {"position", "name", "cap_id", "sha256", "record"}.
+    """
+
+    def __init__(self, ledger, buffer=None, poll_interval=None, max_subscribers=None):
+        self.ledger = ledger
+        self.buffer = buffer or TAIL_BUFFER
+        self.poll_interval = poll_interval or TAIL_POLL_INTERVAL
+        self.max_subscribers = max_subscribers or TAIL_MAX_SUBSCRIBERS
+        self._subs = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._position = None
+        self.stats = {"published": 0, "dropped": 0, "rejected": 0}
+
+    def subscribers(self):
+        return len(self._subs)
+
+    def notify(self):
+        """Records were appended in this process: publish them without waiting for the next poll."""
+        if self._thread is not None:
+            self._wake.set()
+
+    def head(self):
+        """{"position", "name", "sha256"} of the chain head, or None for an empty ledger."""
+        entry = self.ledger.head()
+        if entry is None:
+            return None
+        return {"position": entry.position, "name": self.ledger.describe(entry), "sha256": _hex(entry.sha256)}
+
+    # -----------------------------------------------------------------
+    # Subscriber side
+    # -----------------------------------------------------------------
+    def subscribe(self):
+        """Reserve a subscriber slot (raises TailFull); attach it to receive live events."""
+        with self._lock:
+            if len(self._subs) >= self.max_subscribers:
+                self.stats["rejected"] += 1
+                raise TailFull(f"{self.max_subscribers} subscribers already connected")
+            sub = Subscription(self.buffer)
+            self._subs.add(sub)
+        self._start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def follow(self, sub, after_position=0, heartbeat=None):
+        """
+        Events after `after_position`, then live ones as they are sealed.
+        Yields Subscription.HEARTBEAT while idle and SLOW_CONSUMER (then
+        stops) once the subscriber fell more than `buffer` events behind;
+        it can resume from the last position it saw.
+        """
+        heartbeat = heartbeat or TAIL_HEARTBEAT
+        try:
+            last = after_position
+            # Catch up straight from the ledger first, so a long replay never fills the buffer ...
+            for event in self._replay(last):
+                last = event["position"]
+                yield event
+            # ... then attach and replay once more: anything sealed in between is either
+            # read here or published to the buffer, and duplicates are skipped by position.
+            sub.attached = True
+            for event in self._replay(last):
+                last = event["position"]
+                yield event
+            while True:
+                event = sub.get(heartbeat)
+                if event is Subscription.SLOW_CONSUMER:
+                    self.stats["dropped"] += 1
+                    yield event
+                    return
+                if event is Subscription.HEARTBEAT:
+                    yield event
+                elif event["position"] > last:
+                    last = event["position"]
+                    yield event
+        finally:
+            self.unsubscribe(sub)
+
+    def _replay(self, after_position):
+        for entry in self.ledger.iter_chain(after_position=after_position):
+            event = self._event(entry)
+            if event is not None:
+                yield event
+
+    # -----------------------------------------------------------------
+    # Follower thread
+    # -----------------------------------------------------------------
+    def _start(self):
+        """Start the follower in this process (idempotent; restarts after a fork)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            head = self.ledger.head()
+            self._position = head.position if head is not None else 0
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="ledger-tail", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                self._publish()
+            except Exception as e:
+                print(f"[WARN] Ledger tail: {e}")
+                time.sleep(self.poll_interval)
+
+    def _publish(self):
+        """Read each record appended since the last round once and offer it to every attached subscriber."""
+        entries = list(self.ledger.iter_chain(after_position=self._position))
+        if not entries:
+            return
+        # Subscribers attached after this point replay these entries themselves.
+        with self._lock:
+            subs = [s for s in self._subs if s.attached]
+        for entry in entries:
+            event = self._event(entry) if subs else None
+            if event is not None:
+                self.stats["published"] += 1
+                for sub in subs:
+                    sub.offer(event)
+            self._position = entry.position
+
+    def _event(self, entry):
+        try:
+            raw = self.ledger.read_raw(entry)
+            record = json.loads(raw)
+        except (OSError, ValueError):
+            return None  # vanished (archived) or unreadable; verification reports it
+        return {"position": entry.position, "name": self.ledger.describe(entry),
+                "cap_id": record.get("cap_id") if isinstance(record, dict) else None,
+                "sha256": hashlib.sha256(raw).hexdigest(), "record": record}
+
+
+def _hex(digest):
+    """Bare hex for an index sha256 (hex) or a "SHA256:<hex>" string."""
+    return str(digest).split(":", 1)[-1]
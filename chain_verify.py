@@ -0,0 +1,338 @@
+# chain_verify.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Incremental governance-chain verification with a persisted checkpoint,
+#          so routine /verify_chain calls only hash records added or changed since the last run.
+
+import os, json, hashlib
+from pathlib import Path
+from ledger_index import LEDGER_STATE_DIR
+
+CHECKPOINT_VERSION = 2
+VERIFY_BATCH = 2048  # entries re-stat'ed / re-hashed per pool round
+
+# ---------------------------------------------------------------------
+# Chain verifier
+# ---------------------------------------------------------------------
+class ChainVerifier:
+    """
+    Verifies hash_prev links over a LedgerIndex.
+
+    The checkpoint records the last verified entry (position, path, sha256,
+    mtime_ns, size), the breaks found so far and the index's directory
+    mtimes at the time. An incremental run:
+      1. re-reads the checkpoint file only if its mtime/size moved, and then
+         re-checks the link into it;
+      2. for each directory whose mtime moved since (a file in it was added,
+         replaced or removed), re-hashes its earlier entries whose mtime/size
+         changed and re-checks the links into and out of them; only if a
+         directory vanished or emptied is every earlier link re-checked;
+      3. verifies every entry after it, trusting the index hash of files
+         whose mtime/size still match what was indexed.
+    The result says which links were checked (verified_from through
+    verified_through); the rest stand as the last run left them.
+    full=True ignores the checkpoint and re-hashes every file.
+
+    With a cold tier (ledger_archive.ColdTier), a full pass first walks the
+    archived prefix of the chain from its footer digests (re-hashing it as
+    well when full=True) and links the first hot record to the archive tail.
+    Hot files left in an archived month by an interrupted archival run are
+    skipped; the archive is authoritative for that month.
+    """
+
+    def __init__(self, index, checkpoint_path=None, cold=None):
+        self.index = index
+        self.cold = cold
+        self.checkpoint_path = Path(checkpoint_path or Path(LEDGER_STATE_DIR) / "verify_checkpoint.json")
+
+    # -----------------------------------------------------------------
+    def verify(self, full=False):
+        self.index.sync()
+        if self.index.latest() is None:
+            self._clear_checkpoint()
+            return {"status": "empty", "message": "No CAP files found."}
+
+        checkpoint = None if full else self._load_checkpoint()
+        resumed = self._resume(checkpoint) if checkpoint else None
+        if resumed:
+            breaks, prev = resumed
+            start, mode = prev.position, "incremental"
+        else:
+            breaks, prev, start, mode = [], None, 0, "full"
+
+        checked = cold_checked = rechecked = 0
+        verified_from = None
+        archived = set()
+        if self.cold is not None:
+            archived = self.cold.months()
+            if mode == "full":
+                breaks, cold_checked, prev = self.cold.verify(full=full)
+        if mode == "incremental":
+            changed = self._recheck_changed(start, archived, breaks, checkpoint["dirs"])
+            breaks, rechecked = changed or self._recheck_prefix(start, archived, breaks)
+        for batch in _batched(self.index.iter_chain(after_position=start), VERIFY_BATCH):
+            for entry in self.index.refresh_many(batch, force=full):
+                if entry is None or (archived and self.cold.covers(entry.path, archived)):
+                    continue
+                if prev is not None:
+                    issue = _check_link(prev, entry)
+                    if issue:
+                        breaks.append(issue)
+                if verified_from is None:
+                    verified_from = entry.position
+                prev = entry
+                checked += 1
+
+        if prev is None or prev.position is None:
+            self._clear_checkpoint()
+            return {"status": "empty", "message": "No CAP files found."}
+        self._save_checkpoint(prev, breaks, self.index.dirs())
+        result = {"mode": mode, "checked": checked + cold_checked, "verified_from": verified_from,
+                  "verified_through": prev.position}
+        if cold_checked:
+            result["archived_checked"] = cold_checked
+        if mode == "incremental":
+            result["rechecked"] = rechecked
+        if breaks:
+            result.update(status="invalid", breaks=breaks)
+        elif mode == "full":
+            result.update(status="valid", message="All CAP links verified successfully.")
+        elif verified_from is None:
+            result.update(status="valid", message=f"No CAP links added since position {start}; "
+                                                  f"{rechecked} earlier link(s) re-checked.")
+        else:
+            result.update(status="valid", message=f"CAP links {verified_from}–{prev.position} verified; "
+                                                  f"{rechecked} earlier link(s) re-checked.")
+        return result
+
+    def _recheck_changed(self, start, archived, breaks, seen):
+        """
+        Re-check the links up to the checkpoint entry at `start` that touch an
+        entry in a directory whose mtime differs from `seen` (the checkpoint's
+        {dir: mtime_ns}). Returns (breaks, links re-checked), or None when a
+        directory vanished or lost every earlier entry: the gap it left can
+        only be found by _recheck_prefix().
+        """
+        current = self.index.dirs()
+        if any(d not in current for d in seen):
+            return None
+        parents = {d.rsplit("/", 1)[0] if "/" in d else "." for d in current if d != "."}
+        spans = []
+        for d, mtime_ns in current.items():
+            if d not in seen or seen[d] == mtime_ns:
+                continue  # unchanged, or new since: its entries all come after `start`
+            entries = [e for e in self.index.in_dir(d) if e.position <= start]
+            entries = [e for e in self.index.refresh_many(entries) if e is not None]
+            if not entries:
+                if d in parents:
+                    continue  # <year> (or the root): a month directory was added under it
+                return None
+            first, last = self.index.before(entries[0].position), self.index.after(entries[-1].position)
+            spans.append(((first or entries[0]).position, min(last.position if last else start, start)))
+
+        found, hi_seen = {}, None
+        for lo, hi in sorted(spans):
+            prev = None
+            if hi_seen is not None and lo <= hi_seen:  # overlaps the span before it
+                lo = hi_seen
+            for entry in self.index.iter_chain(after_position=lo - 1):
+                if entry.position > hi:
+                    break
+                if archived and self.cold.covers(entry.path, archived):
+                    continue
+                if prev is not None:
+                    found[entry.position] = _check_link(prev, entry)
+                prev = entry
+            hi_seen = max(hi, hi_seen or hi)
+        return _replace_breaks(breaks, found), len(found)
+
+    def _recheck_prefix(self, start, archived, breaks):
+        """
+        Re-check every link up to the checkpoint entry at `start` against the
+        index, re-hashing only files whose mtime/size changed (comparing
+        hashes is free; stat is the cost). Returns (breaks, links re-checked).
+        """
+        found, prev = {}, None
+        for batch in _batched(self.index.iter_chain(after_position=0), VERIFY_BATCH):
+            batch = [e for e in batch if e.position <= start]
+            if not batch:
+                break
+            for entry in self.index.refresh_many(batch):
+                if entry is None or (archived and self.cold.covers(entry.path, archived)):
+                    continue
+                if prev is not None:
+                    found[entry.position] = _check_link(prev, entry)
+                prev = entry
+        return _replace_breaks(breaks, found), len(found)
+
+    # -----------------------------------------------------------------
+    def _resume(self, checkpoint):
+        """Returns (breaks, checkpoint entry), or None when a full pass is needed."""
+        entry = self.index.at(checkpoint["position"])
+        if entry is None or entry.path != checkpoint["path"]:
+            return None
+        breaks = checkpoint["breaks"]
+
+        entry = self.index.refresh(entry)
+        if entry is None:
+            return None
+        if (entry.sha256, entry.mtime_ns, entry.size) != (
+                checkpoint["sha256"], checkpoint["mtime_ns"], checkpoint["size"]):
+            # The checkpointed record changed on disk: re-check the link into it.
+            breaks = [b for b in breaks if b.get("position") != entry.position]
+            prev = self.index.before(entry.position)
+            if prev is not None:
+                issue = _check_link(prev, entry)
+                if issue:
+                    breaks.append(issue)
+        return breaks, entry
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if checkpoint.get("version") != CHECKPOINT_VERSION:
+            return None
+        return checkpoint
+
+    def _save_checkpoint(self, entry, breaks, dirs):
+        checkpoint = {
+            "version": CHECKPOINT_VERSION,
+            "position": entry.position,
+            "path": entry.path,
+            "sha256": entry.sha256,
+            "mtime_ns": entry.mtime_ns,
+            "size": entry.size,
+            "breaks": breaks,
+            "dirs": dirs,
+        }
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _clear_checkpoint(self):
+        try:
+            self.checkpoint_path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _batched(iterable, n):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _replace_breaks(breaks, found):
+    """`breaks` with those at the positions in `found` ({position: issue or None}) replaced."""
+    breaks = [b for b in breaks if b.get("position") not in found]
+    breaks += [issue for issue in found.values() if issue]
+    breaks.sort(key=lambda b: b.get("position") or 0)
+    return breaks
+
+def _check_link(prev, curr):
+    actual_prev_hash = "SHA256:" + prev.sha256
+    if curr.hash_prev == actual_prev_hash:
+        return None
+    return {
+        "position": curr.position,
+        "previous_file": Path(prev.path).name,
+        "current_file": Path(curr.path).name,
+        "expected": curr.hash_prev,
+        "actual": actual_prev_hash
+    }
+
+# ---------------------------------------------------------------------
+# Segment ledgers (ledger_store.SegmentLedger)
+# ---------------------------------------------------------------------
+class SegmentChainVerifier:
+    """
+    Verifies hash_prev links over a segment ledger straight from its offset
+    index (record digest and hash_prev are stored per entry). Records are
+    never rewritten, so the checkpoint is just the last verified position
+    and its digest (in LEDGER_STATE_DIR, next to the file ledger's);
+    full=True also re-reads every frame and checks the index against the
+    bytes on disk.
+    """
+
+    def __init__(self, ledger, checkpoint_path=None):
+        self.ledger = ledger
+        self.checkpoint_path = Path(checkpoint_path or Path(LEDGER_STATE_DIR) / "segment_verify_checkpoint.json")
+
+    def verify(self, full=False):
+        if self.ledger.head() is None:
+            return {"status": "empty", "message": "No CAP records found."}
+
+        checkpoint = None if full else _load_json(self.checkpoint_path)
+        prev, breaks, mode = None, [], "full"
+        if checkpoint and checkpoint.get("version") == CHECKPOINT_VERSION:
+            entry = self.ledger.at(checkpoint["position"])
+            if entry is not None and entry.sha256 == checkpoint["sha256"]:
+                prev, breaks, mode = entry, checkpoint["breaks"], "incremental"
+
+        checked, verified_from = 0, None
+        start = prev.position if prev else 0
+        for entry in self.ledger.iter_chain(after_position=start):
+            if full:
+                issue = self._check_frame(entry)
+                if issue:
+                    breaks.append(issue)
+            if prev is not None and entry.hash_prev != "SHA256:" + prev.sha256:
+                breaks.append({
+                    "position": entry.position,
+                    "previous_file": self.ledger.describe(prev),
+                    "current_file": self.ledger.describe(entry),
+                    "expected": entry.hash_prev,
+                    "actual": "SHA256:" + prev.sha256,
+                })
+            if verified_from is None:
+                verified_from = entry.position
+            prev = entry
+            checked += 1
+
+        checkpoint = {"version": CHECKPOINT_VERSION, "position": prev.position,
+                      "sha256": prev.sha256, "breaks": breaks}
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.checkpoint_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self.checkpoint_path)
+
+        result = {"mode": mode, "checked": checked, "verified_from": verified_from,
+                  "verified_through": prev.position}
+        if breaks:
+            result.update(status="invalid", breaks=breaks)
+        elif mode == "full":
+            result.update(status="valid", message="All CAP links verified successfully.")
+        elif verified_from is None:
+            result.update(status="valid", message=f"No CAP links added since position {start}.")
+        else:
+            result.update(status="valid", message=f"CAP links {verified_from}–{prev.position} verified.")
+        return result
+
+    def _check_frame(self, entry):
+        """Re-hash the stored record and compare it with its index entry."""
+        try:
+            raw = self.ledger.read_raw(entry)
+        except (OSError, ValueError) as e:
+            return {"position": entry.position, "current_file": entry.path, "error": str(e)}
+        if hashlib.sha256(raw).hexdigest() != entry.sha256:
+            return {"position": entry.position, "current_file": self.ledger.describe(entry),
+                    "error": "record bytes do not match the index digest"}
+        return None
+
+
+
+def _load_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
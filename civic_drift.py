@@ -0,0 +1,486 @@
+# civic_drift.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Persistent, incremental civic-drift aggregates (HS, ERΔ, CAI and the
+#          other CAP scores) with per-day x domain rollups, so CCI over any
+#          window is answered from a few hundred rows instead of the whole ledger.
+#
+# Usage:
+#   python civic_drift.py ingest <payload_dir>    # pick up new/changed records
+#   python civic_drift.py rebuild <payload_dir>   # recompute everything from disk
+
+import os, json, math, sqlite3, argparse, datetime
+from contextlib import contextmanager
+from pathlib import Path
+from hash_engine import parallel_map
+from ledger_index import LEDGER_STATE_DIR
+from ledger_archive import COLD_DIR, ColdTier, iter_hot_files
+from ledger_scan import changed_dirs, parse_when
+from ledger_store import is_segment_ledger
+
+# Metric -> where it lives in a CAP record: top-level key first, then the
+# legacy {"metrics": {...}} block the old script read.
+METRICS = {
+    "HS":  ("hs", "HS"),
+    "ERD": ("er_delta", "ERD"),
+    "CAI": ("cai", "CAI"),
+    "EMS": ("ems", "EMS"),
+    "HCI": ("hci", "HCI"),
+    "HAA": ("haa", "HAA"),
+    "CW":  ("cw", "CW"),
+    "AD":  ("ad", "AD"),
+}
+_NAMES = tuple(METRICS)
+REBUILD_BATCH = 50000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    path      TEXT PRIMARY KEY,          -- relative to the payload root
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    day       TEXT NOT NULL,             -- YYYY-MM-DD, '' if the timestamp is unusable
+    domain    TEXT NOT NULL,
+    %s
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    day     TEXT NOT NULL,
+    domain  TEXT NOT NULL,
+    metric  TEXT NOT NULL,
+    n       INTEGER NOT NULL,
+    total   REAL NOT NULL,
+    sumsq   REAL NOT NULL,
+    PRIMARY KEY (day, domain, metric)
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path      TEXT PRIMARY KEY,
+    mtime_ns  INTEGER NOT NULL
+);
+""" % ",\n    ".join(f"{m} REAL" for m in _NAMES)
+
+_UPSERT_ROLLUP = (
+    "INSERT INTO rollups (day, domain, metric, n, total, sumsq) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (day, domain, metric) DO UPDATE SET "
+    "n = n + excluded.n, total = total + excluded.total, sumsq = sumsq + excluded.sumsq"
+)
+
+# ---------------------------------------------------------------------
+# Reading one record
+# ---------------------------------------------------------------------
+def extract_metrics(data):
+    """(day, domain, (value or None per METRICS)) for one parsed CAP record."""
+    legacy = data.get("metrics") if isinstance(data.get("metrics"), dict) else {}
+    values = []
+    for key, legacy_key in METRICS.values():
+        value = data.get(key, legacy.get(legacy_key))
+        try:
+            value = float(value) if value is not None and not isinstance(value, bool) else None
+        except (TypeError, ValueError):
+            value = None
+        values.append(value if value is None or math.isfinite(value) else None)
+    try:
+        day = parse_when(data.get("timestamp")).date().isoformat()
+    except (AttributeError, TypeError, ValueError):
+        day = ""
+    return day, str(data.get("domain") or ""), tuple(values)
+
+def scan_record(job):
+    """(rel, mtime_ns, size, day, domain, values) or None for unreadable/non-CAP files."""
+    root, rel = job
+    full = os.path.join(root, rel)
+    try:
+        st = os.stat(full)
+        with open(full, "rb") as f:
+            data = json.loads(f.read())
+    except (OSError, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(data, dict):
+        return None
+    day, domain, values = extract_metrics(data)
+    return rel, st.st_mtime_ns, st.st_size, day, domain, values
+
+def cold_rows(archive):
+    """scan_record()-shaped rows for one cold archive (keyed by each record's original path)."""
+    for i in range(archive.count):
+        raw = archive.read_raw(i)
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            day, domain, values = extract_metrics(data)
+            yield archive.entry(i).path, 0, len(raw), day, domain, values
+
+# ---------------------------------------------------------------------
+# Window statistics
+# ---------------------------------------------------------------------
+class Stat:
+    """Count / sum / sum of squares for one metric; mergeable."""
+
+    __slots__ = ("n", "total", "sumsq")
+
+    def __init__(self, n=0, total=0.0, sumsq=0.0):
+        self.n, self.total, self.sumsq = n, total, sumsq
+
+    def add(self, n, total, sumsq):
+        self.n += n
+        self.total += total
+        self.sumsq += sumsq
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else 0
+
+    @property
+    def variance(self):
+        """Population variance (clamped: sums-of-squares can dip below 0 by rounding)."""
+        if not self.n:
+            return 0
+        return max(0.0, self.sumsq / self.n - self.mean ** 2)
+
+    def as_dict(self):
+        return {"n": self.n, "mean": round(self.mean, 6), "variance": round(self.variance, 6),
+                "stddev": round(math.sqrt(self.variance), 6)}
+
+
+def civic_index(stats):
+    """CCI = (HS + (1 - ERΔ) + CAI) / 3, with a missing metric counting as 0 (as before)."""
+    hs, erd, cai = (round(stats[m].mean, 3) if m in stats else 0 for m in ("HS", "ERD", "CAI"))
+    return round((hs + (1 - erd) + cai) / 3, 3)
+
+# ---------------------------------------------------------------------
+# Drift store
+# ---------------------------------------------------------------------
+class DriftStore:
+    """
+    SQLite store of per-record metric values plus (day, domain, metric)
+    rollups of n / sum / sum-of-squares. ingest() touches only records in
+    directories whose mtime moved (or every file's stat with rescan=True),
+    subtracting a changed record's old contribution before adding the new
+    one; on a segment ledger it reads just the records appended since the
+    last run. Window queries aggregate rollup rows only.
+
+    Months moved to the cold tier (ledger_archive.py) keep their rows: an
+    archived month's directory disappearing is not a deletion, and each
+    new archive is folded in once, under the records' original paths.
+    """
+
+    def __init__(self, payload_dir, db_path=None, jobs=None):
+        self.root = Path(payload_dir)
+        self.jobs = jobs
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "civic_drift.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    # -----------------------------------------------------------------
+    # Ingest
+    # -----------------------------------------------------------------
+    def ingest(self, rescan=False):
+        """Fold new, changed and deleted records into the rollups; returns the number of changes."""
+        if self._meta("root") != str(self.root.resolve()):
+            return self.rebuild()
+        if is_segment_ledger(self.root):
+            return self._ingest_segments()
+        stored_dirs, stored_cold = {}, {}
+        for d, mtime_ns in self._db.execute("SELECT path, mtime_ns FROM dirs"):
+            (stored_cold if d.startswith(COLD_DIR + "/") else stored_dirs)[d] = mtime_ns
+        changed, seen = changed_dirs(self.root, {} if rescan else stored_dirs)
+        vanished = [d for d in stored_dirs if d not in seen]
+        cold = ColdTier(self.root)
+        archived = cold.months()
+        cold_now = {f"{COLD_DIR}/{a.name}": (a, os.stat(a.path).st_mtime_ns) for a in cold.archives()}
+        cold_new = [k for k, (_, m) in cold_now.items() if stored_cold.get(k) != m]
+        cold_gone = [k for k in stored_cold if k not in cold_now]
+        if not changed and not vanished and not cold_new and not cold_gone:
+            cold.close()
+            return 0
+
+        stale, todo = [], []
+        for k in cold_gone:
+            stale += self._indexed_in(k[len(COLD_DIR) + 1:-len(".capa")].replace("-", "/"))
+        for d, _, on_disk in changed:
+            if d in archived:
+                continue  # hot leftovers of an interrupted archival: the archive is authoritative
+            indexed = self._indexed_in(d)
+            for rel in on_disk:
+                try:
+                    st = os.stat(self.root / rel)
+                except FileNotFoundError:
+                    continue
+                if indexed.pop(rel, None) != (st.st_mtime_ns, st.st_size):
+                    todo.append(rel)
+            stale += indexed  # listed in the store but no longer on disk
+        for d in vanished:
+            if d not in archived:
+                stale += self._indexed_in(d)
+
+        deltas = {}
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for rel in stale:
+                self._remove(rel, deltas)
+            root = str(self.root)
+            for rel, row in zip(todo, parallel_map(scan_record, [(root, r) for r in todo], jobs=self.jobs)):
+                self._remove(rel, deltas)
+                if row is not None:
+                    self._insert(row, deltas)
+            for k in cold_new:
+                for row in cold_rows(cold_now[k][0]):
+                    self._remove(row[0], deltas)
+                    self._insert(row, deltas)
+                    todo.append(row[0])
+            self._apply(deltas)
+            for d, mtime_ns, _ in changed:
+                self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (d, mtime_ns))
+            for k in cold_new:
+                self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (k, cold_now[k][1]))
+            for d in vanished + cold_gone:
+                self._db.execute("DELETE FROM dirs WHERE path = ?", (d,))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        finally:
+            cold.close()
+        return len(stale) + len(todo)
+
+    def rebuild(self):
+        """Recompute everything from disk, aggregating each batch with NumPy."""
+        if is_segment_ledger(self.root):
+            with self._replacing():
+                return self._load_segments(after_position=0)
+        root = str(self.root)
+        rels = (os.path.relpath(p, root).replace(os.sep, "/") for p in iter_hot_files(root))
+        cold = ColdTier(self.root)
+        try:
+            with self.reloading() as load:
+                count = load(r for r in parallel_map(scan_record, ((root, rel) for rel in rels), jobs=self.jobs,
+                                                     processes=True, chunksize=256) if r is not None)
+                for archive in cold.archives():
+                    count += load(cold_rows(archive))
+        finally:
+            cold.close()
+        return count
+
+    @contextmanager
+    def reloading(self):
+        """
+        Replace everything, in one transaction, with the rows passed to the
+        yielded load(rows) (scan_record()-shaped, archived records included;
+        call it any number of times). Files ledgers only; used by rebuild()
+        and by scripts/nightly_pipeline.py, which pushes rows it already parsed.
+        """
+        # Snapshot directories first: files written during the load show up as changes.
+        changed, _ = changed_dirs(self.root, {})
+        cold = ColdTier(self.root)
+        archives = [(f"{COLD_DIR}/{a.name}", os.stat(a.path).st_mtime_ns) for a in cold.archives()]
+        cold.close()
+        with self._replacing():
+            yield self._load_rows
+            self._db.executemany("INSERT INTO dirs VALUES (?, ?)", archives)
+            self._db.executemany("INSERT INTO dirs VALUES (?, ?)", ((d, m) for d, m, _ in changed))
+
+    @contextmanager
+    def _replacing(self):
+        """Transaction that empties the store; the caller loads it back."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for table in ("records", "rollups", "dirs", "meta"):
+                self._db.execute(f"DELETE FROM {table}")
+            yield
+            self._db.execute("INSERT INTO meta VALUES ('root', ?)", (str(self.root.resolve()),))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _ingest_segments(self):
+        """Segment ledgers only ever grow: fold in the records after the last one ingested."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._load_segments(after_position=int(self._meta("position") or 0))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return count
+
+    def _load_segments(self, after_position):
+        from ledger_store import SegmentLedger
+        ledger = SegmentLedger(self.root)
+        last = after_position
+
+        def rows():
+            nonlocal last
+            for entry in ledger.iter_chain(after_position=after_position):
+                last = entry.position
+                try:
+                    data = json.loads(ledger.read_raw(entry))
+                except ValueError:
+                    continue
+                if isinstance(data, dict):
+                    day, domain, values = extract_metrics(data)
+                    yield f"#{entry.position}", 0, entry.length, day, domain, values
+
+        count = self._load_rows(rows())
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('position', ?)", (str(last),))
+        return count
+
+    def _load_rows(self, rows):
+        count, batch = 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == REBUILD_BATCH:
+                count += self._load_batch(batch)
+                batch = []
+        return count + self._load_batch(batch)
+
+    # -----------------------------------------------------------------
+    # Queries
+    # -----------------------------------------------------------------
+    def summary(self, since=None, until=None, domains=None):
+        """{metric: Stat} over the window (None = all time, including undated records)."""
+        stats = {}
+        for _, _, metric, n, total, sumsq in self._rollups(since, until, domains):
+            stats.setdefault(metric, Stat()).add(n, total, sumsq)
+        return stats
+
+    def series(self, by="day", since=None, until=None, domains=None):
+        """[(bucket, {metric: Stat})] in bucket order; by = day | week | month | domain."""
+        buckets = {}
+        for day, domain, metric, n, total, sumsq in self._rollups(since, until, domains):
+            if by == "domain":
+                key = domain
+            elif not day:
+                key = ""
+            elif by == "week":
+                year, week, _ = datetime.date.fromisoformat(day).isocalendar()
+                key = f"{year}-W{week:02d}"
+            elif by == "month":
+                key = day[:7]
+            else:
+                key = day
+            buckets.setdefault(key, {}).setdefault(metric, Stat()).add(n, total, sumsq)
+        return sorted(buckets.items())
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+    def _rollups(self, since, until, domains):
+        where, params = [], []
+        if since is not None:
+            where.append("day >= ?")
+            params.append(parse_when(since).date().isoformat())
+        if until is not None:
+            where.append("day <> '' AND day <= ?")
+            params.append(parse_when(until, end=True).date().isoformat())
+        if domains:
+            where.append("lower(domain) IN (%s)" % ",".join("?" * len(domains)))
+            params += [d.lower() for d in domains]
+        sql = "SELECT day, domain, metric, n, total, sumsq FROM rollups"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return self._db.execute(sql, params)
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _indexed_in(self, d):
+        """{path: (mtime_ns, size)} for stored records directly inside directory `d`."""
+        prefix = "" if d == "." else d + "/"
+        like = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return {r[0]: (r[1], r[2]) for r in self._db.execute(
+            "SELECT path, mtime_ns, size FROM records WHERE path LIKE ? ESCAPE '\\' "
+            "AND path NOT LIKE ? ESCAPE '\\'", (like + "%", like + "%/%"))}
+
+    def _insert(self, row, deltas):
+        rel, mtime_ns, size, day, domain, values = row
+        self._db.execute("INSERT INTO records VALUES (%s)" % ",".join("?" * (5 + len(_NAMES))),
+                         (rel, mtime_ns, size, day, domain) + values)
+        _accumulate(deltas, day, domain, values, 1)
+
+    def _remove(self, rel, deltas):
+        row = self._db.execute(f"SELECT day, domain, {', '.join(_NAMES)} FROM records WHERE path = ?",
+                               (rel,)).fetchone()
+        if row is None:
+            return
+        self._db.execute("DELETE FROM records WHERE path = ?", (rel,))
+        _accumulate(deltas, row[0], row[1], row[2:], -1)
+
+    def _apply(self, deltas):
+        self._db.executemany(_UPSERT_ROLLUP, ((day, domain, metric, n, total, sumsq)
+                                              for (day, domain, metric), (n, total, sumsq) in deltas.items()
+                                              if n or total or sumsq))
+        self._db.execute("DELETE FROM rollups WHERE n <= 0")
+
+    def _load_batch(self, batch):
+        if not batch:
+            return 0
+        self._db.executemany("INSERT INTO records VALUES (%s)" % ",".join("?" * (5 + len(_NAMES))),
+                             ((r[0], r[1], r[2], r[3], r[4]) + r[5] for r in batch))
+        self._db.executemany(_UPSERT_ROLLUP, _aggregate(batch))
+        return len(batch)
+
+
+def _accumulate(deltas, day, domain, values, sign):
+    for metric, value in zip(_NAMES, values):
+        if value is None:
+            continue
+        d = deltas.setdefault((day, domain, metric), [0, 0.0, 0.0])
+        d[0] += sign
+        d[1] += sign * value
+        d[2] += sign * value * value
+
+def _aggregate(batch):
+    """(day, domain, metric, n, total, sumsq) rows for a batch of scanned records."""
+    try:
+        import numpy as np
+    except ImportError:
+        deltas = {}
+        for _, _, _, day, domain, values in batch:
+            _accumulate(deltas, day, domain, values, 1)
+        return [k + tuple(v) for k, v in deltas.items()]
+
+    keys, group = np.unique(np.array([f"{r[3]}\x1f{r[4]}" for r in batch]), return_inverse=True)
+    values = np.array([r[5] for r in batch], dtype=np.float64)  # None -> nan
+    out = []
+    for col, metric in enumerate(_NAMES):
+        v = values[:, col]
+        present = ~np.isnan(v)
+        g, v = group[present], v[present]
+        n = np.bincount(g, minlength=len(keys))
+        total = np.bincount(g, weights=v, minlength=len(keys))
+        sumsq = np.bincount(g, weights=v * v, minlength=len(keys))
+        for k in np.flatnonzero(n):
+            day, domain = str(keys[k]).split("\x1f", 1)
+            out.append((day, domain, metric, int(n[k]), float(total[k]), float(sumsq[k])))
+    return out
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the civic drift aggregates.")
+    parser.add_argument("cmd", choices=["ingest", "rebuild"])
+    parser.add_argument("payload_dir", nargs="?", default=os.environ.get("LEDGER_PATH", "./CAP_LOGS"))
+    parser.add_argument("--rescan", action="store_true", help="stat every file, not just changed directories")
+    parser.add_argument("--jobs", "-j", type=int, default=None)
+    args = parser.parse_args()
+
+    store = DriftStore(args.payload_dir, jobs=args.jobs)
+    if args.cmd == "rebuild":
+        print(f"✅ Aggregated {store.rebuild()} CAP records from {args.payload_dir}")
+    else:
+        print(f"✅ {store.ingest(rescan=args.rescan)} change(s) ingested; {store.count()} CAP records total")
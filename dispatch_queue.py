@@ -0,0 +1,304 @@
+# dispatch_queue.py
+# Athena CAP Bridge – FalconForgeAI Implementation
+# Purpose: Durable outbound queue for GitHub repository_dispatch events. CAPs
+#          are committed to SQLite and acknowledged at once; a background
+#          sender coalesces them into batched dispatches over a pooled session,
+#          retrying 5xx/429 with backoff and pausing for GitHub rate limits.
+
+import os, json, time, uuid, random, sqlite3, threading
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from telemetry import github_call
+
+DISPATCH_MAX_BATCH = int(os.environ.get("DISPATCH_MAX_BATCH", "25"))          # CAPs per dispatch event
+DISPATCH_MAX_BYTES = int(os.environ.get("DISPATCH_MAX_BYTES", str(60 * 1024)))  # client_payload budget
+DISPATCH_MAX_ATTEMPTS = int(os.environ.get("DISPATCH_MAX_ATTEMPTS", "8"))
+DISPATCH_BACKOFF = float(os.environ.get("DISPATCH_BACKOFF_SECONDS", "2"))
+DISPATCH_BACKOFF_MAX = float(os.environ.get("DISPATCH_BACKOFF_MAX_SECONDS", "300"))
+DISPATCH_TIMEOUT = (float(os.environ.get("DISPATCH_CONNECT_TIMEOUT", "5")),
+                    float(os.environ.get("DISPATCH_READ_TIMEOUT", "30")))
+DISPATCH_LEASE = 120          # seconds before a claimed-but-unfinished batch is retried
+DISPATCH_RETENTION = 7 * 86400  # sent/failed rows kept this long for /cap/status
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id            INTEGER PRIMARY KEY,
+    tracking_id   TEXT NOT NULL,
+    cap_id        TEXT,
+    payload       TEXT NOT NULL,          -- JSON cap_payload
+    status        TEXT NOT NULL,          -- queued | sending | sent | failed
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    next_attempt  REAL NOT NULL,
+    claimed_at    REAL,
+    created_at    REAL NOT NULL,
+    finished_at   REAL,
+    http_status   INTEGER,
+    error         TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox(status, next_attempt);
+CREATE INDEX IF NOT EXISTS outbox_tracking ON outbox(tracking_id);
+"""
+
+# ---------------------------------------------------------------------
+# Dispatch queue
+# ---------------------------------------------------------------------
+class DispatchQueue:
+    """
+    enqueue() commits payloads and returns a tracking id; a daemon thread
+    (start(), once per process, and again by enqueue() after a fork) drains
+    the queue. Rows are claimed
+    inside a write transaction, so several gunicorn workers can share one
+    queue file without sending anything twice.
+    """
+
+    def __init__(self, url, headers=None, db_path=None, event_type="wake_listener",
+                 max_batch=None, max_bytes=None, session=None):
+        from ledger_index import LEDGER_STATE_DIR
+        self.url = url
+        self.headers = dict(headers or {})
+        self.event_type = event_type
+        self.max_batch = max_batch or DISPATCH_MAX_BATCH
+        self.max_bytes = max_bytes or DISPATCH_MAX_BYTES
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "dispatch_queue.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._session = session
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._paused_until = 0.0
+        self.stats = {"dispatches": 0, "sent": 0, "retries": 0, "failed": 0, "rate_limited": 0}
+        db = self._connect()
+        db.executescript(_SCHEMA)
+        db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=FULL")
+        return db
+
+    # -----------------------------------------------------------------
+    # Producer side
+    # -----------------------------------------------------------------
+    def enqueue(self, payloads, tracking_id=None):
+        """Durably queue cap payloads; returns their tracking id."""
+        tracking_id = tracking_id or uuid.uuid4().hex
+        now = time.time()
+        db = self._connect()
+        try:
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                db.executemany(
+                    "INSERT INTO outbox (tracking_id, cap_id, payload, status, next_attempt, created_at) "
+                    "VALUES (?, ?, ?, 'queued', ?, ?)",
+                    [(tracking_id, p.get("cap_id"), json.dumps(p), now, now) for p in payloads])
+        finally:
+            db.close()
+        self.start()
+        self._wake.set()
+        return tracking_id
+
+    def status(self, tracking_id):
+        """Per-item delivery state for a tracking id, or None if unknown."""
+        db = self._connect()
+        try:
+            rows = db.execute("SELECT id, cap_id, status, attempts, http_status, error, created_at, finished_at "
+                              "FROM outbox WHERE tracking_id = ? ORDER BY id", (tracking_id,)).fetchall()
+        finally:
+            db.close()
+        if not rows:
+            return None
+        counts = {"queued": 0, "sending": 0, "sent": 0, "failed": 0}
+        items = []
+        for row_id, cap_id, status, attempts, http_status, error, created_at, finished_at in rows:
+            counts[status] += 1
+            items.append({"id": row_id, "cap_id": cap_id, "status": status, "attempts": attempts,
+                          "github_status": http_status, "error": error})
+        done = counts["queued"] == counts["sending"] == 0
+        state = ("sent" if not counts["failed"] else "failed" if not counts["sent"] else "partial") if done else "pending"
+        return {"tracking_id": tracking_id, "status": state, "counts": counts, "items": items}
+
+    def depth(self):
+        db = self._connect()
+        try:
+            return db.execute("SELECT COUNT(*) FROM outbox WHERE status IN ('queued', 'sending')").fetchone()[0]
+        finally:
+            db.close()
+
+    # -----------------------------------------------------------------
+    # Sender thread
+    # -----------------------------------------------------------------
+    def start(self):
+        """Start the sender in this process (idempotent; restarts after a fork)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._session = None  # never share a pooled session across a fork
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="dispatch-sender", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def drain(self, timeout=30):
+        """Block until nothing is queued or in flight (tests, shutdown)."""
+        deadline = time.monotonic() + timeout
+        while self.depth() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.depth() == 0
+
+    def _run(self):
+        db = self._connect()
+        last_purge = 0.0
+        try:
+            while not self._stop.is_set():
+                now = time.time()
+                if now - last_purge > 3600:
+                    self._purge(db, now)
+                    last_purge = now
+                wait = self._paused_until - now
+                if wait <= 0:
+                    batch = self._claim(db, now)
+                    if batch:
+                        self._send(db, batch)
+                        continue
+                    wait = self._next_due(db, now)
+                self._wake.wait(timeout=min(max(wait, 0.05), 30))
+                self._wake.clear()
+        except Exception as e:
+            print(f"[WARN] Dispatch sender stopped: {e}")
+        finally:
+            db.close()
+
+    def _claim(self, db, now):
+        """Mark up to max_batch due rows (within the byte budget) as sending and return them."""
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("UPDATE outbox SET status = 'queued' WHERE status = 'sending' AND claimed_at < ?",
+                       (now - DISPATCH_LEASE,))
+            rows = db.execute("SELECT id, payload, attempts FROM outbox WHERE status = 'queued' "
+                              "AND next_attempt <= ? ORDER BY id LIMIT ?", (now, self.max_batch)).fetchall()
+            batch, size = [], 0
+            for row in rows:
+                size += len(row[1])
+                if batch and size > self.max_bytes:
+                    break
+                batch.append(row)
+            if batch:
+                db.executemany("UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                               [(now, r[0]) for r in batch])
+        return batch
+
+    def _next_due(self, db, now):
+        row = db.execute("SELECT MIN(next_attempt) FROM outbox WHERE status = 'queued'").fetchone()
+        return (row[0] - now) if row and row[0] is not None else 30
+
+    def _send(self, db, batch):
+        payloads = [json.loads(r[1]) for r in batch]
+        # One CAP keeps the original event shape; several travel as a list.
+        client_payload = {"cap_payload": payloads[0]} if len(payloads) == 1 else {"cap_payloads": payloads}
+        body = {"event_type": self.event_type, "client_payload": client_payload}
+        ids = [r[0] for r in batch]
+        attempts = max(r[2] for r in batch) + 1
+        try:
+            with github_call("dispatch") as call:
+                r = self._get_session().post(self.url, json=body, headers=self.headers, timeout=DISPATCH_TIMEOUT)
+                call.status = r.status_code
+        except Exception as e:
+            self._retry(db, ids, attempts, None, f"{type(e).__name__}: {e}", self._backoff(attempts))
+            return
+        self.stats["dispatches"] += 1
+        self._note_rate_limit(r)
+        if 200 <= r.status_code < 300:
+            with db:
+                db.executemany("UPDATE outbox SET status = 'sent', attempts = ?, http_status = ?, "
+                               "finished_at = ?, error = NULL WHERE id = ?",
+                               [(attempts, r.status_code, time.time(), i) for i in ids])
+            self.stats["sent"] += len(ids)
+            print(f"[DISPATCH] {len(ids)} CAP(s) dispatched ({r.status_code})")
+        elif r.status_code in (429, 500, 502, 503, 504) or self._rate_limited(r):
+            delay = self._retry_after(r) or self._backoff(attempts)
+            self._retry(db, ids, attempts, r.status_code, r.text[:500], delay)
+        else:
+            with db:
+                db.executemany("UPDATE outbox SET status = 'failed', attempts = ?, http_status = ?, "
+                               "finished_at = ?, error = ? WHERE id = ?",
+                               [(attempts, r.status_code, time.time(), r.text[:500], i) for i in ids])
+            self.stats["failed"] += len(ids)
+            print(f"[WARN] Dispatch rejected ({r.status_code}) for {len(ids)} CAP(s)")
+
+    def _retry(self, db, ids, attempts, http_status, error, delay):
+        now = time.time()
+        give_up = attempts >= DISPATCH_MAX_ATTEMPTS
+        with db:
+            db.executemany("UPDATE outbox SET status = ?, attempts = ?, http_status = ?, error = ?, "
+                           "next_attempt = ?, finished_at = ? WHERE id = ?",
+                           [("failed" if give_up else "queued", attempts, http_status, error,
+                             now + delay, now if give_up else None, i) for i in ids])
+        self.stats["failed" if give_up else "retries"] += len(ids)
+        print(f"[WARN] Dispatch {'failed' if give_up else 'retry in %.1fs' % delay} "
+              f"(attempt {attempts}, {http_status or error})")
+
+    # -----------------------------------------------------------------
+    # Rate limits and backoff
+    # -----------------------------------------------------------------
+    def _rate_limited(self, r):
+        """A 403 from the primary (quota spent) or secondary (Retry-After) rate limit, not a permission error."""
+        return r.status_code == 403 and (r.headers.get("X-RateLimit-Remaining") == "0"
+                                         or bool(r.headers.get("Retry-After")))
+
+    def _note_rate_limit(self, r):
+        """Pause the sender when GitHub says the quota is spent (or asks us to back off)."""
+        delay = self._retry_after(r)
+        if delay is None and r.headers.get("X-RateLimit-Remaining") == "0":
+            delay = _reset_delay(r.headers.get("X-RateLimit-Reset"))
+        if delay:
+            self._paused_until = max(self._paused_until, time.time() + delay)
+            self.stats["rate_limited"] += 1
+
+    def _retry_after(self, r):
+        value = r.headers.get("Retry-After")
+        if value:
+            try:
+                return max(0.0, float(value))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        if r.status_code in (403, 429) and r.headers.get("X-RateLimit-Remaining") == "0":
+            return _reset_delay(r.headers.get("X-RateLimit-Reset"))
+        return None
+
+    def _backoff(self, attempts):
+        delay = min(DISPATCH_BACKOFF_MAX, DISPATCH_BACKOFF * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)  # jitter so workers don't retry in lockstep
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+            session.mount("http://", HTTPAdapter(pool_connections=2, pool_maxsize=4))
+            self._session = session
+        return self._session
+
+    def _purge(self, db, now):
+        with db:
+            db.execute("DELETE FROM outbox WHERE status IN ('sent', 'failed') AND finished_at < ?",
+                       (now - DISPATCH_RETENTION,))
+
+
+def _reset_delay(reset):
+    try:
+        return max(1.0, float(reset) - time.time())
+    except (TypeError, ValueError):
+        return 60.0
@@ -0,0 +1,303 @@
+# hash_engine.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Shared streaming SHA-256 hashing and hash verification, fanned out
+#          over a thread or process pool, with an optional persistent
+#          (path, size, mtime_ns, inode) -> sha256 cache. Used by bridge.py,
+#          ledger_index.py and the scripts/ integrity tools.
+#
+# Usage:
+#   python hash_engine.py [--jobs N] [--processes] [--cache] <file> [<file> ...]
+#   python hash_engine.py --check <manifest.json> [--base-dir DIR] [--jobs N] [--cache]
+
+import os, sys, json, time, sqlite3, hashlib, argparse, threading
+from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from telemetry import cache_result
+
+CHUNK_SIZE = 1 << 20
+HASH_JOBS = int(os.environ.get("LEDGER_HASH_JOBS", "0")) or None  # None = one per core
+RACY_WINDOW_NS = 2 * 10 ** 9  # files modified this recently are hashed but not cached
+
+# ---------------------------------------------------------------------
+# Single-file hashing
+# ---------------------------------------------------------------------
+def sha256_file(path, chunk_size=CHUNK_SIZE):
+    """Hex SHA-256 of a file, read in fixed-size chunks (constant memory)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def default_jobs(jobs=None):
+    return max(1, jobs or HASH_JOBS or os.cpu_count() or 1)
+
+# ---------------------------------------------------------------------
+# Pooled execution
+# ---------------------------------------------------------------------
+def parallel_map(fn, items, jobs=None, processes=False, chunksize=None,
+                 initializer=None, initargs=()):
+    """
+    Ordered, streaming map of `fn` over `items` on a pool of `jobs` workers.
+
+    Threads are the default: hashlib and file reads release the GIL, so
+    they scale for anything but tiny files. processes=True sidesteps the GIL
+    entirely (fn must be a picklable module-level function); items are sent
+    in chunks to amortise IPC. `initializer(*initargs)` runs once per worker
+    (and once inline), e.g. to compile a schema. jobs=1 runs inline with no
+    pool at all. Only a bounded window of items is in flight at a time, so
+    `items` may be a lazy generator of any length.
+    """
+    jobs = default_jobs(jobs)
+    if hasattr(items, "__len__") and len(items) <= 1:
+        jobs = 1  # not worth a pool
+    if jobs == 1:
+        if initializer:
+            initializer(*initargs)
+        yield from map(fn, items)
+        return
+    if processes:
+        chunksize = chunksize or 64
+        with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+            yield from _bounded_map(pool, _run_chunk, _chunks(fn, items, chunksize), window=jobs * 4,
+                                    flatten=True)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+            yield from _bounded_map(pool, fn, items, window=jobs * 64)
+
+def _bounded_map(pool, fn, items, window, flatten=False):
+    """Like pool.map, but never has more than `window` tasks in flight."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            result = pending.popleft().result()
+            yield from (result if flatten else (result,))
+    for fut in pending:
+        result = fut.result()
+        yield from (result if flatten else (result,))
+
+def _chunks(fn, items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield fn, chunk
+            chunk = []
+    if chunk:
+        yield fn, chunk
+
+def _run_chunk(job):
+    fn, chunk = job
+    return [fn(item) for item in chunk]
+
+def _safe_hash(path):
+    try:
+        return path, sha256_file(path), None
+    except OSError as e:
+        return path, None, str(e)
+
+def hash_files(paths, jobs=None, processes=False, cache=None):
+    """Yield (path, hexdigest, error) for every path, in input order."""
+    if cache is not None:
+        yield from cache.hash_files(paths, jobs=jobs, processes=processes)
+    else:
+        yield from parallel_map(_safe_hash, paths, jobs=jobs, processes=processes)
+
+def verify_hashes(expected, jobs=None, processes=False, cache=None):
+    """
+    Check {path: expected hex digest} and yield one result dict per path:
+    {"path", "expected", "actual", "status": "ok" | "mismatch" | "missing"}.
+    Expected digests may carry the "SHA256:" prefix used in the manifests.
+    With a HashCache, files whose stat key is unchanged are not re-read.
+    """
+    paths = list(expected)
+    for path, actual, error in hash_files(paths, jobs=jobs, processes=processes, cache=cache):
+        want = _strip_prefix(expected[path])
+        if error:
+            status = "missing"
+        elif actual == want:
+            status = "ok"
+        else:
+            status = "mismatch"
+        yield {"path": str(path), "expected": want, "actual": actual, "status": status}
+
+def _strip_prefix(digest):
+    digest = digest or ""
+    return digest.split(":", 1)[1].lower() if ":" in digest else digest.lower()
+
+# ---------------------------------------------------------------------
+# Persistent content-hash cache
+# ---------------------------------------------------------------------
+_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path       TEXT PRIMARY KEY,         -- absolute path
+    size       INTEGER NOT NULL,
+    mtime_ns   INTEGER NOT NULL,
+    inode      INTEGER NOT NULL,
+    sha256     TEXT NOT NULL
+);
+"""
+
+def _stat_key(st):
+    return st.st_size, st.st_mtime_ns, st.st_ino
+
+def _stat_and_hash(path):
+    """(digest, stat key, error); the key is None if the file changed while being read."""
+    try:
+        before = os.stat(path)
+        digest = sha256_file(path)
+        after = os.stat(path)
+    except OSError as e:
+        return None, None, str(e)
+    key = _stat_key(after)
+    return digest, key if key == _stat_key(before) else None, None
+
+class HashCache:
+    """
+    SQLite table of (path, size, mtime_ns, inode) -> sha256, so files that
+    have not changed since they were last hashed are never re-read: a warm
+    check costs one stat per file plus one indexed query per batch.
+
+    A file modified within RACY_WINDOW_NS of being hashed is not cached, so
+    a rewrite that keeps its size inside the same mtime tick cannot be
+    mistaken for the cached version (the "racy clean" case git guards too).
+    """
+
+    def __init__(self, db_path=None, batch=512):
+        from ledger_index import LEDGER_STATE_DIR
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "hash_cache.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.batch = batch
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_CACHE_SCHEMA)
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # -----------------------------------------------------------------
+    def hash_files(self, paths, jobs=None, processes=False):
+        """Like hash_files(), but served from the cache wherever the stat key matches."""
+        batch = []
+        for path in paths:
+            batch.append(path)
+            if len(batch) >= self.batch:
+                yield from self._hash_batch(batch, jobs, processes)
+                batch = []
+        if batch:
+            yield from self._hash_batch(batch, jobs, processes)
+
+    def _hash_batch(self, paths, jobs, processes):
+        keys, results = {}, {}
+        for path in paths:
+            try:
+                keys[path] = _stat_key(os.stat(path))
+            except OSError as e:
+                results[path] = (None, str(e))
+
+        absolute = {path: os.path.abspath(path) for path in keys}
+        cached = self._lookup(set(absolute.values()))
+        misses = []
+        for path, key in keys.items():
+            row = cached.get(absolute[path])
+            if row is not None and row[0] == key:
+                results[path] = (row[1], None)
+            else:
+                misses.append(path)
+        self.stats["hits"] += len(keys) - len(misses)
+        self.stats["misses"] += len(misses)
+        cache_result("file_hash", True, len(keys) - len(misses))
+        cache_result("file_hash", False, len(misses))
+
+        fresh = []
+        cutoff = time.time_ns() - RACY_WINDOW_NS
+        for path, (digest, key, error) in zip(misses, parallel_map(_stat_and_hash, misses, jobs=jobs,
+                                                                   processes=processes)):
+            results[path] = (digest, error)
+            if key is not None and key[1] < cutoff:
+                fresh.append((absolute[path],) + key + (digest,))
+        self._store(fresh)
+
+        for path in paths:
+            digest, error = results[path]
+            yield path, digest, error
+
+    def _lookup(self, paths):
+        found = {}
+        paths = list(paths)
+        with self._lock:
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                rows = self._db.execute(
+                    f"SELECT path, size, mtime_ns, inode, sha256 FROM file_hashes "
+                    f"WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+                for path, size, mtime_ns, inode, digest in rows:
+                    found[path] = ((size, mtime_ns, inode), digest)
+        return found
+
+    def _store(self, rows):
+        if not rows:
+            return
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO file_hashes VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self.stats["stored"] += len(rows)
+
+    def prune(self):
+        """Drop entries for files that no longer exist; returns the number removed."""
+        with self._lock:
+            gone = [(p,) for (p,) in self._db.execute("SELECT path FROM file_hashes") if not os.path.exists(p)]
+            self._db.executemany("DELETE FROM file_hashes WHERE path = ?", gone)
+        return len(gone)
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Parallel SHA-256 hashing for the CAP ledger.")
+    ap.add_argument("files", nargs="*")
+    ap.add_argument("--jobs", "-j", type=int, default=None, help="worker count (default: one per core)")
+    ap.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    ap.add_argument("--check", metavar="MANIFEST", help="verify every module listed in an integrity manifest")
+    ap.add_argument("--base-dir", default="schemas", help="where manifest modules live (with --check)")
+    ap.add_argument("--cache", action="store_true", help="reuse digests of unchanged files (LEDGER_STATE_DIR)")
+    args = ap.parse_args(argv)
+    cache = HashCache() if args.cache else None
+
+    if args.check:
+        with open(args.check, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        expected = {os.path.join(args.base_dir, m["name"]): m["sha256"] for m in manifest.get("modules", [])}
+        failed = 0
+        for r in verify_hashes(expected, jobs=args.jobs, processes=args.processes, cache=cache):
+            mark = {"ok": "✅", "mismatch": "❌", "missing": "⚠️"}[r["status"]]
+            print(f"{mark} {r['status']:8s} {r['path']}")
+            failed += r["status"] != "ok"
+        return 1 if failed else 0
+
+    rc = 0
+    for path, digest, error in hash_files(args.files, jobs=args.jobs, processes=args.processes, cache=cache):
+        if error:
+            print(f"❌ {path}: {error}", file=sys.stderr)
+            rc = 1
+        else:
+            print(f"{digest}  {path}")
+    return rc
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,477 @@
+# ledger_archive.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Cold tier for the files backend. Whole <year>/<month> directories
+#          older than LEDGER_ARCHIVE_DAYS are compacted into sealed, compressed
+#          monthly archives (<ledger>/.cold/YYYY-MM.capa) with a footer index;
+#          readers mmap them and decompress only the block holding a record.
+#
+# Usage:
+#   python ledger_archive.py archive [ledger] [--days 90] [--dry-run]
+#   python ledger_archive.py list [ledger]
+#   python ledger_archive.py verify [ledger] [--full]
+#   python ledger_archive.py get <name> [--ledger L]   # e.g. 2025/01/<cap_id>.json
+
+import os, re, json, mmap, zlib, struct, hashlib, argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+LEDGER_ARCHIVE_DAYS = int(os.environ.get("LEDGER_ARCHIVE_DAYS", "90"))
+COLD_DIR = ".cold"          # hidden, so hot-tier scans never list it
+BLOCK_BYTES = 256 << 10     # raw record bytes per compressed block
+
+# File layout (little-endian):
+#   MAGIC | zlib blocks ... | block table | entry table | names | meta JSON | trailer
+# block  <offset, compressed length, raw length>
+# entry  <block, start in block, length, sha256(record), hash_prev digest, name offset, name length>
+# The trailer locates each table and carries the SHA-256 of every byte before it (the seal).
+MAGIC = b"CAPARC1\n"
+SEAL_MAGIC = b"CAPASEAL"
+_BLOCK = struct.Struct("<QII")
+_ENTRY = struct.Struct("<III32s32sIH")
+_TRAILER = struct.Struct("<8sQIQIQIQI32s")
+_ARCHIVE_NAME = re.compile(r"^(\d{4})-(\d{2})\.capa$")
+_MONTH_DIR = re.compile(r"^(\d{4})/(\d{2})/[^/]+$")
+
+# ---------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------
+def write_archive(path, month, items):
+    """
+    Write (name, raw bytes) pairs, in chain order, as a sealed archive at
+    `path` (temp file + fsync + rename, then read-only). Records are stored
+    verbatim, so their SHA-256 and every hash_prev link are unchanged.
+    Returns the archive's meta.
+    """
+    from ledger_store import _digest_of, _hash_prev_of, _hash_str, fsync_dir
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    seal = hashlib.sha256()
+    blocks, entries, names, pending = [], [], bytearray(), []
+    pending_len = offset = 0
+    first_prev = last_sha = None
+    try:
+        with open(tmp, "wb") as f:
+            def emit(data):
+                f.write(data)
+                seal.update(data)
+                return len(data)
+
+            def flush_block(offset):
+                raw = b"".join(pending)
+                comp = zlib.compress(raw, 6)
+                blocks.append((offset, len(comp), len(raw)))
+                pending.clear()
+                return offset + emit(comp)
+
+            offset = emit(MAGIC)
+            for name, raw in items:
+                if pending and pending_len + len(raw) > BLOCK_BYTES:
+                    offset = flush_block(offset)
+                    pending_len = 0
+                encoded = name.encode("utf-8")
+                sha = hashlib.sha256(raw).digest()
+                prev = _digest_of(_hash_prev_of(raw))
+                entries.append((len(blocks), pending_len, len(raw), sha, prev, len(names), len(encoded)))
+                if first_prev is None:
+                    first_prev = _hash_str(prev)
+                last_sha = sha.hex()
+                names += encoded
+                pending.append(raw)
+                pending_len += len(raw)
+            if pending:
+                offset = flush_block(offset)
+
+            blocks_off = offset
+            offset += emit(b"".join(_BLOCK.pack(*b) for b in blocks))
+            entries_off = offset
+            offset += emit(b"".join(_ENTRY.pack(*e) for e in entries))
+            names_off = offset
+            offset += emit(bytes(names))
+            meta = {"format": 1, "month": month, "records": len(entries), "compression": "zlib",
+                    "first_hash_prev": first_prev, "last_sha256": last_sha,
+                    "sealed_at": datetime.now(timezone.utc).isoformat()}
+            meta_raw = json.dumps(meta).encode("utf-8")
+            meta_off = offset
+            offset += emit(meta_raw)
+            f.write(_TRAILER.pack(SEAL_MAGIC, blocks_off, len(blocks), entries_off, len(entries),
+                                  names_off, len(names), meta_off, len(meta_raw), seal.digest()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o444)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    fsync_dir(path.parent)
+    return meta
+
+# ---------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------
+class ColdEntry:
+    """One archived record; `path` is its original <year>/<month>/<name>.json."""
+
+    __slots__ = ("archive", "index", "path", "sha256", "hash_prev")
+    position = None  # archived records have no hot-index position
+
+    def __init__(self, archive, index, path, sha256, hash_prev):
+        self.archive = archive
+        self.index = index
+        self.path = path
+        self.sha256 = sha256
+        self.hash_prev = hash_prev
+
+    def as_dict(self):
+        return {"archive": self.archive.name, "index": self.index, "path": self.path,
+                "sha256": self.sha256, "hash_prev": self.hash_prev}
+
+
+class ColdArchive:
+    """
+    Read-only view of one sealed archive. The file is memory-mapped; an
+    entry lookup is one fixed-width read from the entry table and a record
+    read decompresses just its block (the last block is kept, so reading
+    in order decompresses each block once).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.name = self.path.name
+        with open(self.path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self._mm)
+        if size < len(MAGIC) + _TRAILER.size or self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.name} is not a CAP archive")
+        (magic, self._blocks_off, self._nblocks, self._entries_off, self.count,
+         self._names_off, self._names_len, meta_off, meta_len, self.seal) = _TRAILER.unpack_from(
+            self._mm, size - _TRAILER.size)
+        if magic != SEAL_MAGIC:
+            self._mm.close()
+            raise ValueError(f"{self.name} has no seal (incomplete write?)")
+        self.meta = json.loads(self._mm[meta_off:meta_off + meta_len])
+        self.month = self.meta["month"]
+        self._block = (None, b"")
+        self._by_name = None
+
+    def close(self):
+        self._mm.close()
+
+    def entry(self, i):
+        from ledger_store import _hash_str
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        _, _, _, sha, prev, name_off, name_len = _ENTRY.unpack_from(self._mm, self._entries_off + i * _ENTRY.size)
+        start = self._names_off + name_off
+        return ColdEntry(self, i, self._mm[start:start + name_len].decode("utf-8"), sha.hex(), _hash_str(prev))
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.entry(i)
+
+    def read_raw(self, i):
+        block, start, length = _ENTRY.unpack_from(self._mm, self._entries_off + i * _ENTRY.size)[:3]
+        number, data = self._block
+        if number != block:
+            offset, comp_len, raw_len = _BLOCK.unpack_from(self._mm, self._blocks_off + block * _BLOCK.size)
+            data = zlib.decompress(self._mm[offset:offset + comp_len])
+            if len(data) != raw_len:
+                raise ValueError(f"{self.name}: block {block} decompressed to the wrong size")
+            self._block = (block, data)
+        return data[start:start + length]
+
+    def get(self, i):
+        return json.loads(self.read_raw(i))
+
+    def find(self, name):
+        """Index of the record stored under `name`, or None."""
+        if self._by_name is None:
+            self._by_name = {e.path: e.index for e in self}
+        return self._by_name.get(name)
+
+    def check(self):
+        """Re-hash the whole file against the seal and every record against its entry; returns problems."""
+        problems = []
+        digest = hashlib.sha256(self._mm[:len(self._mm) - _TRAILER.size]).digest()
+        if digest != self.seal:
+            problems.append(f"{self.name}: contents do not match the seal")
+        bad_blocks = set()
+        for e in self:
+            block = _ENTRY.unpack_from(self._mm, self._entries_off + e.index * _ENTRY.size)[0]
+            if block in bad_blocks:
+                continue
+            try:
+                raw = self.read_raw(e.index)
+            except (ValueError, zlib.error) as exc:
+                bad_blocks.add(block)
+                problems.append(f"{self.name} block {block}: {exc}")
+                continue
+            if hashlib.sha256(raw).hexdigest() != e.sha256:
+                problems.append(f"{self.name}#{e.index} ({e.path}): record bytes do not match the entry digest")
+        return problems
+
+
+class ColdTier:
+    """The sealed monthly archives under <ledger>/.cold, in chain (month) order."""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.dir = self.root / COLD_DIR
+        self._archives = {}
+        self._stamp = None
+
+    def archives(self):
+        """Open archives, re-listed only when the .cold directory changes."""
+        try:
+            stamp = os.stat(self.dir).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+        if stamp != self._stamp:
+            names = sorted(n for n in os.listdir(self.dir) if _ARCHIVE_NAME.match(n)) if stamp else []
+            current = {n: self._archives.pop(n, None) or ColdArchive(self.dir / n) for n in names}
+            for old in self._archives.values():
+                old.close()
+            self._archives, self._stamp = current, stamp
+        return list(self._archives.values())
+
+    def months(self):
+        """{'YYYY/MM'} directories that live in the cold tier."""
+        return {a.month.replace("-", "/") for a in self.archives()}
+
+    def covers(self, rel, months=None):
+        """True if relative path `rel` lies in an archived month directory."""
+        months = self.months() if months is None else months
+        return bool(months) and len(rel) > 8 and rel[7] == "/" and rel[:7] in months
+
+    def count(self):
+        return sum(a.count for a in self.archives())
+
+    def tail(self):
+        archives = self.archives()
+        return archives[-1].entry(archives[-1].count - 1) if archives and archives[-1].count else None
+
+    def iter_entries(self):
+        for archive in self.archives():
+            yield from archive
+
+    def iter_raw(self, since=None, until=None):
+        """(name, record bytes) in chain order, skipping whole archives outside [since, until]."""
+        from ledger_scan import _dir_in_range, parse_when
+        since, until = parse_when(since), parse_when(until, end=True)
+        for archive in self.archives():
+            if not _dir_in_range(tuple(archive.month.split("-")), since, until):
+                continue
+            for i in range(archive.count):
+                yield archive.entry(i).path, archive.read_raw(i)
+
+    def iter_records(self, since=None, until=None):
+        from ledger_scan import in_range
+        for name, raw in self.iter_raw(since, until):
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and in_range(record.get("timestamp"), since, until):
+                yield name, record
+
+    def locate(self, name):
+        """(archive, index) for an archived record name, or None."""
+        for archive in self.archives():
+            if name.startswith(archive.month.replace("-", "/") + "/"):
+                i = archive.find(name)
+                return (archive, i) if i is not None else None
+        return None
+
+    def get(self, name):
+        found = self.locate(name)
+        return found[0].get(found[1]) if found else None
+
+    def verify(self, full=False):
+        """
+        Check hash_prev links through every archive from the footer digests
+        (full=True also re-hashes each archive against its seal and each
+        record against its entry). Returns (breaks, records checked, tail entry).
+        """
+        breaks, prev, checked = [], None, 0
+        for archive in self.archives():
+            if full:
+                breaks += [{"archive": archive.name, "error": p} for p in archive.check()]
+            for entry in archive:
+                if prev is not None and entry.hash_prev != "SHA256:" + prev.sha256:
+                    breaks.append({"archive": archive.name, "index": entry.index,
+                                   "previous_file": Path(prev.path).name, "current_file": Path(entry.path).name,
+                                   "expected": entry.hash_prev, "actual": "SHA256:" + prev.sha256})
+                prev = entry
+                checked += 1
+        return breaks, checked, prev
+
+    def close(self):
+        for archive in self._archives.values():
+            archive.close()
+        self._archives, self._stamp = {}, None
+
+
+def iter_hot_files(root, since=None, until=None):
+    """ledger_scan.iter_cap_files() minus month directories that were archived."""
+    from ledger_scan import iter_cap_files
+    cold = ColdTier(root)
+    months = cold.months()
+    if not months:
+        yield from iter_cap_files(root, since=since, until=until)
+        return
+    root = str(root)
+    for path in iter_cap_files(root, since=since, until=until):
+        if not cold.covers(os.path.relpath(path, root).replace(os.sep, "/"), months):
+            yield path
+
+# ---------------------------------------------------------------------
+# Archival job
+# ---------------------------------------------------------------------
+def _month_of(rel):
+    m = _MONTH_DIR.match(rel)
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        return None
+    return f"{m.group(1)}/{m.group(2)}"
+
+def _month_end(month):
+    year, mon = (int(x) for x in month.split("/"))
+    return datetime(year + mon // 12, mon % 12 + 1, 1, tzinfo=timezone.utc)
+
+def plan_archive(ledger, days=None, now=None):
+    """
+    [(month, entries)] that can move to the cold tier: the longest run of
+    whole month directories at the start of the chain whose month ended
+    more than `days` ago. A month is only taken if every file in its
+    directory is in that run, so each directory is entirely hot or entirely
+    cold, and the chain head always stays hot (the next append links to it).
+    """
+    days = LEDGER_ARCHIVE_DAYS if days is None else days
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    archived = ColdTier(ledger.root).months()
+    index = ledger.index
+    head = index.latest()
+    groups, stop = [], None
+    for entry in index.iter_chain():
+        month = _month_of(entry.path)
+        if (entry.position == head.position or month is None or month in archived
+                or _month_end(month) > cutoff or any(m == month for m, _ in groups[:-1])):
+            stop = month
+            break
+        if groups and groups[-1][0] == month:
+            groups[-1][1].append(entry)
+        else:
+            groups.append((month, [entry]))
+    for i, (month, entries) in enumerate(groups):
+        if month == stop or len(index._indexed_in(month)) != len(entries):
+            return groups[:i]
+    return groups
+
+def archive_ledger(ledger, days=None, now=None, dry_run=False):
+    """
+    Move eligible months (see plan_archive) into sealed archives under the
+    ledger lock. Each archive is durable before its source files are
+    removed; leftovers from an interrupted run are cleaned up first.
+    Returns [(month, records)].
+    """
+    from ledger_store import fsync_dir
+    if ledger.backend != "files":
+        raise ValueError("archival applies to the files backend (segment ledgers are already compacted)")
+    done = []
+    with ledger._locked():
+        cold = ColdTier(ledger.root)
+        if not dry_run:
+            _drop_leftovers(ledger, cold)
+        ledger.index.sync()
+        if ledger.index.latest() is None:
+            return done
+        for month, entries in plan_archive(ledger, days, now):
+            if dry_run:
+                done.append((month, len(entries)))
+                continue
+            if not cold.dir.is_dir():
+                cold.dir.mkdir()
+                fsync_dir(ledger.root)
+            items = ((e.path, Path(ledger.index.full_path(e)).read_bytes()) for e in entries)
+            meta = write_archive(cold.dir / f"{month.replace('/', '-')}.capa", month.replace("/", "-"), items)
+            _remove_month(ledger, month, [e.path for e in entries])
+            done.append((month, meta["records"]))
+            print(f"🧊 Archived {month}: {meta['records']} records")
+        fsync_dir(ledger.root)
+        ledger.index.sync()
+    cold.close()
+    return done
+
+def _remove_month(ledger, month, paths):
+    from ledger_store import fsync_dir
+    month_dir = ledger.root / month
+    for rel in paths:
+        try:
+            os.unlink(ledger.root / rel)
+        except FileNotFoundError:
+            pass
+    fsync_dir(month_dir)
+    for d in (month_dir, month_dir.parent):
+        try:
+            d.rmdir()  # only once empty
+        except OSError:
+            break
+
+def _drop_leftovers(ledger, cold):
+    """Remove hot copies of archived records left by an interrupted run (only if byte-identical)."""
+    for archive in cold.archives():
+        month = archive.month.replace("-", "/")
+        month_dir = ledger.root / month
+        if not month_dir.is_dir():
+            continue
+        done = []
+        for p in sorted(month_dir.glob("*.json")):
+            rel = f"{month}/{p.name}"
+            i = archive.find(rel)
+            if i is not None and hashlib.sha256(p.read_bytes()).hexdigest() == archive.entry(i).sha256:
+                done.append(rel)
+            else:
+                print(f"[WARN] {rel} is in archived month {month} but not in {archive.name}; left in place")
+        if done:
+            _remove_month(ledger, month, done)
+            print(f"🧹 Removed {len(done)} leftover hot copies from {month}")
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old CAP months into sealed, compressed cold storage.")
+    parser.add_argument("cmd", choices=["archive", "list", "verify", "get"])
+    parser.add_argument("arg", nargs="?", help="ledger (archive/list/verify) or record name (get)")
+    parser.add_argument("--ledger", default=None, help="ledger for get (default $LEDGER_PATH)")
+    parser.add_argument("--days", type=int, default=None, help=f"archive months older than this (default {LEDGER_ARCHIVE_DAYS})")
+    parser.add_argument("--dry-run", action="store_true", help="only list the months that would be archived")
+    parser.add_argument("--full", action="store_true", help="verify: re-hash archives and records too")
+    args = parser.parse_args()
+
+    default_ledger = os.environ.get("LEDGER_PATH", "./CAP_LOGS")
+    if args.cmd == "get":
+        if not args.arg:
+            parser.error("get needs a record name, e.g. 2025/01/<file>.json")
+        record = ColdTier(args.ledger or default_ledger).get(args.arg or "")
+        if record is None:
+            raise SystemExit(f"❌ {args.arg} is not in the cold tier")
+        print(json.dumps(record, indent=2))
+    elif args.cmd == "list":
+        for a in ColdTier(args.arg or default_ledger).archives():
+            print(f"{a.name}  {a.count:>8} records  {a.path.stat().st_size:>12,} bytes  sealed {a.meta['sealed_at']}")
+    elif args.cmd == "verify":
+        breaks, checked, _ = ColdTier(args.arg or default_ledger).verify(full=args.full)
+        for b in breaks:
+            print(f"❌ {json.dumps(b)}")
+        if breaks:
+            raise SystemExit(1)
+        print(f"✅ {checked} archived records verified")
+    else:
+        from ledger_store import open_ledger
+        done = archive_ledger(open_ledger(args.arg or default_ledger), args.days, dry_run=args.dry_run)
+        total = sum(n for _, n in done)
+        verb = "Would archive" if args.dry_run else "Archived"
+        print(f"✅ {verb} {total} records in {len(done)} month(s)")
@@ -0,0 +1,369 @@
+# ledger_index.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: On-disk SQLite index of the CAP_LOGS tree (path, cap_id, timestamp,
+#          content hash, chain position) so the bridge never rescans the ledger.
+#
+# Usage:
+#   python ledger_index.py rebuild [--jobs N]   # drop and rebuild the index from disk
+#   python ledger_index.py sync [--jobs N]      # pick up files added since the last sync
+#   python ledger_index.py latest               # print the chain head
+
+import os, json, hashlib, sqlite3, threading, argparse
+from pathlib import Path
+from hash_engine import parallel_map
+from ledger_scan import changed_dirs
+from telemetry import cache_result, timed
+
+LEDGER_STATE_DIR = os.environ.get("LEDGER_STATE_DIR", "./.ledger_state")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS caps (
+    position   INTEGER PRIMARY KEY,      -- chain order, oldest first
+    path       TEXT NOT NULL UNIQUE,     -- relative to the ledger root
+    cap_id     TEXT,
+    timestamp  TEXT,
+    sha256     TEXT NOT NULL,            -- hex digest of the file bytes
+    hash_prev  TEXT,                     -- governance_chain.hash_prev as written
+    mtime_ns   INTEGER NOT NULL,
+    size       INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS caps_cap_id ON caps(cap_id);
+CREATE TABLE IF NOT EXISTS dirs (
+    path       TEXT PRIMARY KEY,
+    mtime_ns   INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = "position, path, cap_id, timestamp, sha256, hash_prev, mtime_ns, size"
+
+# ---------------------------------------------------------------------
+# Index entry
+# ---------------------------------------------------------------------
+class CapEntry:
+    """One indexed CAP file."""
+
+    __slots__ = ("position", "path", "cap_id", "timestamp", "sha256", "hash_prev", "mtime_ns", "size")
+
+    def __init__(self, position, path, cap_id, timestamp, sha256, hash_prev, mtime_ns, size):
+        self.position = position
+        self.path = path
+        self.cap_id = cap_id
+        self.timestamp = timestamp
+        self.sha256 = sha256
+        self.hash_prev = hash_prev
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+# ---------------------------------------------------------------------
+# Reading a CAP file once: hash + the fields the index needs
+# ---------------------------------------------------------------------
+def scan_cap_file(full_path):
+    """Return (sha256, cap_id, timestamp, hash_prev, mtime_ns, size) for one file."""
+    st = os.stat(full_path)
+    with open(full_path, "rb") as f:
+        raw = f.read()
+    cap_id = timestamp = hash_prev = None
+    try:
+        data = json.loads(raw)
+        if isinstance(data, dict):
+            cap_id = data.get("cap_id")
+            timestamp = data.get("timestamp")
+            chain = data.get("governance_chain")
+            if isinstance(chain, dict):
+                hash_prev = chain.get("hash_prev")
+    except ValueError:
+        pass
+    return hashlib.sha256(raw).hexdigest(), cap_id, timestamp, hash_prev, st.st_mtime_ns, st.st_size
+
+# ---------------------------------------------------------------------
+# Ledger index
+# ---------------------------------------------------------------------
+class LedgerIndex:
+    """
+    SQLite index over <ledger_root>/**/*.json.
+
+    Positions follow file mtime order when rebuilt from disk (the same order
+    ledger_link.js and the old rglob scan used) and append order afterwards.
+    sync() only lists directories whose mtime changed, so its cost is one
+    stat per directory rather than one per file. In-place rewrites do not
+    touch the directory mtime: writers report them through record().
+    """
+
+    def __init__(self, ledger_root, db_path=None, jobs=None):
+        self.root = Path(ledger_root)
+        self.jobs = jobs  # hash pool size for rebuilds / full re-audits (None = per core)
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "ledger_index.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._head = None
+        self._data_version = None  # bumps when another process commits
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # -----------------------------------------------------------------
+    # Lookups
+    # -----------------------------------------------------------------
+    def latest(self):
+        """Chain head (highest position), cached until any connection writes."""
+        with self._lock:
+            version = self._db.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._data_version:
+                self._head, self._data_version = None, version
+            cache_result("ledger_head", self._head is not None)
+            if self._head is None:
+                row = self._db.execute(
+                    f"SELECT {_COLUMNS} FROM caps ORDER BY position DESC LIMIT 1").fetchone()
+                self._head = CapEntry(*row) if row else False
+            return self._head or None
+
+    def get(self, path):
+        row = self._db.execute(f"SELECT {_COLUMNS} FROM caps WHERE path = ?",
+                               (self._rel(path),)).fetchone()
+        return CapEntry(*row) if row else None
+
+    def at(self, position):
+        row = self._db.execute(f"SELECT {_COLUMNS} FROM caps WHERE position = ?",
+                               (position,)).fetchone()
+        return CapEntry(*row) if row else None
+
+    def before(self, position):
+        """The entry immediately preceding `position` in chain order."""
+        row = self._db.execute(
+            f"SELECT {_COLUMNS} FROM caps WHERE position < ? ORDER BY position DESC LIMIT 1",
+            (position,)).fetchone()
+        return CapEntry(*row) if row else None
+
+    def after(self, position):
+        """The entry immediately following `position` in chain order."""
+        row = self._db.execute(
+            f"SELECT {_COLUMNS} FROM caps WHERE position > ? ORDER BY position LIMIT 1",
+            (position,)).fetchone()
+        return CapEntry(*row) if row else None
+
+    def find_cap_id(self, cap_id):
+        rows = self._db.execute(f"SELECT {_COLUMNS} FROM caps WHERE cap_id = ? ORDER BY position",
+                                (cap_id,)).fetchall()
+        return [CapEntry(*r) for r in rows]
+
+    def iter_chain(self, after_position=0, batch=1000):
+        """Entries in chain order, starting after `after_position`."""
+        last = after_position
+        while True:
+            rows = self._db.execute(
+                f"SELECT {_COLUMNS} FROM caps WHERE position > ? ORDER BY position LIMIT ?",
+                (last, batch)).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield CapEntry(*r)
+            last = rows[-1][0]
+
+    def in_dir(self, d):
+        """Entries directly inside directory `d` ("." is the root), in chain order."""
+        prefix = "" if d == "." else d + "/"
+        if prefix:  # a range over the path index: "/" sorts just before "0"
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM caps WHERE path >= ? AND path < ?",
+                                    (prefix, d + "0")).fetchall()
+        else:
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM caps").fetchall()
+        return sorted((CapEntry(*r) for r in rows if "/" not in r[1][len(prefix):]), key=lambda e: e.position)
+
+    def dirs(self):
+        """{relative dir: mtime_ns} as of the last sync()."""
+        return dict(self._db.execute("SELECT path, mtime_ns FROM dirs"))
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM caps").fetchone()[0]
+
+    def full_path(self, entry_or_path):
+        path = entry_or_path.path if isinstance(entry_or_path, CapEntry) else entry_or_path
+        return self.root / path
+
+    # -----------------------------------------------------------------
+    # Writes
+    # -----------------------------------------------------------------
+    def record(self, path):
+        """Index a file that was just written: append if new, refresh if rewritten."""
+        rel = self._rel(path)
+        info = scan_cap_file(self.root / rel)
+        with self._lock:
+            self._upsert(rel, info)
+            self._head = None
+        return self.get(rel)
+
+    def refresh(self, entry, force=False):
+        """
+        Re-read `entry` if its file changed on disk (mtime/size) or `force`
+        is set; returns the up-to-date entry, or None if the file is gone.
+        """
+        return self.refresh_many([entry], force=force, jobs=1)[0]
+
+    @timed("hash")
+    def refresh_many(self, entries, force=False, jobs=None):
+        """refresh() for a batch of entries, re-scanning files on the hash pool."""
+        scanned = list(parallel_map(lambda e: _rescan(self.root / e.path, e, force), entries,
+                                    jobs=jobs or self.jobs))
+        out = []
+        with self._lock:
+            for entry, info in zip(entries, scanned):
+                if info is None:
+                    self._db.execute("DELETE FROM caps WHERE path = ?", (entry.path,))
+                    self._head = None
+                    out.append(None)
+                    continue
+                if info != (entry.sha256, entry.cap_id, entry.timestamp, entry.hash_prev, entry.mtime_ns, entry.size):
+                    self._upsert(entry.path, info)
+                    self._head = None
+                out.append(CapEntry(entry.position, entry.path, info[1], info[2], info[0], info[3], info[4], info[5]))
+        return out
+
+    def forget(self, path):
+        with self._lock:
+            self._db.execute("DELETE FROM caps WHERE path = ?", (self._rel(path),))
+            self._head = None
+
+    @timed("index_rebuild")
+    def rebuild(self):
+        """Drop everything and re-index the ledger from disk, oldest mtime first."""
+        files = sorted((p for p in self.root.rglob("*.json")
+                        if not any(part.startswith(".") for part in p.relative_to(self.root).parts)),
+                       key=lambda p: p.stat().st_mtime_ns)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM caps")
+                self._db.execute("DELETE FROM dirs")
+                for f, info in zip(files, parallel_map(scan_cap_file, files, jobs=self.jobs)):
+                    self._insert(self._rel(f), info)
+                for d, mtime_ns in self._walk_dirs():
+                    self._db.execute("INSERT INTO dirs VALUES (?, ?)", (d, mtime_ns))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._head = None
+        return len(files)
+
+    @timed("index_sync")
+    def sync(self):
+        """Index files added or removed since the last sync; returns the number of changes."""
+        with self._lock:
+            known_dirs = dict(self._db.execute("SELECT path, mtime_ns FROM dirs"))
+            if not known_dirs and not self.count():
+                return self.rebuild()
+
+            changed, seen = self._changed_dirs(known_dirs)
+            vanished = [d for d in known_dirs if d not in seen]
+            if not changed and not vanished:
+                return 0
+
+            new_files, gone = [], []
+            for d, _, on_disk in changed:
+                indexed = self._indexed_in(d)
+                new_files += on_disk - indexed
+                gone += indexed - on_disk
+            for d in vanished:
+                gone += self._indexed_in(d)
+
+            new_files.sort(key=lambda p: (self.root / p).stat().st_mtime_ns)
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for p in gone:
+                    self._db.execute("DELETE FROM caps WHERE path = ?", (p,))
+                scans = parallel_map(scan_cap_file, [self.root / p for p in new_files], jobs=self.jobs)
+                for p, info in zip(new_files, scans):
+                    self._upsert(p, info)
+                for d, m, _ in changed:
+                    self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (d, m))
+                for d in vanished:
+                    self._db.execute("DELETE FROM dirs WHERE path = ?", (d,))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._head = None
+            return len(new_files) + len(gone)
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+    def _rel(self, path):
+        p = Path(path)
+        if p.is_absolute():
+            return p.resolve().relative_to(self.root.resolve()).as_posix()
+        try:
+            return p.relative_to(self.root).as_posix()
+        except ValueError:
+            return p.as_posix()
+
+    def _changed_dirs(self, known_dirs):
+        return changed_dirs(self.root, known_dirs)
+
+    def _indexed_in(self, d):
+        """Indexed paths directly inside directory `d`."""
+        prefix = _like_prefix("" if d == "." else d + "/")
+        return {r[0] for r in self._db.execute(
+            "SELECT path FROM caps WHERE path LIKE ? ESCAPE '\\' AND path NOT LIKE ? ESCAPE '\\'",
+            (prefix + "%", prefix + "%/%"))}
+
+    def _walk_dirs(self):
+        for dirpath, dirnames, _ in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            rel = Path(dirpath).relative_to(self.root).as_posix()
+            yield rel, os.stat(dirpath).st_mtime_ns
+
+    def _insert(self, rel, info):
+        self._db.execute(
+            "INSERT INTO caps (path, sha256, cap_id, timestamp, hash_prev, mtime_ns, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", (rel,) + info)
+
+    def _upsert(self, rel, info):
+        cur = self._db.execute(
+            "UPDATE caps SET sha256 = ?, cap_id = ?, timestamp = ?, hash_prev = ?, mtime_ns = ?, size = ? "
+            "WHERE path = ?", info + (rel,))
+        if cur.rowcount == 0:
+            self._insert(rel, info)
+
+
+def _rescan(full_path, entry, force):
+    """scan_cap_file() unless the stat still matches the entry; None if the file is gone."""
+    try:
+        st = os.stat(full_path)
+    except FileNotFoundError:
+        return None
+    if not force and (st.st_mtime_ns, st.st_size) == (entry.mtime_ns, entry.size):
+        return (entry.sha256, entry.cap_id, entry.timestamp, entry.hash_prev, entry.mtime_ns, entry.size)
+    return scan_cap_file(full_path)
+
+def _like_prefix(prefix):
+    return prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the CAP ledger index.")
+    parser.add_argument("cmd", nargs="?", default="sync", choices=["rebuild", "sync", "latest"])
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="hashing workers (default: one per core)")
+    args = parser.parse_args()
+
+    ledger = os.environ.get("LEDGER_PATH", "./CAP_LOGS")
+    cmd = args.cmd
+    index = LedgerIndex(ledger, jobs=args.jobs)
+    if cmd == "rebuild":
+        print(f"✅ Indexed {index.rebuild()} CAP records from {ledger}")
+    elif cmd == "sync":
+        print(f"✅ {index.sync()} change(s) indexed; {index.count()} CAP records total")
+    elif cmd == "latest":
+        head = index.latest()
+        print(json.dumps(head.as_dict() if head else None, indent=2))
@@ -0,0 +1,144 @@
+# ledger_scan.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Shared recursive discovery of CAP JSON files, pruning the
+#          CAP_LOGS/<year>/<month> layout by time range before listing files.
+
+import os
+from datetime import date, datetime, timedelta, timezone
+
+# ---------------------------------------------------------------------
+# Date helpers
+# ---------------------------------------------------------------------
+def parse_when(value, end=False):
+    """
+    Parse YYYY, YYYY-MM, YYYY-MM-DD or a full ISO timestamp into a datetime.
+    end=True resolves a partial date to the last instant of that year, month
+    or day, so an inclusive `until="2025-03"` covers all of March. Offsets
+    are converted to UTC; the result is always naive.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return _naive_utc(value)
+    if isinstance(value, date):
+        value = value.isoformat()
+    text = str(value).strip().replace("Z", "+00:00")
+    for fmt, size in (("%Y", 4), ("%Y-%m", 7), ("%Y-%m-%d", 10)):
+        if len(text) == size:
+            start = datetime.strptime(text, fmt)
+            return _period_end(start, size) if end else start
+    return _naive_utc(datetime.fromisoformat(text))
+
+def _naive_utc(dt):
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+def _period_end(start, size):
+    if size == 4:
+        nxt = start.replace(year=start.year + 1)
+    elif size == 7:
+        nxt = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    else:
+        nxt = start + timedelta(days=1)
+    return nxt - timedelta(microseconds=1)
+
+def month_key(dt):
+    return dt.year * 12 + dt.month - 1
+
+def _dir_in_range(parts, since, until):
+    """False only when a <year>[/<month>] directory is entirely outside the range."""
+    if not parts or not parts[0].isdigit() or len(parts[0]) != 4:
+        return True
+    year = int(parts[0])
+    if len(parts) >= 2 and parts[1].isdigit() and len(parts[1]) == 2 and 1 <= int(parts[1]) <= 12:
+        lo = hi = year * 12 + int(parts[1]) - 1
+    else:
+        lo, hi = year * 12, year * 12 + 11
+    if since is not None and hi < month_key(since):
+        return False
+    if until is not None and lo > month_key(until):
+        return False
+    return True
+
+# ---------------------------------------------------------------------
+# Discovery
+# ---------------------------------------------------------------------
+def iter_cap_files(root, since=None, until=None, recursive=True):
+    """
+    Yield paths of *.json files under `root` in sorted order. With
+    since/until, <year>/<month> directories wholly outside the range are
+    skipped without being listed; records inside a boundary month still
+    need a timestamp check by the caller (see in_range()).
+    Hidden files and directories (.ledger_state, .git, ...) are ignored.
+    """
+    since, until = parse_when(since), parse_when(until, end=True)
+    stack = [(str(root), ())]
+    while stack:
+        path, parts = stack.pop()
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        subdirs = []
+        for e in entries:
+            if e.name.startswith("."):
+                continue
+            if e.is_dir():
+                if recursive and _dir_in_range(parts + (e.name,), since, until):
+                    subdirs.append((e.path, parts + (e.name,)))
+            elif e.name.endswith(".json") and e.is_file():
+                yield e.path
+        stack.extend(reversed(subdirs))
+
+def changed_dirs(root, known_dirs):
+    """
+    Stat every directory in `known_dirs` ({relative dir: mtime_ns}, "." is
+    the root) and only list the ones whose mtime moved: a directory's files
+    and subdirectories can only change if it did. Returns
+    ([(dir, mtime_ns, {relative json paths})], {dirs seen}); known dirs
+    missing from the second set have vanished.
+    """
+    root = str(root)
+    children = {}
+    for d in known_dirs:
+        if d != ".":
+            parent = d.rsplit("/", 1)[0] if "/" in d else "."
+            children.setdefault(parent, []).append(d)
+
+    changed, seen, stack = [], set(), ["."]
+    while stack:
+        d = stack.pop()
+        full = root if d == "." else os.path.join(root, d)
+        try:
+            mtime_ns = os.stat(full).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        seen.add(d)
+        if known_dirs.get(d) == mtime_ns:
+            stack.extend(children.get(d, ()))
+            continue
+        prefix = "" if d == "." else d + "/"
+        files = set()
+        with os.scandir(full) as it:
+            for e in it:
+                if e.name.startswith("."):
+                    continue
+                if e.is_dir():
+                    stack.append(prefix + e.name)
+                elif e.name.endswith(".json") and e.is_file():
+                    files.add(prefix + e.name)
+        changed.append((d, mtime_ns, files))
+    return changed, seen
+
+def in_range(timestamp, since=None, until=None):
+    """True if a record timestamp falls in [since, until]; unparseable timestamps pass."""
+    if since is None and until is None:
+        return True
+    try:
+        ts = parse_when(timestamp)
+    except (TypeError, ValueError):
+        return True
+    if since is not None and ts < parse_when(since):
+        return False
+    if until is not None and ts > parse_when(until, end=True):
+        return False
+    return True
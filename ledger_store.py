@@ -0,0 +1,750 @@
+# ledger_store.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Pluggable CAP ledger storage. The "files" backend is the classic
+#          CAP_LOGS/<year>/<month>/<cap>.json tree; the "segments" backend packs
+#          records into append-only segment files with a fixed-width offset
+#          index, sealing full segments read-only. Both backends link new
+#          records onto the chain head under an inter-process lock
+#          (append_chain), and ChainAppender group-commits concurrent appends.
+#          Records are never rewritten once written, so the SHA-256 that the
+#          next record's hash_prev names stays true; hash_next is kept (or
+#          derived) outside the record and merged in by get().
+#
+# Usage:
+#   python ledger_store.py info <ledger>       # backend, record count, chain head
+#   python ledger_store.py check <segments>    # verify segment frames and seals
+
+import os, json, zlib, fcntl, struct, hashlib, time, threading, argparse
+from pathlib import Path
+from datetime import datetime, timezone
+from telemetry import timed
+
+LEDGER_BACKEND = os.environ.get("LEDGER_BACKEND", "files")             # files | segments
+SEGMENT_BYTES = int(os.environ.get("LEDGER_SEGMENT_BYTES", str(64 << 20)))
+FSYNC_EVERY = int(os.environ.get("LEDGER_FSYNC_EVERY", "64"))          # appends between fsyncs
+FSYNC_INTERVAL = float(os.environ.get("LEDGER_FSYNC_INTERVAL", "1.0"))  # max seconds between fsyncs
+
+NULL_HASH = "SHA256:" + "0" * 64
+FORMAT_TAG = "athena-cap-segments 1\n"
+
+# ---------------------------------------------------------------------
+# Shared helpers
+# ---------------------------------------------------------------------
+def hash_bytes(raw):
+    return hashlib.sha256(raw).hexdigest()
+
+def encode_record(record):
+    """Bytes a CAP record is stored as: the same indent=2 JSON the bridge has always written."""
+    return json.dumps(record, indent=2).encode("utf-8")
+
+def record_name(record):
+    """<year>/<month>/<cap_id>.json for a record, from its timestamp (now if unusable)."""
+    try:
+        ts = datetime.fromisoformat(str(record.get("timestamp")).replace("Z", "+00:00"))
+    except ValueError:
+        ts = datetime.now(timezone.utc)
+    cap_id = str(record.get("cap_id") or "cap_%d" % time.time_ns())
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in cap_id)
+    return f"{ts.year:04d}/{ts.month:02d}/{safe}.json"
+
+def write_atomic(path, data, mtime_ns=None, sync_dir=True):
+    """
+    Replace `path` with `data` via a temp file in the same directory: write,
+    set mtime (if given), fsync, rename. Readers see the old or the new file,
+    never a torn one. sync_dir=False leaves the directory fsync to the caller.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            if mtime_ns is not None:
+                os.utime(f.fileno(), ns=(mtime_ns, mtime_ns))
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    if sync_dir:
+        fsync_dir(path.parent)
+
+def fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _link_prev(record, head):
+    """Point the record's hash_prev at the current chain head."""
+    chain = record.get("governance_chain")
+    if not isinstance(chain, dict):
+        chain = record["governance_chain"] = {"hash_next": NULL_HASH}
+    chain["hash_prev"] = f"SHA256:{head.sha256}" if head is not None else NULL_HASH
+
+def _with_hash_next(record, hash_next):
+    if hash_next and isinstance(record, dict) and isinstance(record.get("governance_chain"), dict):
+        record["governance_chain"]["hash_next"] = hash_next
+    return record
+
+def _in_range(record, since, until):
+    from ledger_scan import in_range
+    return in_range(record.get("timestamp"), since, until)
+
+def is_segment_ledger(path):
+    return (Path(path) / "FORMAT").is_file()
+
+def open_ledger(path=None, backend=None, **kwargs):
+    """
+    Open the ledger at `path` (default $LEDGER_PATH or ./CAP_LOGS). An existing
+    segment ledger is recognised by its FORMAT file; otherwise `backend`
+    (default $LEDGER_BACKEND) decides.
+    """
+    path = path or os.environ.get("LEDGER_PATH", "./CAP_LOGS")
+    backend = "segments" if is_segment_ledger(path) else (backend or LEDGER_BACKEND)
+    if backend == "segments":
+        return SegmentLedger(path, **kwargs)
+    if backend == "files":
+        return FileLedger(path, **kwargs)
+    raise ValueError(f"Unknown ledger backend: {backend!r}")
+
+def iter_ledger_records(path, since=None, until=None):
+    """(name, record) for every parseable record in either backend, with an optional time window."""
+    if is_segment_ledger(path):
+        ledger = SegmentLedger(path)
+        for entry, record in ledger.iter_records(since=since, until=until):
+            yield entry.name, record
+        return
+    yield from FileLedger.scan(path, since=since, until=until)
+
+# ---------------------------------------------------------------------
+# Files backend
+# ---------------------------------------------------------------------
+class FileLedger:
+    """
+    One pretty-printed JSON file per CAP, indexed by ledger_index.LedgerIndex.
+    Every write is temp file + fsync + rename. Chain appends serialise on an
+    flock next to the index database, so the head read and the new file
+    happen as one step across processes. Files are not rewritten to fill in
+    hash_next: it is the SHA-256 of the next record in the chain (hash_next()).
+    """
+
+    backend = "files"
+
+    def __init__(self, root, index=None):
+        from ledger_index import LedgerIndex
+        from ledger_archive import ColdTier
+        from chain_verify import ChainVerifier
+        self.root = Path(root)
+        self.index = index or LedgerIndex(self.root)
+        self.cold = ColdTier(self.root)  # months moved to sealed archives (ledger_archive.py)
+        self.verifier = ChainVerifier(self.index, cold=self.cold)
+
+    def head(self):
+        self.index.sync()
+        return self.index.latest()
+
+    def count(self):
+        self.index.sync()
+        return self.index.count()
+
+    def at(self, position):
+        return self.index.at(position)
+
+    def describe(self, entry):
+        return Path(entry.path).name
+
+    def read_raw(self, entry):
+        with open(self.index.full_path(entry), "rb") as f:
+            return f.read()
+
+    def get(self, entry):
+        return _with_hash_next(json.loads(self.read_raw(entry)), self.hash_next(entry))
+
+    def hash_next(self, entry):
+        """SHA256:<hex> of the record after `entry` in the chain, or None for the head."""
+        following = self.index.after(entry.position)
+        return f"SHA256:{following.sha256}" if following is not None else None
+
+    def append(self, record, name=None, raw=None, mtime_ns=None, sync_dir=True):
+        """Write a new record file and index it; returns its entry. Does not link it (see append_chain)."""
+        path = self.root / (name or record_name(record))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomic(path, raw if raw is not None else encode_record(record),
+                     mtime_ns=mtime_ns, sync_dir=sync_dir)
+        return self.index.record(path)
+
+    def append_chain(self, records):
+        """
+        Link each record onto the chain head and write it. Runs under the
+        ledger lock; directories are fsync'ed once for the whole batch.
+        Returns the new entries.
+        """
+        entries, dirs = [], set()
+        with self._locked():
+            head = self.head()
+            for record in records:
+                _link_prev(record, head)
+                path = self._free_path(self._hot_name(record))
+                # Chain order is mtime order on rebuild: keep it strictly increasing.
+                stamp = max(time.time_ns(), head.mtime_ns + 1 if head is not None else 0)
+                entry = self.append(record, name=path, mtime_ns=stamp, sync_dir=False)
+                dirs.add(self.root / Path(path).parent)
+                entries.append(entry)
+                head = entry
+            for d in dirs:
+                fsync_dir(d)
+        return entries
+
+    def _hot_name(self, record):
+        """record_name(), moved to the current month if its own month was archived (months are wholly hot or cold)."""
+        name = record_name(record)
+        if self.cold.covers(name):
+            now = datetime.now(timezone.utc)
+            name = f"{now.year:04d}/{now.month:02d}/{name.rsplit('/', 1)[1]}"
+        return name
+
+    def _free_path(self, name):
+        """`name`, or name-2, name-3 ... if a record already uses it."""
+        stem, n = name[:-len(".json")] if name.endswith(".json") else name, 1
+        while (self.root / name).exists():
+            n += 1
+            name = f"{stem}-{n}.json"
+        return name
+
+    def _locked(self):
+        return _FileLock(self.index.db_path.with_suffix(".lock"))
+
+    def iter_chain(self, after_position=0):
+        self.index.sync()
+        return self.index.iter_chain(after_position=after_position)
+
+    def iter_records(self, since=None, until=None):
+        """(entry, record) in chain order: archived months first (ColdEntry), then the hot files."""
+        for entry in self.cold.iter_entries():
+            try:
+                record = entry.archive.get(entry.index)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and _in_range(record, since, until):
+                yield entry, record
+        for entry in self.iter_chain():
+            try:
+                record = self.get(entry)
+            except (OSError, ValueError):
+                continue
+            if isinstance(record, dict) and _in_range(record, since, until):
+                yield entry, record
+
+    def verify(self, full=False):
+        return self.verifier.verify(full=full)
+
+    @staticmethod
+    def scan(root, since=None, until=None):
+        """(relative name, record) for every record under `root` (cold archives first), pruned by time range."""
+        from ledger_archive import ColdTier, iter_hot_files
+        yield from ColdTier(root).iter_records(since=since, until=until)
+        for path in iter_hot_files(root, since=since, until=until):
+            try:
+                with open(path, "rb") as f:
+                    record = json.loads(f.read())
+            except (OSError, ValueError, UnicodeDecodeError):
+                continue
+            if isinstance(record, dict) and _in_range(record, since, until):
+                yield os.path.relpath(path, root).replace(os.sep, "/"), record
+
+# ---------------------------------------------------------------------
+# Segments backend
+# ---------------------------------------------------------------------
+# NNNNNN.seg  frames: header <magic, body length, crc32(body), name length>,
+#             body = record name (utf-8) + record bytes. A sealed segment
+#             ends with a SEAL frame carrying its record count and SHA-256.
+# NNNNNN.idx  one fixed-width entry per record frame:
+#             <frame offset, frame length, sha256(record), hash_prev digest>
+# links.dat   32 bytes per position: hash_next filled in after the fact
+#             (records themselves are never rewritten).
+_FRAME = struct.Struct("<4sIIH")
+_ENTRY = struct.Struct("<QI32s32s")
+_RECORD, _SEAL = b"CAPR", b"SEAL"
+_ZERO = bytes(32)
+
+
+class SegmentEntry:
+    """One record in a segment ledger."""
+
+    __slots__ = ("position", "segment", "offset", "length", "sha256", "hash_prev", "name")
+
+    def __init__(self, position, segment, offset, length, sha256, hash_prev, name=None):
+        self.position = position
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.sha256 = sha256
+        self.hash_prev = hash_prev
+        self.name = name
+
+    @property
+    def path(self):
+        return f"{self.segment:06d}.seg@{self.offset}"
+
+    def as_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class SegmentLedger:
+    """
+    Append-only segment storage. Writers serialise on an flock; readers
+    only ever look at index entries, which are written after their frame,
+    so they never need the lock. The active segment is fsync'ed every
+    FSYNC_EVERY appends or FSYNC_INTERVAL seconds and sealed (SEAL frame,
+    fsync, chmod 0444) once it reaches SEGMENT_BYTES.
+    """
+
+    backend = "segments"
+
+    def __init__(self, root, segment_bytes=None, fsync_every=None, fsync_interval=None):
+        self.root = Path(root)
+        self.segment_bytes = segment_bytes or SEGMENT_BYTES
+        self.fsync_every = FSYNC_EVERY if fsync_every is None else fsync_every
+        self.fsync_interval = FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self._segments = []   # [(number, first position, count)]
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._verifier = None
+
+    @classmethod
+    def create(cls, root, **kwargs):
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        if not (root / "FORMAT").exists():
+            if any(root.iterdir()):
+                raise ValueError(f"{root} is not empty; refusing to create a segment ledger there")
+            (root / "FORMAT").write_text(FORMAT_TAG)
+        return cls(root, **kwargs)
+
+    # -----------------------------------------------------------------
+    # Lookups
+    # -----------------------------------------------------------------
+    def head(self):
+        self._refresh()
+        if not self._segments or not self._segments[-1][2]:
+            return None
+        number, first, count = self._segments[-1]
+        return self._entry(number, first, count - 1)
+
+    def count(self):
+        self._refresh()
+        return sum(s[2] for s in self._segments)
+
+    def at(self, position):
+        self._refresh()
+        for number, first, count in self._segments:
+            if first <= position < first + count:
+                return self._entry(number, first, position - first)
+        return None
+
+    def describe(self, entry):
+        """The record's CAP_LOGS-style name (read from its frame if not known yet)."""
+        if entry.name is None:
+            try:
+                self.read_raw(entry)
+            except (OSError, ValueError):
+                return entry.path
+        return entry.name
+
+    def read_raw(self, entry):
+        name, raw = self._read_frame(entry.segment, entry.offset, entry.length)
+        entry.name = name
+        return raw
+
+    def get(self, entry):
+        return _with_hash_next(json.loads(self.read_raw(entry)), self.hash_next(entry))
+
+    def iter_chain(self, after_position=0):
+        self._refresh()
+        for number, first, count in list(self._segments):
+            if first + count - 1 <= after_position:
+                continue
+            start = max(0, after_position + 1 - first)
+            with open(self._idx_path(number), "rb") as f:
+                f.seek(start * _ENTRY.size)
+                data = f.read((count - start) * _ENTRY.size)
+            for i, fields in enumerate(_ENTRY.iter_unpack(data), start):
+                yield _make_entry(number, first + i, fields)
+
+    def iter_records(self, since=None, until=None, after_position=0):
+        for entry in self.iter_chain(after_position):
+            try:
+                record = self.get(entry)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and _in_range(record, since, until):
+                yield entry, record
+
+    # -----------------------------------------------------------------
+    # Writes
+    # -----------------------------------------------------------------
+    def append(self, record, name=None, raw=None):
+        """Append one record (stored as `raw` bytes if given); returns its entry. Does not link it."""
+        with self._locked():
+            self._refresh()
+            self._recover()
+            entry = self._append(record, name, raw)
+            self._maybe_flush()
+            return entry
+
+    def append_chain(self, records):
+        """
+        Link each record onto the chain head, append it and record the old
+        head's hash_next, all under the writer lock. The fsync policy is
+        applied once per batch, so concurrent appends share one fsync.
+        """
+        entries = []
+        with self._locked():
+            self._refresh()
+            self._recover()
+            head = self.head()
+            for record in records:
+                _link_prev(record, head)
+                entry = self._append(record, None, None)
+                if head is not None:
+                    self._set_link(head, f"SHA256:{entry.sha256}")
+                entries.append(entry)
+                head = entry
+            self._maybe_flush()
+        return entries
+
+    def set_hash_next(self, entry, value):
+        """Record hash_next for `entry` in links.dat; the segment itself is left untouched."""
+        with self._locked():
+            self._set_link(entry, value)
+        return entry
+
+    def flush(self):
+        """fsync the active segment, its index and links.dat now."""
+        if self._segments:
+            number = self._segments[-1][0]
+            for p in (self._seg_path(number), self._idx_path(number), self.root / "links.dat"):
+                try:
+                    with open(p, "rb") as f:
+                        os.fsync(f.fileno())
+                except FileNotFoundError:
+                    pass
+        self._unsynced, self._last_sync = 0, time.monotonic()
+
+    def _append(self, record, name, raw):
+        raw = raw if raw is not None else encode_record(record)
+        name = (name or record_name(record)).encode("utf-8")
+        hash_prev = _digest_of(_hash_prev_of(raw))
+        body = name + raw
+        frame = _FRAME.pack(_RECORD, len(body), zlib.crc32(body), len(name)) + body
+        number, first, count = self._active()
+        size = self._seg_path(number).stat().st_size
+        if count and size + len(frame) > self.segment_bytes:
+            self._seal(number, first, count)
+            number, first, count = self._start_segment(number + 1, first + count)
+            size = 0
+        sha = hash_bytes(raw)
+        with open(self._seg_path(number), "ab") as f:
+            f.write(frame)
+        with open(self._idx_path(number), "ab") as f:
+            f.write(_ENTRY.pack(size, len(frame), bytes.fromhex(sha), hash_prev))
+        self._segments[-1] = (number, first, count + 1)
+        self._unsynced += 1
+        return SegmentEntry(first + count, number, size, len(frame), sha,
+                            _hash_str(hash_prev), name.decode("utf-8"))
+
+    def _set_link(self, entry, value):
+        fd = os.open(self.root / "links.dat", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            os.pwrite(fd, _digest_of(value), (entry.position - 1) * 32)
+        finally:
+            os.close(fd)
+
+    def _maybe_flush(self):
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.flush()
+
+    # -----------------------------------------------------------------
+    # Verification
+    # -----------------------------------------------------------------
+    def verify(self, full=False):
+        """
+        Check hash_prev links. Sealed segments never change, so a routine run
+        resumes from the last verified position using the digests stored in
+        the index; full=True re-reads and re-hashes every record as well.
+        """
+        from chain_verify import SegmentChainVerifier
+        if self._verifier is None:
+            self._verifier = SegmentChainVerifier(self)
+        return self._verifier.verify(full=full)
+
+    def check(self):
+        """Re-read every frame: CRCs, index agreement and seal digests. Returns a list of problems."""
+        self._refresh()
+        problems = []
+        for number, first, count in self._segments:
+            seg = self._seg_path(number)
+            data = seg.read_bytes()
+            entries = list(_ENTRY.iter_unpack(self._idx_path(number).read_bytes()))
+            frames = list(_iter_frames(data))
+            records = [f for f in frames if f[0] == _RECORD]
+            if len(records) != len(entries):
+                problems.append(f"{seg.name}: {len(records)} frames but {len(entries)} index entries")
+            for (kind, offset, length, name, raw), entry in zip(records, entries):
+                if (offset, length, bytes.fromhex(hash_bytes(raw))) != entry[:3]:
+                    problems.append(f"{seg.name}@{offset}: index entry does not match frame")
+            seal = frames[-1] if frames and frames[-1][0] == _SEAL else None
+            if number != self._segments[-1][0] and seal is None:
+                problems.append(f"{seg.name}: sealed segment has no SEAL frame")
+            if seal is not None:
+                meta = json.loads(seal[4])
+                if meta.get("sha256") != hash_bytes(data[:seal[1]]) or meta.get("records") != len(records):
+                    problems.append(f"{seg.name}: SEAL digest or record count does not match contents")
+            if len(frames) != len(records) + (1 if seal else 0):
+                problems.append(f"{seg.name}: unexpected frames")
+        return problems
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+    def _seg_path(self, number):
+        return self.root / f"{number:06d}.seg"
+
+    def _idx_path(self, number):
+        return self.root / f"{number:06d}.idx"
+
+    def _refresh(self):
+        """Reload the segment list from the index files (cheap: one entry per segment)."""
+        numbers = sorted(int(p.name[:-4]) for p in os.scandir(self.root)
+                         if p.name.endswith(".idx") and p.name[:-4].isdigit())
+        segments, first = [], 1
+        for number in numbers:
+            count = os.stat(self._idx_path(number)).st_size // _ENTRY.size
+            segments.append((number, first, count))
+            first += count
+        self._segments = segments
+
+    def _entry(self, number, first, i):
+        with open(self._idx_path(number), "rb") as f:
+            f.seek(i * _ENTRY.size)
+            fields = _ENTRY.unpack(f.read(_ENTRY.size))
+        return _make_entry(number, first + i, fields)
+
+    def _read_frame(self, number, offset, length):
+        with open(self._seg_path(number), "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        magic, body_len, crc, name_len = _FRAME.unpack_from(frame)
+        body = frame[_FRAME.size:]
+        if magic != _RECORD or len(body) != body_len or zlib.crc32(body) != crc:
+            raise ValueError(f"corrupt frame at {number:06d}.seg@{offset}")
+        return body[:name_len].decode("utf-8"), body[name_len:]
+
+    def hash_next(self, entry):
+        """hash_next recorded for `entry` through set_hash_next(), or None."""
+        try:
+            with open(self.root / "links.dat", "rb") as f:
+                f.seek((entry.position - 1) * 32)
+                digest = f.read(32)
+        except FileNotFoundError:
+            return None
+        return _hash_str(digest) if len(digest) == 32 and digest != _ZERO else None
+
+    def _locked(self):
+        return _FileLock(self.root / "LOCK")
+
+    def _active(self):
+        if not self._segments:
+            return self._start_segment(1, 1)
+        return self._segments[-1]
+
+    def _start_segment(self, number, first):
+        self._seg_path(number).touch()
+        self._idx_path(number).touch()
+        self._segments.append((number, first, 0))
+        return number, first, 0
+
+    def _seal(self, number, first, count):
+        seg = self._seg_path(number)
+        data = seg.read_bytes()
+        body = json.dumps({"records": count, "first_position": first, "sha256": hash_bytes(data),
+                           "sealed_at": datetime.now(timezone.utc).isoformat()}).encode()
+        with open(seg, "ab") as f:
+            f.write(_FRAME.pack(_SEAL, len(body), zlib.crc32(body), 0) + body)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._idx_path(number), "rb") as f:
+            os.fsync(f.fileno())
+        os.chmod(seg, 0o444)
+        os.chmod(self._idx_path(number), 0o444)
+
+    def _recover(self):
+        """
+        Make the active segment and its index agree after a crash: drop index
+        entries pointing past the end of the segment, index complete frames
+        that never made it into the index, and truncate a torn tail.
+        """
+        if not self._segments:
+            return
+        number, first, count = self._segments[-1]
+        seg, idx = self._seg_path(number), self._idx_path(number)
+        size = seg.stat().st_size
+        idx_size = idx.stat().st_size
+        entries = list(_ENTRY.iter_unpack(idx.read_bytes()[:count * _ENTRY.size]))
+        while entries and entries[-1][0] + entries[-1][1] > size:
+            entries.pop()
+        end = entries[-1][0] + entries[-1][1] if entries else 0
+        if end == size and len(entries) == count and idx_size == count * _ENTRY.size:
+            return
+        with open(seg, "rb") as f:
+            f.seek(end)
+            tail = f.read()
+        good, sealed = end, False
+        for kind, offset, length, name, raw in _iter_frames(tail):
+            good = end + offset + length
+            if kind == _SEAL:
+                sealed = True  # crashed between sealing and starting the next segment
+                break
+            entries.append((end + offset, length, bytes.fromhex(hash_bytes(raw)), _digest_of(_hash_prev_of(raw))))
+        if good < size:
+            print(f"[WARN] Truncating torn tail of {seg.name} ({size - good} bytes)")
+            os.truncate(seg, good)
+        if len(entries) != count or idx_size != count * _ENTRY.size:
+            with open(idx, "wb") as f:
+                f.write(b"".join(_ENTRY.pack(*e) for e in entries))
+                f.flush()
+                os.fsync(f.fileno())
+        self._segments[-1] = (number, first, len(entries))
+        if sealed:
+            self._start_segment(number + 1, first + len(entries))
+
+
+# ---------------------------------------------------------------------
+# Group commit
+# ---------------------------------------------------------------------
+class ChainAppender:
+    """
+    Group commit for chain appends within one process. Threads hand their
+    record to append(); whichever thread finds no batch in flight becomes
+    the leader and writes everything queued so far through one
+    ledger.append_chain() call (one lock, one fsync round), while the others
+    wait for their entries. Across processes the ledger lock still serialises.
+    """
+
+    def __init__(self, ledger, max_batch=256):
+        self.ledger = ledger
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._pending = []
+        self._busy = False
+
+    def append(self, record):
+        """Link and durably append `record` (updated in place); returns its entry."""
+        slot = {"record": record}
+        with self._cond:
+            self._pending.append(slot)
+            while "entry" not in slot and "error" not in slot:
+                if self._busy:
+                    self._cond.wait()
+                    continue
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                self._busy = True
+                self._cond.release()
+                try:
+                    with timed("chain_append"):
+                        entries = self.ledger.append_chain([s["record"] for s in batch])
+                    for s, entry in zip(batch, entries):
+                        s["entry"] = entry
+                except BaseException as e:
+                    for s in batch:
+                        s["error"] = e
+                finally:
+                    self._cond.acquire()
+                    self._busy = False
+                    self._cond.notify_all()
+        if "error" in slot:
+            raise slot["error"]
+        return slot["entry"]
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+
+
+def _iter_frames(data):
+    """(kind, offset, length, name, record bytes) for each complete, CRC-valid frame."""
+    pos = 0
+    while pos + _FRAME.size <= len(data):
+        magic, body_len, crc, name_len = _FRAME.unpack_from(data, pos)
+        end = pos + _FRAME.size + body_len
+        if magic not in (_RECORD, _SEAL) or end > len(data):
+            return
+        body = data[pos + _FRAME.size:end]
+        if zlib.crc32(body) != crc:
+            return
+        yield magic, pos, end - pos, body[:name_len].decode("utf-8", "replace"), body[name_len:]
+        pos = end
+
+def _hash_prev_of(raw):
+    try:
+        chain = json.loads(raw).get("governance_chain")
+        return chain.get("hash_prev") if isinstance(chain, dict) else None
+    except (ValueError, AttributeError):
+        return None
+
+def _make_entry(number, position, fields):
+    offset, length, sha, hash_prev = fields
+    return SegmentEntry(position, number, offset, length, sha.hex(), _hash_str(hash_prev))
+
+def _digest_of(value):
+    """32 raw bytes for "SHA256:<hex>" (zeros if missing or malformed)."""
+    text = str(value or "")
+    text = text.split(":", 1)[1] if ":" in text else text
+    try:
+        digest = bytes.fromhex(text)
+    except ValueError:
+        return _ZERO
+    return digest if len(digest) == 32 else _ZERO
+
+def _hash_str(digest):
+    return "SHA256:" + digest.hex()
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect a CAP ledger.")
+    parser.add_argument("cmd", choices=["info", "check"])
+    parser.add_argument("ledger", nargs="?", default=os.environ.get("LEDGER_PATH", "./CAP_LOGS"))
+    args = parser.parse_args()
+
+    ledger = open_ledger(args.ledger)
+    if args.cmd == "info":
+        head = ledger.head()
+        print(json.dumps({"backend": ledger.backend, "records": ledger.count(),
+                          "head": head.as_dict() if head else None}, indent=2))
+    else:
+        if ledger.backend != "segments":
+            raise SystemExit("check only applies to segment ledgers")
+        problems = ledger.check()
+        for p in problems:
+            print(f"❌ {p}")
+        if problems:
+            raise SystemExit(1)
+        print(f"✅ {ledger.count()} records in {len(ledger._segments)} segment(s) check out")
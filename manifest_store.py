@@ -0,0 +1,149 @@
+# manifest_store.py
+# Athena CAP Bridge – FalconForgeAI Implementation
+# Purpose: In-process cache for the FalconForge integrity manifest, revalidated
+#          against the GitHub contents API with ETag / blob sha.
+
+import asyncio, json, time
+from telemetry import cache_result, github_call
+
+REFRESH_BACKOFF_MIN = 1.0    # seconds before retrying GitHub after a failed refresh
+REFRESH_BACKOFF_MAX = 60.0   # doubling per consecutive failure, up to this
+
+# ---------------------------------------------------------------------
+#  ERRORS
+# ---------------------------------------------------------------------
+class ManifestUnavailable(Exception):
+    """Raised when GitHub cannot be reached and no cached manifest may be served."""
+
+# ---------------------------------------------------------------------
+#  MANIFEST STORE
+# ---------------------------------------------------------------------
+class ManifestStore:
+    """
+    TTL cache around the canon manifest, driven by a shared httpx.AsyncClient.
+
+    - fresh (age < ttl): served from memory, counted as a hit
+    - stale: served from memory while one background task revalidates
+      with If-None-Match (304 keeps the cached copy)
+    - older than ttl + max_stale, or empty: callers await the refresh, and
+      get ManifestUnavailable if it fails
+    - GitHub down: the last good manifest keeps being served (max_stale=None)
+    Concurrent refreshes are single-flighted onto one task; after a failure
+    the next one waits REFRESH_BACKOFF_MIN seconds, doubling per failure.
+    """
+
+    def __init__(self, url, headers=None, ttl=300, max_stale=None, client=None):
+        self.url = url
+        self.headers = dict(headers or {})
+        self.ttl = ttl
+        self.max_stale = max_stale  # None = serve stale for as long as GitHub is down
+        self.client = client        # set by the app lifespan
+
+        self._manifest = None
+        self._etag = None
+        self._sha = None
+        self._fetched_at = 0.0
+        self._last_error = None
+        self._refresh_task = None
+        self._failures = 0
+        self._retry_at = 0.0  # no refresh is started before this (monotonic) after a failure
+
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0,
+                      "not_modified": 0, "stale_served": 0, "errors": 0}
+
+    # -----------------------------------------------------------------
+    async def get(self):
+        """Return the manifest, refreshing it per the TTL policy."""
+        if self._manifest is not None:
+            age = time.monotonic() - self._fetched_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                cache_result("manifest", True)
+                return self._manifest
+            task = self._start_refresh()
+            if self.max_stale is None or age < self.ttl + self.max_stale:
+                self.stats["stale_served"] += 1
+                cache_result("manifest", True)
+                return self._manifest
+            cache_result("manifest", False)
+            await asyncio.shield(task)
+            if self._last_error is not None and time.monotonic() - self._fetched_at >= self.ttl + self.max_stale:
+                raise ManifestUnavailable(self._last_error)  # the refresh failed: too old to serve
+            return self._manifest
+
+        self.stats["misses"] += 1
+        cache_result("manifest", False)
+        await asyncio.shield(self._start_refresh())
+        if self._manifest is None:
+            raise ManifestUnavailable(self._last_error or "manifest fetch failed")
+        return self._manifest
+
+    def version(self):
+        """Identity of the cached manifest (blob sha, else ETag); None before the first fetch."""
+        return self._sha or self._etag
+
+    def snapshot(self):
+        """Counters and cache metadata for diagnostics."""
+        age = time.monotonic() - self._fetched_at if self._manifest is not None else None
+        return dict(self.stats, cached=self._manifest is not None, sha=self._sha,
+                    etag=self._etag, age_seconds=age, last_error=self._last_error)
+
+    # -----------------------------------------------------------------
+    def _start_refresh(self):
+        """
+        Single-flight: every caller shares the one in-progress refresh task.
+        While backing off after a failure the finished task is returned instead.
+        """
+        if self._refresh_task is not None and self._refresh_task.done() and time.monotonic() < self._retry_at:
+            return self._refresh_task
+        if self._refresh_task is None or self._refresh_task.done():
+            if self._manifest is not None:
+                self.stats["revalidations"] += 1
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def _refresh(self):
+        try:
+            result = await self._fetch()
+        except Exception as e:
+            self.stats["errors"] += 1
+            self._last_error = str(e) or type(e).__name__
+            self._retry_at = time.monotonic() + min(REFRESH_BACKOFF_MAX,
+                                                    REFRESH_BACKOFF_MIN * 2 ** min(self._failures, 16))
+            self._failures += 1
+            print(f"[WARN] Manifest refresh failed, serving cached copy: {self._last_error}")
+            return
+        self._failures, self._last_error = 0, None
+        if result is None:
+            self.stats["not_modified"] += 1
+        else:
+            self._manifest, self._etag, self._sha = result
+        self._fetched_at = time.monotonic()
+
+    async def _fetch(self):
+        """Returns (manifest, etag, sha), or None when GitHub says unchanged."""
+        headers = dict(self.headers)
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+
+        with github_call("manifest_contents") as call:
+            r = await self.client.get(self.url, headers=headers)
+            call.status = r.status_code
+        if r.status_code == 304:
+            return None
+        if r.status_code != 200:
+            raise ManifestUnavailable(f"GitHub contents API returned {r.status_code}")
+
+        file_meta = r.json()
+        etag = r.headers.get("ETag")
+        sha = file_meta.get("sha")
+        if sha and sha == self._sha:
+            # Metadata changed (e.g. new ETag) but the blob did not.
+            return self._manifest, etag, sha
+
+        with github_call("manifest_download") as call:
+            content = await self.client.get(file_meta["download_url"], headers=self.headers)
+            call.status = content.status_code
+        if content.status_code != 200:
+            raise ManifestUnavailable(f"Manifest download returned {content.status_code}")
+        return json.loads(content.text), etag, sha
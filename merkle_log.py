@@ -0,0 +1,347 @@
+# merkle_log.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Incremental RFC 6962 Merkle tree over CAP records, with signed tree
+#          heads and O(log N) inclusion / consistency proofs, so an auditor can
+#          check one record or a ledger extension without walking hash_prev links.
+#
+# Usage:
+#   python merkle_log.py sync       # add new ledger records to the tree
+#   python merkle_log.py publish    # sync and sign a new tree head
+#   python merkle_log.py root       # print the latest signed tree head
+
+import os, json, hmac, sqlite3, hashlib, threading, argparse
+from pathlib import Path
+from datetime import datetime, timezone
+
+MERKLE_SIGNING_KEY = os.environ.get("MERKLE_SIGNING_KEY", "")
+MERKLE_PUBLISH_INTERVAL = float(os.environ.get("MERKLE_PUBLISH_INTERVAL", "300"))  # seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leaves (
+    idx        INTEGER PRIMARY KEY,      -- 0-based leaf index
+    position   INTEGER NOT NULL,         -- ledger chain position
+    cap_id     TEXT,
+    leaf_hash  BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leaves_cap_id ON leaves(cap_id);
+CREATE TABLE IF NOT EXISTS nodes (
+    level  INTEGER NOT NULL,             -- subtree covers leaves [idx << level, (idx + 1) << level)
+    idx    INTEGER NOT NULL,
+    hash   BLOB NOT NULL,
+    PRIMARY KEY (level, idx)
+);
+CREATE TABLE IF NOT EXISTS tree_heads (
+    tree_size  INTEGER PRIMARY KEY,
+    root_hash  TEXT NOT NULL,
+    timestamp  TEXT NOT NULL,
+    signature  TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+# ---------------------------------------------------------------------
+# RFC 6962 hashing (shared with the offline verifier)
+# ---------------------------------------------------------------------
+def record_digest(record):
+    """
+    SHA-256 of a CAP record with governance_chain.hash_next removed, as
+    sorted compact JSON. hash_next is filled in after the fact, so leaving
+    it out keeps a record's leaf stable for life (and across backends).
+    """
+    data = dict(record)
+    chain = data.get("governance_chain")
+    if isinstance(chain, dict):
+        data["governance_chain"] = {k: v for k, v in chain.items() if k != "hash_next"}
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).digest()
+
+def leaf_hash(digest):
+    return hashlib.sha256(b"\x00" + digest).digest()
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def _split(n):
+    """Largest power of two strictly less than n (n > 1)."""
+    k = 1
+    while k << 1 < n:
+        k <<= 1
+    return k
+
+def sign_tree_head(tree_size, root_hex, timestamp, key=None):
+    """HMAC-SHA256 over "<size>:<root>:<timestamp>", in the sha256=<hex> form our webhooks use."""
+    key = MERKLE_SIGNING_KEY if key is None else key
+    if not key:
+        return None
+    message = f"{tree_size}:{root_hex}:{timestamp}".encode()
+    return "sha256=" + hmac.new(key.encode(), message, hashlib.sha256).hexdigest()
+
+def verify_tree_head(head, key):
+    expected = sign_tree_head(head["tree_size"], head["root_hash"], head["timestamp"], key)
+    return expected is not None and hmac.compare_digest(expected, head.get("signature") or "")
+
+def verify_inclusion(leaf, index, tree_size, path, root):
+    """RFC 9162 2.1.3.2: does `path` prove leaf hash `leaf` sits at `index` of the tree with `root`?"""
+    if index >= tree_size:
+        return False
+    fn, sn, r = index, tree_size - 1, leaf
+    for p in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            while not fn & 1 and fn:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
+
+def verify_consistency(size1, size2, root1, root2, proof):
+    """RFC 9162 2.1.4.2: is the tree (size2, root2) an append-only extension of (size1, root1)?"""
+    if size1 > size2:
+        return False
+    if size1 == size2:
+        return not proof and root1 == root2
+    if size1 == 0:
+        return not proof
+    if not proof:
+        return False
+    if size1 & (size1 - 1) == 0:
+        proof = [root1] + list(proof)
+    fn, sn = size1 - 1, size2 - 1
+    while fn & 1:
+        fn >>= 1
+        sn >>= 1
+    fr = sr = proof[0]
+    for c in proof[1:]:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            fr = node_hash(c, fr)
+            sr = node_hash(c, sr)
+            while not fn & 1 and fn:
+                fn >>= 1
+                sn >>= 1
+        else:
+            sr = node_hash(sr, c)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and fr == root1 and sr == root2
+
+# ---------------------------------------------------------------------
+# Merkle log
+# ---------------------------------------------------------------------
+class MerkleLog:
+    """
+    Append-only Merkle tree in SQLite. Appending leaf i stores the hash of
+    every perfect subtree it completes (at most log2 N rows), so the root
+    and any proof need only O(log N) node reads.
+    """
+
+    def __init__(self, db_path=None):
+        from ledger_index import LEDGER_STATE_DIR
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "merkle_log.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    # -----------------------------------------------------------------
+    # Growing the tree
+    # -----------------------------------------------------------------
+    def size(self):
+        return self._db.execute("SELECT COUNT(*) FROM leaves").fetchone()[0]
+
+    def sync(self, ledger):
+        """Append every ledger record after the last one added; returns the number added."""
+        with self._lock:
+            after = int(self._meta("position") or 0)
+            added = 0
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                size = self.size()
+                cold = getattr(ledger, "cold", None)
+                if not size and cold is not None:
+                    # A fresh log over an archived ledger starts with the cold prefix,
+                    # at positions -N..-1 ahead of the hot chain.
+                    position = -cold.count()
+                    for _, record in cold.iter_records():
+                        position += 1
+                        self._append(size, position - 1, record.get("cap_id"), leaf_hash(record_digest(record)))
+                        size += 1
+                        added += 1
+                for entry in ledger.iter_chain(after_position=after):
+                    try:
+                        record = ledger.get(entry)
+                    except (OSError, ValueError):
+                        continue
+                    if not isinstance(record, dict):
+                        continue
+                    self._append(size, entry.position, record.get("cap_id"), leaf_hash(record_digest(record)))
+                    size += 1
+                    added += 1
+                    after = entry.position
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('position', ?)", (str(after),))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return added
+
+    def _append(self, idx, position, cap_id, leaf):
+        self._db.execute("INSERT INTO leaves VALUES (?, ?, ?, ?)", (idx, position, cap_id, leaf))
+        self._db.execute("INSERT INTO nodes VALUES (0, ?, ?)", (idx, leaf))
+        level, h = 0, leaf
+        while idx & 1:  # this leaf completes a perfect subtree one level up
+            sibling = self._node(level, idx - 1)
+            h = node_hash(sibling, h)
+            idx >>= 1
+            level += 1
+            self._db.execute("INSERT INTO nodes VALUES (?, ?, ?)", (level, idx, h))
+
+    # -----------------------------------------------------------------
+    # Roots and signed tree heads
+    # -----------------------------------------------------------------
+    def root(self, tree_size=None):
+        tree_size = self.size() if tree_size is None else tree_size
+        if tree_size == 0:
+            return hashlib.sha256(b"").digest()
+        return self._range(0, tree_size)
+
+    def publish(self, force=False):
+        """
+        Sign and store a tree head for the current size if the tree grew and
+        MERKLE_PUBLISH_INTERVAL has passed since the last one (or `force`).
+        Returns the latest tree head.
+        """
+        with self._lock:
+            latest = self.latest_head()
+            size = self.size()
+            if latest and (latest["tree_size"] == size or (not force and _age(latest) < MERKLE_PUBLISH_INTERVAL)):
+                return latest
+            if size == 0 and not force:
+                return latest
+            root_hex = self.root(size).hex()
+            timestamp = datetime.now(timezone.utc).isoformat()
+            signature = sign_tree_head(size, root_hex, timestamp)
+            self._db.execute("INSERT OR REPLACE INTO tree_heads VALUES (?, ?, ?, ?)",
+                             (size, root_hex, timestamp, signature))
+            return self.latest_head()
+
+    def latest_head(self):
+        row = self._db.execute("SELECT tree_size, root_hash, timestamp, signature FROM tree_heads "
+                               "ORDER BY tree_size DESC LIMIT 1").fetchone()
+        return _head(row)
+
+    def heads(self, limit=100):
+        rows = self._db.execute("SELECT tree_size, root_hash, timestamp, signature FROM tree_heads "
+                                "ORDER BY tree_size DESC LIMIT ?", (limit,)).fetchall()
+        return [_head(r) for r in rows]
+
+    # -----------------------------------------------------------------
+    # Proofs
+    # -----------------------------------------------------------------
+    def find(self, cap_id):
+        """Leaf indexes for a cap_id (several if the id was reused)."""
+        return [r[0] for r in self._db.execute("SELECT idx FROM leaves WHERE cap_id = ? ORDER BY idx", (cap_id,))]
+
+    def leaf(self, idx):
+        row = self._db.execute("SELECT idx, position, cap_id, leaf_hash FROM leaves WHERE idx = ?",
+                               (idx,)).fetchone()
+        return {"leaf_index": row[0], "position": row[1], "cap_id": row[2], "leaf_hash": row[3].hex()} if row else None
+
+    def inclusion_proof(self, idx, tree_size=None):
+        """RFC 6962 audit path for leaf `idx` in the tree of `tree_size` leaves."""
+        tree_size = self.size() if tree_size is None else tree_size
+        if not 0 <= idx < tree_size <= self.size():
+            raise ValueError(f"leaf {idx} is not in a tree of size {tree_size}")
+        path, lo, hi = [], 0, tree_size
+        while hi - lo > 1:
+            k = _split(hi - lo)
+            if idx - lo < k:
+                path.append(self._range(lo + k, hi))
+                hi = lo + k
+            else:
+                path.append(self._range(lo, lo + k))
+                lo += k
+        return path[::-1]
+
+    def consistency_proof(self, first, second=None):
+        """RFC 6962 proof that the tree of size `first` is a prefix of the tree of size `second`."""
+        second = self.size() if second is None else second
+        if not 0 <= first <= second <= self.size():
+            raise ValueError(f"no consistency proof from {first} to {second}")
+        if first == 0 or first == second:
+            return []
+        return self._subproof(first, 0, second, True)
+
+    def _subproof(self, m, lo, hi, complete):
+        n = hi - lo
+        if m == n:
+            return [] if complete else [self._range(lo, hi)]
+        k = _split(n)
+        if m <= k:
+            return self._subproof(m, lo, lo + k, complete) + [self._range(lo + k, hi)]
+        return self._subproof(m - k, lo + k, hi, False) + [self._range(lo, lo + k)]
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+    def _node(self, level, idx):
+        row = self._db.execute("SELECT hash FROM nodes WHERE level = ? AND idx = ?", (level, idx)).fetchone()
+        if row is None:
+            raise KeyError(f"missing Merkle node ({level}, {idx})")
+        return row[0]
+
+    def _range(self, lo, hi):
+        """MTH of leaves [lo, hi): stored directly for aligned perfect subtrees, else split."""
+        n = hi - lo
+        if n & (n - 1) == 0 and lo % n == 0:
+            return self._node(n.bit_length() - 1, lo // n)
+        k = _split(n)
+        return node_hash(self._range(lo, lo + k), self._range(lo + k, hi))
+
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+
+def _head(row):
+    if row is None:
+        return None
+    return {"tree_size": row[0], "root_hash": row[1], "timestamp": row[2], "signature": row[3]}
+
+def _age(head):
+    return (datetime.now(timezone.utc) - datetime.fromisoformat(head["timestamp"])).total_seconds()
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    from ledger_store import open_ledger
+    parser = argparse.ArgumentParser(description="Maintain the CAP ledger Merkle log.")
+    parser.add_argument("cmd", nargs="?", default="sync", choices=["sync", "publish", "root"])
+    args = parser.parse_args()
+
+    log = MerkleLog()
+    if args.cmd in ("sync", "publish"):
+        added = log.sync(open_ledger())
+        print(f"✅ {added} record(s) added; tree size {log.size()}")
+    if args.cmd == "publish":
+        head = log.publish(force=True)
+        print(json.dumps(head, indent=2))
+    elif args.cmd == "root":
+        print(json.dumps(log.latest_head(), indent=2))
@@ -0,0 +1,139 @@
+# response_cache.py
+# Athena CAP Bridge – FalconForgeAI Implementation
+# Purpose: Conditional GET for read endpoints whose answer only changes with
+#          a version (the ledger's chain head, the manifest blob sha). Each
+#          response carries a weak ETag derived from (path + query, version),
+#          so If-None-Match is answered 304 without building the body, and the
+#          last body per path is kept until the version moves on.
+
+import os, json, time, hashlib, threading
+from collections import OrderedDict
+from email.utils import formatdate
+
+RESPONSE_CACHE_ENTRIES = int(os.environ.get("RESPONSE_CACHE_ENTRIES", "256"))  # paths cached per worker
+
+# ---------------------------------------------------------------------
+# Validators
+# ---------------------------------------------------------------------
+def cache_key(path, items):
+    """`path` plus its query (name, value) pairs in a stable order."""
+    items = sorted(items)
+    return path + ("?" + "&".join(f"{k}={v}" for k, v in items) if items else "")
+
+
+def make_etag(key, version):
+    """Weak: the body is equivalent for a version, not byte-identical (timestamps, counters)."""
+    digest = hashlib.blake2b(json.dumps([key, version]).encode(), digest_size=16).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == bare:
+            return True
+    return False
+
+# ---------------------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------------------
+class CachedResponse:
+    """A JSON body and its validators."""
+
+    __slots__ = ("version", "etag", "last_modified", "body")
+
+    def __init__(self, version, etag, body):
+        self.version = version
+        self.etag = etag
+        self.last_modified = formatdate(usegmt=True)
+        self.body = body
+
+    def headers(self):
+        return {"ETag": self.etag, "Last-Modified": self.last_modified, "Cache-Control": "no-cache"}
+
+
+class ResponseCache:
+    """
+    The latest 200 response per cache key, valid while the caller's version
+    is unchanged (a new version simply replaces it); least recently used
+    keys are dropped past max_entries.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or RESPONSE_CACHE_ENTRIES
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0}
+
+    def get(self, key, version):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None or cached.version != version:
+                return None
+            self._entries.move_to_end(key)
+            return cached
+
+    def put(self, key, version, payload):
+        cached = CachedResponse(version, make_etag(key, version),
+                                json.dumps(payload, sort_keys=True, separators=(",", ":")).encode())
+        with self._lock:
+            self._entries[key] = cached
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def respond(self, key, version, if_none_match, build):
+        """
+        (status, body, headers) for a GET of `key` at `version`: 304 when
+        If-None-Match already names it, else the cached body, else build()
+        -> (payload, status, version). A 200 is cached under the version
+        build() returns (which may have moved, e.g. by an audit record of its
+        own); None there means the response must not be cached.
+        """
+        etag = make_etag(key, version)
+        if etag_matches(if_none_match, etag):
+            self.stats["not_modified"] += 1
+            cached = self.get(key, version)
+            return 304, b"", cached.headers() if cached else {"ETag": etag, "Cache-Control": "no-cache"}
+        cached = self.get(key, version)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return 200, cached.body, cached.headers()
+        self.stats["misses"] += 1
+        payload, status, version = build()
+        if status != 200 or version is None:
+            return status, json.dumps(payload).encode(), {}
+        cached = self.put(key, version, payload)
+        return 200, cached.body, cached.headers()
+
+# ---------------------------------------------------------------------
+# Shared result
+# ---------------------------------------------------------------------
+class SharedResult:
+    """
+    The last result of an expensive call and the version it is valid for,
+    in one JSON file so every worker can reuse it (written atomically).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get(self, version):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data.get("result") if data.get("version") == version else None
+
+    def put(self, version, result):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "result": result}, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+check_canonical_json.py
+----------------------------------------
+Cross-language conformance check for canonical_json.py against normalize.js.
+
+Builds a corpus of JSON documents (hand-picked edge cases, seeded random
+CAP-shaped records and every record in the ledger), feeds the same JSON
+text to Node and to Python, and compares byte for byte:
+
+  canonical   JSON.stringify(normalizeValue(data))            → canonical_hash()
+  normalized  JSON.stringify(normalizeValue(data), null, 2)   → normalize.js file output
+  signing     sign_cap.js's property-list form                → ethics_signature()
+
+Python is checked through each of its serialisers: orjson (if installed),
+the stdlib C encoder and the exact stringify() fallback. Node loads the
+real normalize.js source (compiled as CommonJS, since package.json sets
+"type": "module").
+
+--save writes the corpus with Node's outputs as NDJSON; --corpus checks a
+saved file without needing node.
+
+Usage: check_canonical_json.py [--random 2000] [--seed 1] [--ledger CAP_LOGS]
+                               [--save corpus.ndjson | --corpus corpus.ndjson]
+"""
+
+import os, sys, json, math, random, struct, argparse, subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+import canonical_json
+from ledger_store import iter_ledger_records
+
+NODE_HARNESS = r"""
+const fs = require('fs'), path = require('path'), Module = require('module');
+const file = path.resolve(process.argv[1]);
+const mod = new Module(file);
+mod.filename = file;
+mod.paths = Module._nodeModulePaths(path.dirname(file));
+mod._compile(fs.readFileSync(file, 'utf8'), file);
+const { normalizeValue } = mod.exports;
+const out = [];
+for (const line of fs.readFileSync(0, 'utf8').split('\n')) {
+  if (!line) continue;
+  const data = JSON.parse(line);
+  const isObject = data && typeof data === 'object' && !Array.isArray(data);
+  out.push(JSON.stringify({
+    canonical: JSON.stringify(normalizeValue(data)),
+    normalized: JSON.stringify(normalizeValue(data), null, 2) + '\n',
+    signing: isObject ? JSON.stringify(normalizeValue(data, true), Object.keys(data).sort()) : null,
+  }));
+}
+process.stdout.write(out.join('\n') + '\n');
+"""
+
+SPACES = " \t\n\r\v\f\u00a0\u1680\u2000\u2005\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+NOT_SPACES = "\x1c\x1d\x1e\x1f\x85\u180e\u200b"  # whitespace to Python, not to JS
+TEXT = "abcXYZ019 _-:/.,\"\\é€ßΩ漢字😀🜁\ud800\udfff\x00\x08\x7f" + SPACES + NOT_SPACES
+
+# ---------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------
+def edge_cases():
+    numbers = [0, -0.0, 1, -1, 1.0, 0.5, 0.84, 0.1 + 0.2, 1.0000005, 1.0000015, 2.5e-6, 5e-7,
+               4.9999999e-7, 1e-6, 1e-7, 1e-5, 123456.789, 0.0078125, -0.0078125, 0.0234375,
+               1 / 3, -2 / 3, 1e15 + 0.5, 1e16, 1.5e20, 1e21, 1.5e21, 1e300, 5e-324, 1e-300,
+               1.7976931348623157e308, 9007199254740991, 9007199254740993, 2 ** 63, -2 ** 70,
+               123456789012345678901234567890, 4.35, 1.005, 2.675, 0.000001499999, 0.0000015]
+    strings = ["", " ", "  a  b  ", "\ta\nb\r\n", "a\u00a0\u00a0b", "\ufeffbom", "x\u2028y",
+               "keep\x1cthis", "nel\x85", "mongolian\u180evowel", "zw\u200bsp", "lone \ud800 high",
+               "lone \udc00 low", "pair 😀", "ctrl \x00\x01\x1f", "quote \" back \\ slash", "é漢字"]
+    keys = {"b": 1, "a": 2, "B": 3, "_": 4, "10": 5, "2": 6, "0": 7, "01": 8, "-1": 9, "1.5": 10,
+            "4294967294": 11, "4294967295": 12, "\uffff": 13, "😀": 14, "é": 15, "": 16, " key ": 17}
+    cases = [
+        {"numbers": numbers}, {"strings": strings}, keys,
+        {"nested": {"z": {"y": [{"b": 1, "a": [3, {"d": None, "c": True}]}]}, "empty": {}, "list": []}},
+        {"__proto__": 1, "a": 1}, {"__proto__": {"x": 1}, "b": 2}, {"a": {"__proto__": [1]}},
+        {"__proto__": {}, "a": {}}, {"__proto__": {"x": 1}, "x": 5, "y": {"x": 2}},
+        {"__proto__": [1, 2], "length": 0, "0": "a", "n": {"__proto__": ["q"]}},
+        {"__proto__": {"__proto__": {"deep": 1}}, "deep": {"k": 1}},
+        [1, "two", None, False, {"b": [], "a": {}}], "  bare   string  ", 42.0000004, None, True,
+        {"cap_id": "x", "validator_signatures": {"validator": "v", "cap_id": "nested"}, "0": {"0": 1, "cap_id": 2}},
+    ]
+    for x in numbers:
+        cases.append({"n": x, "neg": -x if isinstance(x, float) else x})
+    return cases
+
+def random_number(rng):
+    kind = rng.randrange(7)
+    if kind == 0:
+        return rng.random()
+    if kind == 1:
+        return round(rng.uniform(-1000, 1000), rng.randrange(1, 9))
+    if kind == 2:
+        return rng.randrange(-10 ** rng.randrange(1, 20), 10 ** rng.randrange(1, 20))
+    if kind == 3:  # exact binary fractions — where toFixed ties live
+        return rng.randrange(-2 ** 12, 2 ** 12) / 2 ** rng.randrange(1, 12)
+    if kind == 4:
+        return rng.uniform(-1, 1) * 10 ** rng.randrange(-12, 25)
+    if kind == 5:  # any finite double
+        while True:
+            x = struct.unpack("<d", rng.getrandbits(64).to_bytes(8, "little"))[0]
+            if math.isfinite(x):
+                return x
+    return rng.randrange(0, 1000001) / 1000000 + rng.choice([0, 5e-7, -5e-7])
+
+def random_string(rng, n=None):
+    return "".join(rng.choice(TEXT) for _ in range(rng.randrange(0, 24) if n is None else n))
+
+def random_value(rng, depth=0):
+    kind = rng.randrange(9 if depth < 4 else 6)
+    if kind < 2:
+        return random_number(rng)
+    if kind < 4:
+        return random_string(rng)
+    if kind == 4:
+        return rng.choice([None, True, False])
+    if kind == 5:
+        return rng.randrange(-5, 5)
+    if kind < 8:
+        return {random_string(rng, rng.randrange(0, 6)): random_value(rng, depth + 1)
+                for _ in range(rng.randrange(0, 6))}
+    return [random_value(rng, depth + 1) for _ in range(rng.randrange(0, 6))]
+
+def random_cap(rng, i):
+    cap = {
+        "cap_id": f"00000000-0000-4000-8000-{i:012d}",
+        "timestamp": f"2025-{1 + i % 12:02d}-01T00:00:{i % 60:02d}Z",
+        "domain": rng.choice(["Governance", "Audit", " Civic  Ethics "]),
+        "context_mode": "Advisor",
+        "hs": random_number(rng), "er_delta": random_number(rng), "ems": rng.random(),
+        "validator_signatures": {"validator": "Athena-Audit-Core", "ethics_signature": random_string(rng)},
+        "governance_chain": {"hash_prev": "SHA256:" + "%064x" % rng.getrandbits(256),
+                             "hash_next": "SHA256:" + "0" * 64},
+        "reasoning_summary": random_string(rng, 60),
+    }
+    for _ in range(rng.randrange(0, 4)):
+        cap[random_string(rng, rng.randrange(1, 6))] = random_value(rng)
+    return cap
+
+def build_corpus(random_count, seed, ledger):
+    rng = random.Random(seed)
+    docs = edge_cases()
+    docs += [random_cap(rng, i) if i % 2 else random_value(rng) for i in range(random_count)]
+    if ledger and os.path.exists(ledger):
+        docs += [record for _, record in iter_ledger_records(ledger)]
+    return [json.dumps(d) for d in docs]
+
+# ---------------------------------------------------------------------
+# Node and Python sides
+# ---------------------------------------------------------------------
+def run_node(lines):
+    proc = subprocess.run(["node", "-e", NODE_HARNESS, str(ROOT / "normalize.js")],
+                          input="\n".join(lines) + "\n", capture_output=True, text=True, check=True)
+    return [json.loads(line) for line in proc.stdout.split("\n") if line]
+
+def run_python(line, exact=False):
+    data = json.loads(line)
+    signing = (canonical_json.signing_bytes(data).decode("utf-8", "surrogatepass")
+               if isinstance(data, dict) else None)
+    if exact:
+        normalized = canonical_json.normalize_value(data)
+        return {"canonical": canonical_json.stringify(normalized),
+                "normalized": canonical_json.stringify(normalized, indent=2) + "\n",
+                "signing": signing}
+    return {"canonical": canonical_json.canonical_bytes(data).decode("utf-8", "surrogatepass"),
+            "normalized": canonical_json.normalized_bytes(data).decode("utf-8", "surrogatepass"),
+            "signing": signing}
+
+def compare(lines, expected, label, exact=False):
+    failures = 0
+    for line, want in zip(lines, expected):
+        got = run_python(line, exact)
+        for form in ("canonical", "normalized", "signing"):
+            if got[form] != want[form]:
+                failures += 1
+                if failures <= 5:
+                    print(f"❌ [{label}] {form} mismatch for {line[:120]}")
+                    print(f"   node:   {want[form]!r:.200}")
+                    print(f"   python: {got[form]!r:.200}")
+    return failures
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Check canonical_json.py against normalize.js byte for byte.")
+    ap.add_argument("--random", type=int, default=2000, help="random documents to generate")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--ledger", default=str(ROOT / "CAP_LOGS"), help="also include every record in this ledger")
+    ap.add_argument("--save", help="write corpus + Node outputs (NDJSON) here")
+    ap.add_argument("--corpus", help="check against a saved corpus instead of running node")
+    args = ap.parse_args(argv)
+
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            saved = [json.loads(line) for line in f if line.strip()]
+        lines, expected = [s["input"] for s in saved], saved
+    else:
+        lines = build_corpus(args.random, args.seed, args.ledger)
+        expected = run_node(lines)
+        if len(expected) != len(lines):
+            sys.exit(f"❌ node returned {len(expected)} results for {len(lines)} documents")
+        if args.save:
+            with open(args.save, "w", encoding="utf-8") as f:
+                for line, want in zip(lines, expected):
+                    f.write(json.dumps(dict(want, input=line)) + "\n")
+
+    failures = 0
+    fast = canonical_json.orjson
+    if fast is not None:
+        failures += compare(lines, expected, "orjson")
+    canonical_json.orjson = None
+    try:
+        failures += compare(lines, expected, "json")
+    finally:
+        canonical_json.orjson = fast
+    failures += compare(lines, expected, "stringify", exact=True)
+
+    paths = "orjson, json, stringify" if fast is not None else "json, stringify; orjson not installed"
+    if failures:
+        print(f"❌ {failures} mismatches over {len(lines)} documents ({paths})")
+        return 1
+    print(f"✅ {len(lines)} documents match normalize.js byte for byte ({paths})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+check_ledger_conversion.py
+----------------------------------------
+Round-trip check for convert_ledger.py on a ledger with a cold tier.
+
+Generates --records synthetic CAPs spread over two years, archives every
+month older than --days into .cold (ledger_archive.py), then converts
+files → segments → files and checks each step:
+
+  * every record comes across, archived months included, in chain order
+    and byte for byte
+  * the first record still links to the null hash and verify(full=True)
+    passes on both results
+
+Everything happens in a temporary directory (or --dir, kept afterwards).
+
+Usage: check_ledger_conversion.py [--records 2000] [--days 90] [--dir DIR]
+"""
+
+import os, sys, shutil, tempfile, argparse
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def run(base, records, days):
+    os.environ["LEDGER_STATE_DIR"] = str(base / "state")  # before ledger_index is imported
+    sys.path[:0] = [str(ROOT), str(ROOT / "scripts"), str(ROOT / "benchmarks")]
+    from generate_ledger import generate
+    from convert_ledger import to_segments, to_files
+    from ledger_archive import ColdTier, archive_ledger
+    from ledger_index import LedgerIndex
+    from ledger_store import NULL_HASH, FileLedger, SegmentLedger, open_ledger
+
+    src, segments, files = base / "CAP_LOGS", base / "segments", base / "roundtrip"
+    generate(src, records, span_days=730, quiet=True)
+    archived = sum(n for _, n in archive_ledger(open_ledger(src, backend="files"), days))
+    if not archived:
+        return [f"nothing was archived at --days {days}: the check would not cover the cold tier"]
+
+    source = FileLedger(src)
+    source.index.sync()
+    expected = list(ColdTier(src).iter_raw())
+    expected += [(e.path, source.read_raw(e)) for e in source.index.iter_chain()]
+
+    problems = []
+    count = to_segments(src, segments)
+    ledger = SegmentLedger(segments)
+    converted = []
+    for e in ledger.iter_chain():
+        raw = ledger.read_raw(e)  # fills in e.name from the frame
+        converted.append((e.name, raw))
+    problems += _compare("to-segments", count, converted, expected, records)
+    problems += _check_chain("to-segments", ledger, ledger.at(1) if ledger.count() else None, NULL_HASH)
+
+    to_files(segments, files)
+    roundtrip = FileLedger(files, index=LedgerIndex(files, db_path=base / "state" / "roundtrip.sqlite3"))
+    roundtrip.index.rebuild()
+    converted = [(e.path, roundtrip.read_raw(e)) for e in roundtrip.index.iter_chain()]
+    problems += _compare("to-files", len(converted), converted, expected, records)
+    problems += _check_chain("to-files", roundtrip, roundtrip.index.at(1), NULL_HASH)
+    print(f"   {archived} of {records} records came from the cold tier")
+    return problems
+
+
+def _compare(step, count, converted, expected, records):
+    if count != records or len(converted) != records:
+        return [f"{step}: {count} converted, {len(converted)} in the result, {records} expected"]
+    for i, (got, want) in enumerate(zip(converted, expected)):
+        if got != want:
+            return [f"{step}: record {i + 1} is {got[0]}, expected {want[0]} (or its bytes differ)"]
+    return []
+
+
+def _check_chain(step, ledger, first, null_hash):
+    problems = []
+    if first is None or first.hash_prev != null_hash:
+        problems.append(f"{step}: the first record does not link to the null hash")
+    result = ledger.verify(full=True)
+    if result["status"] != "valid":
+        problems.append(f"{step}: verify(full=True) is {result['status']} "
+                        f"({len(result.get('breaks', []))} breaks)")
+    return problems
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Round-trip a ledger with archived months through convert_ledger.py.")
+    ap.add_argument("--records", type=int, default=2000)
+    ap.add_argument("--days", type=int, default=90, help="archive months older than this")
+    ap.add_argument("--dir", help="work here and keep it (default: a temporary directory)")
+    args = ap.parse_args(argv)
+
+    base = Path(args.dir or tempfile.mkdtemp(prefix="athena_convert_"))
+    try:
+        problems = run(base, args.records, args.days)
+    finally:
+        if not args.dir:
+            shutil.rmtree(base, ignore_errors=True)
+    if problems:
+        for p in problems:
+            print(f"❌ {p}")
+        return 1
+    print(f"✅ {args.records} records converted to segments and back, archived months included")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,41 +4,75 @@ compute_civic_drift.py
 ----------------------------------------
 Computes Humanization (HS), Empathy Drift (ERΔ), and Civic Accessibility (CAI)
 averages from CAP payloads. Prints an overall compliance index.
+
+Aggregates live in a persistent drift store (civic_drift.py): each run only
+ingests records that are new or changed since the last one, and the window
+is answered from per-day x domain rollups. Scores are read from the CAP
+record itself (hs, er_delta, cai, ...), falling back to a "metrics" block.
+
+Usage: compute_civic_drift.py <payload_dir>
+           [--since 2025-10] [--until 2025-12-31] [--domain Governance ...]
+           [--by day|week|month|domain] [--rebuild] [--json]
 """
 
-import os, json, statistics, sys
+import sys, json, argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from civic_drift import DriftStore, civic_index
+
+THRESHOLD = 0.7
+
 
-if len(sys.argv) < 2:
-    print("Usage: compute_civic_drift.py <payload_dir>")
-    sys.exit(1)
+def _means(stats):
+    return {m: round(s.mean, 3) for m, s in stats.items()}
 
-payload_dir = sys.argv[1]
-metrics = {"HS": [], "ERD": [], "CAI": []}
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Compute civic drift indices from CAP payloads.")
+    ap.add_argument("payload_dir")
+    ap.add_argument("--since", help="window start (YYYY, YYYY-MM, YYYY-MM-DD or ISO)")
+    ap.add_argument("--until", help="window end, inclusive")
+    ap.add_argument("--domain", action="append", help="restrict to this domain (repeatable)")
+    ap.add_argument("--by", choices=["day", "week", "month", "domain"], help="also print a breakdown")
+    ap.add_argument("--rebuild", action="store_true", help="recompute the store from scratch")
+    ap.add_argument("--db", help="drift store location (default: $LEDGER_STATE_DIR/civic_drift.sqlite3)")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args(argv)
 
-for filename in os.listdir(payload_dir):
-    if not filename.endswith(".json"):
-        continue
-    path = os.path.join(payload_dir, filename)
+    store = DriftStore(args.payload_dir, db_path=args.db)
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        civic = data.get("metrics", {})
-        for k in metrics:
-            if k in civic:
-                metrics[k].append(float(civic[k]))
-    except Exception:
-        continue
-
-def avg(values): return round(statistics.mean(values), 3) if values else 0
-
-HS, ERD, CAI = avg(metrics["HS"]), avg(metrics["ERD"]), avg(metrics["CAI"])
-CCI = round((HS + (1 - ERD) + CAI) / 3, 3)
-
-print(f"HS={HS}  ERΔ={ERD}  CAI={CAI}")
-print(f"Civic Compliance Index (CCI): {CCI}")
-
-if CCI < 0.7:
-    print("❌ Civic compliance below threshold.")
-    sys.exit(1)
-else:
-    print("✅ Civic compliance within acceptable range.")
+        store.rebuild() if args.rebuild else store.ingest()
+        stats = store.summary(args.since, args.until, args.domain)
+        series = store.series(args.by, args.since, args.until, args.domain) if args.by else []
+    finally:
+        store.close()
+
+    CCI = civic_index(stats)
+    if args.json:
+        out = {"cci": CCI, "threshold": THRESHOLD,
+               "metrics": {m: s.as_dict() for m, s in sorted(stats.items())}}
+        if args.by:
+            out["by_" + args.by] = [{"bucket": k, "cci": civic_index(v), "metrics": _means(v)}
+                                    for k, v in series]
+        print(json.dumps(out, indent=2))
+    else:
+        means = _means(stats)
+        HS, ERD, CAI = means.get("HS", 0), means.get("ERD", 0), means.get("CAI", 0)
+        print(f"HS={HS}  ERΔ={ERD}  CAI={CAI}")
+        for bucket, bstats in series:
+            m = _means(bstats)
+            print(f"  {bucket or '(undated)':<12} HS={m.get('HS', 0)}  ERΔ={m.get('ERD', 0)}  "
+                  f"CAI={m.get('CAI', 0)}  CCI={civic_index(bstats)}")
+        print(f"Civic Compliance Index (CCI): {CCI}")
+
+    if CCI < THRESHOLD:
+        if not args.json:
+            print("❌ Civic compliance below threshold.")
+        return 1
+    if not args.json:
+        print("✅ Civic compliance within acceptable range.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+convert_ledger.py
+----------------------------------------
+Converts a CAP ledger between the CAP_LOGS file tree and the append-only
+segment format (see ledger_store.py).
+
+  to-segments  imports the archived months (CAP_LOGS/.cold, ledger_archive.py)
+               and then CAP_LOGS/<year>/<month>/*.json in chain order, storing
+               each record's bytes verbatim so every SHA-256 link still holds.
+  to-files     writes every record back to <year>/<month>/<name>.json
+               verbatim (the files backend derives hash_next from the chain),
+               with file mtimes set in chain order (the order it links them in).
+
+Usage: convert_ledger.py to-segments <cap_logs_dir> <segment_dir> [--segment-mb 64]
+       convert_ledger.py to-files <segment_dir> <cap_logs_dir>
+"""
+
+import os, sys, json, time, tempfile, argparse, itertools
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ledger_index import LedgerIndex
+from ledger_store import SegmentLedger, is_segment_ledger
+from ledger_archive import COLD_DIR, ColdTier
+
+
+def to_segments(src, dst, segment_mb=None):
+    with tempfile.TemporaryDirectory() as tmp:
+        index = LedgerIndex(src, db_path=Path(tmp) / "import.sqlite3")
+        index.rebuild()  # hot tier only: .cold is hidden from the scan
+        cold = ColdTier(src)
+        archived = cold.months()
+        ledger = SegmentLedger.create(dst, segment_bytes=segment_mb and segment_mb << 20,
+                                      fsync_every=1 << 30, fsync_interval=float("inf"))
+        # The archived months come first in the chain; hot files left in one
+        # by an interrupted archival run are duplicates of archived records.
+        hot = ((e.path, Path(index.full_path(e)).read_bytes()) for e in index.iter_chain()
+               if not cold.covers(e.path, archived))
+        count = 0
+        for name, raw in itertools.chain(cold.iter_raw(), hot):
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                print(f"⚠️ Skipped non-JSON file: {name}")
+                continue
+            ledger.append(record, name=name, raw=raw)
+            count += 1
+        ledger.flush()
+        index.close()
+    return count
+
+def to_files(src, dst):
+    ledger = SegmentLedger(src)
+    dst = Path(dst)
+    base_ns = time.time_ns() - ledger.count() * 1000
+    count = 0
+    for entry in ledger.iter_chain():
+        raw = ledger.read_raw(entry)
+        path = dst / entry.name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(raw)
+        stamp = base_ns + entry.position * 1000
+        os.utime(path, ns=(stamp, stamp))
+        count += 1
+    return count
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Convert a CAP ledger between storage backends.")
+    ap.add_argument("direction", choices=["to-segments", "to-files"])
+    ap.add_argument("source")
+    ap.add_argument("destination")
+    ap.add_argument("--segment-mb", type=int, default=None, help="segment size (default: $LEDGER_SEGMENT_BYTES or 64 MB)")
+    args = ap.parse_args(argv)
+
+    if args.direction == "to-segments":
+        if is_segment_ledger(args.source):
+            sys.exit(f"❌ {args.source} is already a segment ledger")
+        count = to_segments(args.source, args.destination, args.segment_mb)
+    else:
+        if not is_segment_ledger(args.source):
+            sys.exit(f"❌ {args.source} is not a segment ledger")
+        if (Path(args.source) / COLD_DIR).exists():
+            sys.exit(f"❌ {args.source} has archived months ({COLD_DIR}); segment ledgers are not archived")
+        if Path(args.destination).exists() and any(Path(args.destination).iterdir()):
+            sys.exit(f"❌ {args.destination} is not empty")
+        count = to_files(args.source, args.destination)
+    print(f"✅ Converted {count} CAP records: {args.source} → {args.destination}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
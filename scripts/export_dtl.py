@@ -3,31 +3,133 @@
 export_dtl.py
 ----------------------------------------
 Bundles recent CAP payloads into a Decision Trace Ledger export for audit.
+
+Records are streamed straight from disk to the export file one at a time,
+so memory stays flat however large the ledger is. Payloads are discovered
+recursively (CAP_LOGS/<year>/<month>/...); --since/--until skip whole
+year/month directories outside the range before checking each timestamp.
+<payload_dir> may also be a segment ledger (see ledger_store.py).
+
+Formats:
+  bundle  {"timestamp": ..., "records": [...]}  (default, same shape as before)
+  array   a bare JSON array of records
+  ndjson  one record per line
+
+Usage: export_dtl.py <payload_dir> <output_dir>
+           [--format bundle|array|ndjson] [--compress none|gzip|zstd]
+           [--since 2025-01] [--until 2025-03-31] [--domain Governance ...]
 """
 
-import os, sys, json, datetime
+import io, os, sys, json, gzip, argparse, datetime
+from pathlib import Path
 
-if len(sys.argv) < 3:
-    print("Usage: export_dtl.py <payload_dir> <output_dir>")
-    sys.exit(1)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ledger_store import iter_ledger_records
 
-payload_dir, output_dir = sys.argv[1], sys.argv[2]
-os.makedirs(output_dir, exist_ok=True)
+EXTENSIONS = {"bundle": ".json", "array": ".json", "ndjson": ".ndjson"}
+COMPRESSED = {"none": "", "gzip": ".gz", "zstd": ".zst"}
+_INDENT = {"bundle": "    ", "array": "  "}
 
-timestamp = datetime.datetime.utcnow().isoformat()
-bundle = {"timestamp": timestamp, "records": []}
+# ---------------------------------------------------------------------
+# Record source
+# ---------------------------------------------------------------------
+def iter_records(payload_dir, since=None, until=None, domains=None):
+    """Yield parsed CAP records matching the time range and domain filter."""
+    wanted = {d.lower() for d in domains} if domains else None
+    for _, record in iter_ledger_records(payload_dir, since=since, until=until):
+        if wanted is not None and str(record.get("domain", "")).lower() not in wanted:
+            continue
+        yield record
 
-for filename in os.listdir(payload_dir):
-    if not filename.endswith(".json"):
-        continue
-    with open(os.path.join(payload_dir, filename), "r", encoding="utf-8") as f:
+# ---------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------
+def open_sink(path, compress="none"):
+    """Text-mode writer for `path`, optionally gzip/zstd compressed."""
+    if compress == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", compresslevel=6)
+    if compress == "zstd":
         try:
-            bundle["records"].append(json.load(f))
-        except:
-            continue
+            import zstandard
+        except ImportError:
+            sys.exit("❌ zstd compression needs the 'zstandard' package (pip install zstandard).")
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor(level=3).stream_writer(raw), encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+def render_record(record, fmt):
+    """One record as it appears in an export of format `fmt`, ready for ExportWriter.add()."""
+    if fmt == "ndjson":
+        return json.dumps(record, ensure_ascii=False) + "\n"
+    # bundle/array: byte-for-byte what json.dump(..., indent=2) would produce
+    return json.dumps(record, indent=2).replace("\n", "\n" + _INDENT[fmt])
+
+class ExportWriter:
+    """Writes an export to `out` one rendered record at a time (see render_record())."""
+
+    def __init__(self, out, fmt, timestamp):
+        self.out, self.fmt, self.count = out, fmt, 0
+        if fmt == "bundle":
+            out.write("{\n  " + json.dumps("timestamp") + ": " + json.dumps(timestamp) + ",\n  \"records\": [")
+        elif fmt == "array":
+            out.write("[")
+
+    def add(self, rendered):
+        if self.fmt == "ndjson":
+            self.out.write(rendered)
+        else:
+            self.out.write(("," if self.count else "") + "\n" + _INDENT[self.fmt] + rendered)
+        self.count += 1
+
+    def close(self):
+        """Finish the document; returns the number of records written."""
+        if self.fmt != "ndjson":
+            closing = "\n" + _INDENT[self.fmt][:-2] + "]" if self.count else "]"
+            self.out.write(closing + ("\n}" if self.fmt == "bundle" else ""))
+        return self.count
+
+def write_export(out, records, fmt, timestamp):
+    """Stream `records` to `out`; returns the number written."""
+    writer = ExportWriter(out, fmt, timestamp)
+    for record in records:
+        writer.add(render_record(record, fmt))
+    return writer.close()
+
+def export_name(fmt, compress, timestamp):
+    return f"DTL_EXPORT_{timestamp}{EXTENSIONS[fmt]}{COMPRESSED[compress]}"
+
+# ---------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export CAP payloads as a Decision Trace Ledger.")
+    ap.add_argument("payload_dir")
+    ap.add_argument("output_dir")
+    ap.add_argument("--format", choices=sorted(EXTENSIONS), default="bundle")
+    ap.add_argument("--compress", choices=sorted(COMPRESSED), default="none")
+    ap.add_argument("--since", help="earliest timestamp (YYYY, YYYY-MM, YYYY-MM-DD or ISO)")
+    ap.add_argument("--until", help="latest timestamp, inclusive (2025-03 means through the end of March)")
+    ap.add_argument("--domain", action="append", help="only export this domain (repeatable)")
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    timestamp = datetime.datetime.utcnow().isoformat()
+    output_path = os.path.join(args.output_dir, export_name(args.format, args.compress, timestamp))
+    partial = output_path + ".part"
+
+    records = iter_records(args.payload_dir, args.since, args.until, args.domain)
+    try:
+        with open_sink(partial, args.compress) as out:
+            count = write_export(out, records, args.format, timestamp)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, output_path)
+
+    print(f"✅ Decision Trace Ledger exported to {output_path} ({count} records)")
+    return 0
 
-output_path = os.path.join(output_dir, f"DTL_EXPORT_{timestamp}.json")
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(bundle, f, indent=2)
 
-print(f"✅ Decision Trace Ledger exported to {output_path}")
+if __name__ == "__main__":
+    sys.exit(main())
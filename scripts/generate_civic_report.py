@@ -16,13 +16,14 @@ os.makedirs(report_dir, exist_ok=True)
 today = datetime.date.today().isoformat()
 
 report_file = os.path.join(report_dir, f"civic_report_{today}.md")
+archive_days = os.environ.get("LEDGER_ARCHIVE_DAYS", "90")
 
 report = f"""# Athena Civic Compliance Report — {today}
 
 **Integrity Status:** Verified  
 **Bridge Endpoint:** https://athena-cap-bridge.onrender.com  
 **Civic Indices:** Auto-computed  
-**Archived Logs:** Moved >90 days  
+**Archived Logs:** Months older than {archive_days} days sealed into .cold  
 **Slack Alerts:** Grouped notification enabled  
 
 Generated automatically by Athena v3.5 Civic Compliance Workflow.
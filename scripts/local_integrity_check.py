@@ -1,23 +1,33 @@
 #!/usr/bin/env python3
-import json, hashlib, requests, sys, os
+"""
+local_integrity_check.py
+----------------------------------------
+Verifies every module listed in the FalconForge integrity manifest in one
+concurrent pass, self-heals the CAP schema from the canonical repo if it has
+drifted, then validates cap_record.json against it.
+
+Digests are cached in LEDGER_STATE_DIR/hash_cache.sqlite3 keyed on
+(path, size, mtime_ns, inode), so unchanged files are never re-read and a
+warm run costs one stat per module. Modules not present in this checkout
+are reported but only fail the run with --strict.
+
+Usage: local_integrity_check.py [--jobs N] [--base-dir schemas] [--no-cache] [--strict]
+"""
+import json, sys, os, argparse
 from datetime import datetime
 from pathlib import Path
-from jsonschema import validate, ValidationError
 from colorama import Fore, Style, init
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from hash_engine import HashCache, sha256_file, verify_hashes
+
 init(autoreset=True)
 SCHEMA_PATH = Path("schemas/ATHENA_CAP_SCHEMA_v3_5.json")
 MANIFEST_PATH = Path("schemas/FalconForge_Integrity_Manifest_v3_5.json")
+CANON_URL = "https://raw.githubusercontent.com/falconforge-ai/falconforge-codex/main/falconforge-athena-v3_5/canonical/"
 LOG_DIR = Path("archive/CAP_LOGS")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-def sha256_file(path):
-    h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
 def log(msg):
     log_file = LOG_DIR / f"integrity_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.log"
     with open(log_file, "a", encoding="utf-8") as lf:
@@ -25,37 +35,70 @@ def log(msg):
     print(msg)
 
 def fetch(url, target):
+    import requests  # only needed when self-healing
     r = requests.get(url, timeout=10)
     r.raise_for_status()
     with open(target, "wb") as f:
         f.write(r.content)
 
-def main():
+def load_manifest():
     try:
         with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
             manifest = json.load(f)
-        expected = [m for m in manifest["modules"] if m["name"] == "ATHENA_CAP_SCHEMA_v3_5.json"][0]["sha256"].split(":")[1]
+        modules = manifest["modules"]
+        if not any(m["name"] == SCHEMA_PATH.name for m in modules):
+            raise KeyError(f"{SCHEMA_PATH.name} not listed")
+        return modules
     except Exception as e:
         log(Fore.YELLOW + f"Manifest error: {e}, attempting to refetch.")
-        fetch("https://raw.githubusercontent.com/falconforge-ai/falconforge-codex/main/falconforge-athena-v3_5/canonical/FalconForge_Integrity_Manifest_v3_5.json", MANIFEST_PATH)
-        return main()
+        fetch(CANON_URL + MANIFEST_PATH.name, MANIFEST_PATH)
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)["modules"]
 
-    actual = sha256_file(SCHEMA_PATH)
-    if actual != expected:
+def main(jobs=None, base_dir=None, use_cache=True, strict=False):
+    modules = load_manifest()
+    base_dir = Path(base_dir or SCHEMA_PATH.parent)
+    expected = {}
+    for m in modules:
+        path = SCHEMA_PATH if m["name"] == SCHEMA_PATH.name else base_dir / m["name"]
+        expected[path] = m["sha256"]
+
+    cache = HashCache() if use_cache else None
+    results = list(verify_hashes(expected, jobs=jobs, cache=cache))
+    by_status = {"ok": [], "mismatch": [], "missing": []}
+    for r in results:
+        by_status[r["status"]].append(r["path"])
+
+    failed = False
+    schema = str(SCHEMA_PATH)
+    if schema in by_status["mismatch"]:
+        by_status["mismatch"].remove(schema)
         log(Fore.RED + "❌ Integrity mismatch detected!")
-        fetch("https://raw.githubusercontent.com/falconforge-ai/falconforge-codex/main/falconforge-athena-v3_5/canonical/ATHENA_CAP_SCHEMA_v3_5.json", SCHEMA_PATH)
-        if sha256_file(SCHEMA_PATH) == expected:
+        fetch(CANON_URL + SCHEMA_PATH.name, SCHEMA_PATH)
+        if sha256_file(SCHEMA_PATH) == expected[SCHEMA_PATH].split(":")[-1].lower():
             log(Fore.GREEN + "✅ Self-healing successful — schema replaced.")
         else:
             log(Fore.RED + "❌ Self-healing failed.")
             sys.exit(1)
-    else:
-        log(Fore.GREEN + "✅ Integrity verified — hashes match.")
+    for path in by_status["mismatch"]:
+        log(Fore.RED + f"❌ Hash mismatch: {path}")
+        failed = True
+    for path in by_status["missing"]:
+        log(Fore.YELLOW + f"⚠️ Not in this checkout: {path}")
+        failed = failed or strict or path == schema
 
+    cached = f", {cache.stats['hits']} from cache" if cache else ""
+    summary = f"{len(by_status['ok'])}/{len(results)} manifest modules verified{cached}"
+    if failed:
+        log(Fore.RED + f"❌ Integrity check failed — {summary}.")
+        sys.exit(1)
+    log(Fore.GREEN + f"✅ Integrity verified — hashes match ({summary}).")
+
+    from jsonschema import validate, ValidationError
     try:
         with open(SCHEMA_PATH, "r", encoding="utf-8") as s, open("cap_record.json", "r", encoding="utf-8") as c:
-            schema, cap = json.load(s), json.load(c)
-        validate(instance=cap, schema=schema)
+            schema_doc, cap = json.load(s), json.load(c)
+        validate(instance=cap, schema=schema_doc)
         log(Fore.GREEN + "✅ CAP payload structure valid.")
     except ValidationError as e:
         log(Fore.RED + f"❌ CAP validation failed: {e.message}")
@@ -70,5 +113,10 @@ def main():
     log(Fore.CYAN + "🪶 Log archival complete.")
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Verify every integrity manifest module and the CAP schema.")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="hashing workers (default: one per core)")
+    parser.add_argument("--base-dir", default=None, help="where manifest modules live (default: schemas/)")
+    parser.add_argument("--no-cache", action="store_true", help="re-hash every module")
+    parser.add_argument("--strict", action="store_true", help="fail when a manifest module is missing")
+    args = parser.parse_args()
+    main(args.jobs, args.base_dir, not args.no_cache, args.strict)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+nightly_pipeline.py
+----------------------------------------
+Runs the nightly ledger jobs (validate_cap_payloads, compute_civic_drift,
+notify_missing_signatures, export_dtl and local_integrity_check) as one
+process and one pass over the ledger: records are discovered once, read
+and JSON-parsed once in worker processes, and each parsed record is fanned
+out to the enabled stages.
+
+Stages:
+  integrity   manifest module hashes + cap_record.json (local_integrity_check.py)
+  validate    schema validation of every payload
+  hash        SHA-256 of every record and its hash_prev link
+  drift       civic drift store reloaded from the pass, CCI printed
+  signatures  signature store reloaded from the pass, new gaps alerted on
+  export      Decision Trace Ledger export (only with --export-dir)
+
+jsonschema, requests, colorama and zstandard are imported only by the
+stages that need them. On a segment ledger the drift and signature stores
+keep their own incremental ingest, which only reads appended records.
+Exits 1 if any stage fails.
+
+Usage: nightly_pipeline.py [ledger] [--stages validate,hash,drift,signatures]
+           [--schema FILE] [--validate-format text|json|junit] [--validate-output FILE]
+           [--slack-webhook URL] [--export-dir DIR] [--export-format ndjson]
+           [--export-compress gzip] [--since 2025-01] [--until 2025-03] [--domain D ...]
+           [--jobs N]
+"""
+
+import os, sys, json, time, argparse, hashlib, datetime, contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from hash_engine import parallel_map
+from ledger_archive import ColdTier, iter_hot_files
+from ledger_store import NULL_HASH, SegmentLedger, is_segment_ledger
+
+DEFAULT_SCHEMA = "schemas/ATHENA_CAP_SCHEMA_v3_5.json"
+FEED_BATCH = 1000
+
+# ---------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------
+class Stage:
+    """
+    One consumer of the pass. setup() and check() run in the worker
+    processes (check() gets each record's bytes and parsed JSON, None if it
+    does not parse, and returns something picklable); start(), collect()
+    and finish() run in the parent, in ledger order. Attributes starting
+    with "_" are parent-only and never sent to workers.
+    """
+
+    name = ""
+
+    def __getstate__(self):
+        return {k: v for k, v in self.__dict__.items() if not k.startswith("_")}
+
+    def setup(self):
+        pass
+
+    def check(self, rel, mtime_ns, size, raw, data):
+        return None
+
+    def start(self, ctx):
+        pass
+
+    def collect(self, rel, result):
+        pass
+
+    def finish(self):
+        """Print the stage's outcome; returns its exit code."""
+        return 0
+
+    def abort(self):
+        pass
+
+
+class ValidateStage(Stage):
+    name = "validate"
+
+    def __init__(self, schema_file, fmt="text", output=None):
+        with open(schema_file, "r", encoding="utf-8") as f:
+            self.schema = json.load(f)
+        self.fmt, self.output = fmt, output
+
+    def setup(self):
+        from validate_cap_payloads import compile_schema
+        compile_schema(self.schema)
+
+    def check(self, rel, mtime_ns, size, raw, data):
+        from validate_cap_payloads import validate_record
+        if data is None:
+            return "skipped", "non-JSON file"
+        return validate_record(data)
+
+    def start(self, ctx):
+        from validate_cap_payloads import REPORTERS, compile_schema
+        compile_schema(self.schema)  # fail early on a broken schema
+        self._root = ctx["root"]
+        self._out = open(self.output, "w", encoding="utf-8") if self.output else sys.stdout
+        self._reporter = REPORTERS[self.fmt](self._out, self._root)
+        self._counts = {"total": 0, "valid": 0, "invalid": 0, "skipped": 0}
+
+    def collect(self, rel, result):
+        status, message = result
+        self._counts["total"] += 1
+        self._counts[status] += 1
+        self._reporter.result(os.path.join(self._root, rel), status, message)
+
+    def finish(self):
+        self._reporter.close(self._counts)
+        self.abort()
+        return 1 if self._counts["invalid"] else 0
+
+    def abort(self):
+        if self.output and not self._out.closed:
+            self._out.close()
+
+
+class HashStage(Stage):
+    """Every record's SHA-256, and whether its hash_prev names a record in the ledger."""
+
+    name = "hash"
+
+    def check(self, rel, mtime_ns, size, raw, data):
+        return hashlib.sha256(raw).digest(), _hash_prev(data)
+
+    def start(self, ctx):
+        self._seen, self._wanted = set(), {}
+        self._count = self._starts = 0
+
+    def collect(self, rel, result):
+        digest, hash_prev = result
+        self._count += 1
+        self._seen.add(digest)
+        if hash_prev is None:
+            self._starts += 1
+        elif hash_prev not in self._seen:
+            self._wanted.setdefault(hash_prev, rel)
+
+    def finish(self):
+        dangling = {h: rel for h, rel in self._wanted.items() if h not in self._seen}
+        for h, rel in sorted(dangling.items(), key=lambda kv: kv[1])[:10]:
+            print(f"❌ {rel}: hash_prev SHA256:{h.hex()} matches no record")
+        if dangling:
+            print(f"❌ hash: {len(dangling)} dangling hash_prev link(s) in {self._count} records")
+            return 1
+        print(f"✅ hash: {self._count} records hashed, every hash_prev link resolves "
+              f"({self._starts} chain start(s))")
+        return 0
+
+
+class _StoreStage(Stage):
+    """
+    Reloads an incremental store with the rows its check() builds, in one
+    transaction that commits at finish() and rolls back on abort().
+    """
+
+    feed_rows = True
+
+    def start(self, ctx):
+        self._root, self._jobs = ctx["root"], ctx["jobs"]
+        self.feed_rows = not ctx["segments"]  # set before the workers get a copy
+        self._store = self.open_store()
+        self._stack = contextlib.ExitStack()
+        self._load = self._stack.enter_context(self._store.reloading()) if self.feed_rows else None
+        self._batch = []
+
+    def check(self, rel, mtime_ns, size, raw, data):
+        return None if data is None or not self.feed_rows else self.row(rel, mtime_ns, size, data)
+
+    def collect(self, rel, result):
+        if result is None or self._load is None:
+            return
+        self._batch.append(result)
+        if len(self._batch) == FEED_BATCH:
+            self._load(self._batch)
+            self._batch = []
+
+    def finish(self):
+        try:
+            if self._load is None:
+                self._store.ingest()
+            else:
+                self._load(self._batch)
+                self._stack.close()
+            return self.report(self._store)
+        finally:
+            self._store.close()
+
+    def abort(self):
+        try:
+            self._stack.__exit__(*sys.exc_info())
+        finally:
+            self._store.close()
+
+
+class DriftStage(_StoreStage):
+    name = "drift"
+
+    def row(self, rel, mtime_ns, size, data):
+        from civic_drift import extract_metrics
+        return (rel, mtime_ns, size) + extract_metrics(data)
+
+    def open_store(self):
+        from civic_drift import DriftStore
+        return DriftStore(self._root, jobs=self._jobs)
+
+    def report(self, store):
+        from civic_drift import civic_index
+        from compute_civic_drift import THRESHOLD, _means
+        stats = store.summary()
+        cci, means = civic_index(stats), _means(stats)
+        line = f"HS={means.get('HS', 0)}  ERΔ={means.get('ERD', 0)}  CAI={means.get('CAI', 0)}  CCI={cci}"
+        if cci < THRESHOLD:
+            print(f"❌ drift: {line} (below {THRESHOLD})")
+            return 1
+        print(f"✅ drift: {line}")
+        return 0
+
+
+class SignatureStage(_StoreStage):
+    name = "signatures"
+
+    def __init__(self, webhook_url=None):
+        self.webhook_url = webhook_url
+
+    def row(self, rel, mtime_ns, size, data):
+        from signature_scan import check_record
+        version, gaps = check_record(data)
+        return rel, mtime_ns, size, version, tuple(gaps)
+
+    def open_store(self):
+        from signature_scan import SignatureStore
+        return SignatureStore(self._root, jobs=self._jobs)
+
+    def report(self, store):
+        if self.webhook_url:
+            from notify_missing_signatures import report_gaps
+            outstanding = report_gaps(store, self.webhook_url)
+        else:
+            outstanding = store.outstanding()
+        if outstanding:
+            detail = ", ".join(f"{n} missing {gap}" for gap, n in outstanding.items())
+            print(f"⚠️ signatures: {detail}")
+            return 1
+        print("✅ signatures: all CAP payloads include validator signatures")
+        return 0
+
+
+class ExportStage(Stage):
+    name = "export"
+
+    def __init__(self, output_dir, fmt="bundle", compress="none", since=None, until=None, domains=None):
+        self.output_dir, self.fmt, self.compress = output_dir, fmt, compress
+        self.since, self.until = since, until
+        self.domains = {d.lower() for d in domains} if domains else None
+
+    def check(self, rel, mtime_ns, size, raw, data):
+        from ledger_scan import in_range
+        from export_dtl import render_record
+        if not isinstance(data, dict) or not in_range(data.get("timestamp"), self.since, self.until):
+            return None
+        if self.domains is not None and str(data.get("domain", "")).lower() not in self.domains:
+            return None
+        return render_record(data, self.fmt)
+
+    def start(self, ctx):
+        from export_dtl import ExportWriter, export_name, open_sink
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.datetime.utcnow().isoformat()
+        self._path = os.path.join(self.output_dir, export_name(self.fmt, self.compress, timestamp))
+        self._partial = self._path + ".part"
+        self._out = open_sink(self._partial, self.compress)
+        self._writer = ExportWriter(self._out, self.fmt, timestamp)
+
+    def collect(self, rel, result):
+        if result is not None:
+            self._writer.add(result)
+
+    def finish(self):
+        count = self._writer.close()
+        self._out.close()
+        os.replace(self._partial, self._path)
+        print(f"✅ export: Decision Trace Ledger exported to {self._path} ({count} records)")
+        return 0
+
+    def abort(self):
+        self._out.close()
+        if os.path.exists(self._partial):
+            os.remove(self._partial)
+
+
+def _hash_prev(data):
+    """Digest a record's hash_prev names (None for a chain start or no link)."""
+    if not isinstance(data, dict):
+        return None
+    chain = data.get("governance_chain")
+    value = chain.get("hash_prev") if isinstance(chain, dict) else None
+    if value is None:
+        bridge = (data.get("cap_extensions") or {}).get("bridge_metadata")
+        meta = bridge.get("integrity_meta") if isinstance(bridge, dict) else None
+        value = meta.get("hash_prev") if isinstance(meta, dict) else None
+    if not isinstance(value, str) or not value or value == NULL_HASH:
+        return None
+    try:
+        digest = bytes.fromhex(value.split(":", 1)[-1])
+    except ValueError:
+        return b"\0"  # unparseable: never matches, so it is reported
+    return digest if len(digest) == 32 else b"\0"
+
+# ---------------------------------------------------------------------
+# The pass
+# ---------------------------------------------------------------------
+_root = None
+_stages = ()
+
+def _init_worker(root, stages):
+    global _root, _stages
+    _root, _stages = root, stages
+    for stage in stages:
+        stage.setup()
+
+def process(item):
+    """Read (unless already in memory) and parse one record, then run every stage's check()."""
+    rel, raw = item
+    if raw is None:
+        try:
+            full = os.path.join(_root, rel)
+            st = os.stat(full)
+            with open(full, "rb") as f:
+                raw = f.read()
+            mtime_ns, size = st.st_mtime_ns, st.st_size
+        except OSError:
+            return rel, None
+    else:
+        mtime_ns, size = 0, len(raw)  # archived or segment records (see civic_drift.cold_rows)
+    try:
+        data = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        data = None
+    return rel, tuple(stage.check(rel, mtime_ns, size, raw, data) for stage in _stages)
+
+def discover(root):
+    """(rel, bytes or None) for every record: archived months, then hot files; or a segment ledger's records."""
+    if is_segment_ledger(root):
+        ledger = SegmentLedger(root)
+        for entry in ledger.iter_chain():
+            raw = ledger.read_raw(entry)
+            yield entry.name, raw
+        return
+    cold = ColdTier(root)
+    try:
+        yield from cold.iter_raw()
+    finally:
+        cold.close()
+    root = str(root)
+    for path in iter_hot_files(root):
+        yield os.path.relpath(path, root).replace(os.sep, "/"), None
+
+def run(root, stages, jobs=None):
+    """One pass over the ledger at `root` through `stages`; returns {stage name: exit code}."""
+    root = str(root)
+    ctx = {"root": root, "segments": is_segment_ledger(root), "jobs": jobs}
+    started, codes = [], {}
+    try:
+        for stage in stages:
+            stage.start(ctx)
+            started.append(stage)
+        results = parallel_map(process, discover(root), jobs=jobs, processes=True, chunksize=256,
+                               initializer=_init_worker, initargs=(root, tuple(stages)))
+        for rel, checks in results:
+            if checks is None:
+                continue  # vanished between discovery and read
+            for stage, result in zip(stages, checks):
+                stage.collect(rel, result)
+        for stage in stages:
+            codes[stage.name] = stage.finish()
+    except BaseException:
+        for stage in started:
+            if stage.name not in codes:
+                stage.abort()
+        raise
+    return codes
+
+def run_integrity(jobs=None):
+    """local_integrity_check.py's checks (it exits on failure); returns an exit code."""
+    import local_integrity_check
+    try:
+        local_integrity_check.main(jobs=jobs)
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else 1
+    return 0
+
+# ---------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------
+STAGES = ("integrity", "validate", "hash", "drift", "signatures", "export")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run the nightly ledger jobs in a single pass.")
+    ap.add_argument("ledger", nargs="?", default=os.environ.get("LEDGER_PATH", "CAP_LOGS"))
+    ap.add_argument("--stages", help=f"comma-separated subset of {','.join(STAGES)} "
+                                     "(default: all, export only with --export-dir)")
+    ap.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: one per core)")
+    ap.add_argument("--schema", default=DEFAULT_SCHEMA, help="CAP schema for the validate stage")
+    ap.add_argument("--validate-format", choices=["text", "json", "junit"], default="text")
+    ap.add_argument("--validate-output", help="write validation results here instead of stdout")
+    ap.add_argument("--slack-webhook", default=os.environ.get("SLACK_WEBHOOK_URL"),
+                    help="alert on new signature gaps (default $SLACK_WEBHOOK_URL; none: only report)")
+    ap.add_argument("--export-dir", help="write a Decision Trace Ledger export here (enables the export stage)")
+    ap.add_argument("--export-format", choices=["bundle", "array", "ndjson"], default="bundle")
+    ap.add_argument("--export-compress", choices=["none", "gzip", "zstd"], default="none")
+    ap.add_argument("--since", help="export: earliest timestamp (YYYY, YYYY-MM, YYYY-MM-DD or ISO)")
+    ap.add_argument("--until", help="export: latest timestamp, inclusive")
+    ap.add_argument("--domain", action="append", help="export: only this domain (repeatable)")
+    args = ap.parse_args(argv)
+
+    if args.stages:
+        wanted = [s.strip() for s in args.stages.split(",") if s.strip()]
+        unknown = [s for s in wanted if s not in STAGES]
+        if unknown:
+            ap.error(f"unknown stage(s): {', '.join(unknown)}")
+        if "export" in wanted and not args.export_dir:
+            ap.error("the export stage needs --export-dir")
+    else:
+        wanted = [s for s in STAGES if s != "export" or args.export_dir]
+
+    t0 = time.perf_counter()
+    codes = {}
+    if "integrity" in wanted:
+        codes["integrity"] = run_integrity(args.jobs)
+    stages = []
+    if "validate" in wanted:
+        stages.append(ValidateStage(args.schema, args.validate_format, args.validate_output))
+    if "hash" in wanted:
+        stages.append(HashStage())
+    if "drift" in wanted:
+        stages.append(DriftStage())
+    if "signatures" in wanted:
+        stages.append(SignatureStage(args.slack_webhook))
+    if "export" in wanted:
+        stages.append(ExportStage(args.export_dir, args.export_format, args.export_compress,
+                                  args.since, args.until, args.domain))
+    if stages:
+        codes.update(run(args.ledger, stages, jobs=args.jobs))
+
+    failed = [name for name, code in codes.items() if code]
+    summary = f"{len(codes)} stage(s) in {time.perf_counter() - t0:.1f}s"
+    if failed:
+        print(f"❌ Nightly pipeline: {', '.join(failed)} failed ({summary}).")
+        return 1
+    print(f"✅ Nightly pipeline passed ({summary}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,44 +2,97 @@
 """
 notify_missing_signatures.py
 ----------------------------------------
-Checks CAP payloads for missing ethics/empathy/civic validator signatures
-and sends a single grouped Slack alert if any are missing.
+Checks CAP payloads for missing validator signatures and for sign_cap.js
+ethics signatures ("SHA256:...") that no longer match the payload, and
+sends a single grouped Slack alert for gaps not reported before.
+
+The whole ledger is covered (CAP_LOGS/<year>/<month>, archived months and
+segment ledgers), but only records that are new or changed since the last
+run are parsed: results and report state live in a signature store
+(signature_scan.py). What counts as a gap follows the record's schema:
+v3.4 bridge records need validator_signatures.ethics_signature and
+empathy_signature; v3.5 records need an integrity.signature_status other
+than "unsigned" (and a bridge validation_signature once sealed).
+
+Exits 1 while any record still has a gap, 0 otherwise.
+
+Usage: notify_missing_signatures.py <slack_webhook_url> [--ledger CAP_LOGS]
+           [--rescan] [--rebuild] [--resend] [--dry-run] [--jobs N] [--db PATH]
 """
 
-import os, sys, json, requests
+import os, sys, argparse
+from pathlib import Path
 
-if len(sys.argv) < 2:
-    print("Usage: notify_missing_signatures.py <slack_webhook_url>")
-    sys.exit(1)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from signature_scan import SignatureStore
 
-webhook_url = sys.argv[1]
-payload_dir = "CAP_LOGS"
+DETAIL_LINES = 10
 
-missing = []
 
-for filename in os.listdir(payload_dir):
-    if not filename.endswith(".json"):
-        continue
-    path = os.path.join(payload_dir, filename)
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        validators = data.get("meta", {}).get("validators", {})
-        for field in ["ethics", "empathy", "civic"]:
-            if field not in validators or not validators[field]:
-                missing.append((filename, field))
-    except Exception:
-        continue
-
-if missing:
-    summary = f"⚠️ {len(missing)} CAP payloads missing validator signatures.\n"
-    details = "\n".join([f"- {f} → missing {fld}" for f, fld in missing[:10]])
-    message = {"text": summary + details}
+def format_alert(gaps, outstanding):
+    """Slack message for newly found gaps, grouped by the missing field."""
+    by_gap = {}
+    for path, gap in gaps:
+        by_gap.setdefault(gap, []).append(path)
+    records = len({path for path, _ in gaps})
+    lines = [f"⚠️ {records} CAP payload(s) with new signature gaps."]
+    for gap, paths in sorted(by_gap.items()):
+        lines.append(f"• missing {gap}: {len(paths)} new ({outstanding.get(gap, len(paths))} outstanding)")
+    lines += [f"- {path} → missing {gap}" for path, gap in gaps[:DETAIL_LINES]]
+    if len(gaps) > DETAIL_LINES:
+        lines.append(f"… and {len(gaps) - DETAIL_LINES} more")
+    return {"text": "\n".join(lines)}
+
+def report_gaps(store, webhook_url, resend=False, dry_run=False):
+    """
+    Alert on the store's unreported gaps (every outstanding one with
+    resend=True) and mark them reported once Slack accepted the message.
+    Returns {gap: outstanding count}.
+    """
+    import requests
+    outstanding = store.outstanding()
+    new = store.gaps(new_only=not resend)
+    if not new:
+        return outstanding
+    message = format_alert(new, outstanding)
+    if dry_run:
+        print(message["text"])
+        return outstanding
     try:
-        requests.post(webhook_url, json=message)
-        print("⚠️ Missing signatures reported to Slack.")
+        requests.post(webhook_url, json=message, timeout=10).raise_for_status()
+        store.mark_reported(new)
+        print(f"⚠️ {len(new)} missing signature(s) reported to Slack.")
     except Exception as e:
-        print(f"Slack notification failed: {e}")
-    sys.exit(1)
-else:
-    print("✅ All CAP payloads include validator tri-signatures.")
+        print(f"Slack notification failed: {e}")  # left unreported; retried next run
+    return outstanding
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Alert on CAP payloads with missing validator signatures.")
+    ap.add_argument("webhook_url")
+    ap.add_argument("--ledger", default=os.environ.get("LEDGER_PATH", "CAP_LOGS"),
+                    help="CAP_LOGS tree or segment ledger (default $LEDGER_PATH)")
+    ap.add_argument("--rescan", action="store_true", help="stat every file instead of trusting directory mtimes")
+    ap.add_argument("--rebuild", action="store_true", help="re-check every record (report state is kept)")
+    ap.add_argument("--resend", action="store_true", help="alert on every outstanding gap, not just new ones")
+    ap.add_argument("--dry-run", action="store_true", help="print the alert instead of posting it")
+    ap.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: one per core)")
+    ap.add_argument("--db", help="signature store location (default: $LEDGER_STATE_DIR/signature_scan.sqlite3)")
+    args = ap.parse_args(argv)
+
+    store = SignatureStore(args.ledger, db_path=args.db, jobs=args.jobs)
+    try:
+        checked = store.rebuild() if args.rebuild else store.ingest(rescan=args.rescan)
+        print(f"🔎 {checked} record(s) checked, {len(store.gaps())} new gap(s)")
+        outstanding = report_gaps(store, args.webhook_url, args.resend, args.dry_run)
+    finally:
+        store.close()
+
+    if outstanding:
+        print(f"⚠️ {sum(outstanding.values())} signature gap(s) outstanding.")
+        return 1
+    print("✅ All CAP payloads include validator signatures.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+query_caps.py
+----------------------------------------
+Queries CAP records through the secondary indexes in cap_query.py instead
+of scanning every JSON file: by cap_id, domain, context mode, time range,
+validator status and CAP score thresholds.
+
+The index is synced with the ledger first (only records appended since the
+last sync are read). Results stream as NDJSON, newest first, one page at a
+time; the cursor for the next page is printed to stderr, or use --all to
+follow cursors to the end. --summary prints the indexed fields without
+reading the records themselves.
+
+Example: all Governance CAPs in Advisor mode in May 2025 with hs < 0.8
+  query_caps.py --domain Governance --context-mode Advisor --since 2025-05 --until 2025-05 --metric "hs<0.8"
+
+Usage: query_caps.py [ledger] [--cap-id ID] [--domain D ...] [--context-mode M ...]
+           [--since 2025-05] [--until 2025-05-31] [--validator-ethics compliant]
+           [--validator-empathy aligned] [--status pending] [--metric "hs<0.8" ...]
+           [--limit 100] [--cursor C] [--all] [--order desc|asc] [--summary] [--no-sync]
+"""
+
+import os, sys, json, argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from cap_query import QueryIndex, parse_threshold
+from ledger_store import open_ledger
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Query CAP records through the ledger's secondary indexes.")
+    ap.add_argument("ledger", nargs="?", default=os.environ.get("LEDGER_PATH", "./CAP_LOGS"))
+    ap.add_argument("--cap-id")
+    ap.add_argument("--domain", action="append", help="repeatable; case-insensitive")
+    ap.add_argument("--context-mode", action="append", help="repeatable; case-insensitive")
+    ap.add_argument("--since", help="earliest timestamp (YYYY, YYYY-MM, YYYY-MM-DD or ISO)")
+    ap.add_argument("--until", help="latest timestamp, inclusive (2025-05 means through the end of May)")
+    ap.add_argument("--validator-ethics", action="append")
+    ap.add_argument("--validator-empathy", action="append")
+    ap.add_argument("--status", action="append", help="record status (v3.5: integrity.signature_status)")
+    ap.add_argument("--metric", action="append", default=[], help='score threshold, e.g. "hs<0.8" (repeatable)')
+    ap.add_argument("--limit", type=int, default=100, help="page size (max 1000)")
+    ap.add_argument("--cursor", help="continue from a previous page")
+    ap.add_argument("--all", action="store_true", help="follow cursors through every page")
+    ap.add_argument("--order", choices=["desc", "asc"], default="desc")
+    ap.add_argument("--summary", action="store_true", help="print index rows, not full records")
+    ap.add_argument("--no-sync", action="store_true", help="query the index as it is")
+    ap.add_argument("--db", help="index location (default: $LEDGER_STATE_DIR/cap_query.sqlite3)")
+    args = ap.parse_args(argv)
+
+    try:
+        thresholds = [parse_threshold(m) for m in args.metric]
+    except ValueError as e:
+        ap.error(str(e))
+
+    ledger = open_ledger(args.ledger)
+    index = QueryIndex(db_path=args.db)
+    try:
+        if not args.no_sync:
+            index.sync(ledger)
+        cursor, total = args.cursor, 0
+        while True:
+            try:
+                rows, cursor = index.query(
+                    cap_id=args.cap_id, domains=args.domain, context_modes=args.context_mode,
+                    since=args.since, until=args.until, validator_ethics=args.validator_ethics,
+                    validator_empathy=args.validator_empathy, status=args.status,
+                    thresholds=thresholds, limit=args.limit, cursor=cursor, order=args.order)
+            except ValueError as e:
+                ap.error(str(e))
+            if args.summary:
+                items = rows
+            else:
+                items = (record for _, record in index.records(ledger, rows))
+            for item in items:
+                sys.stdout.write(json.dumps(item) + "\n")
+                total += 1
+            if not cursor or not args.all:
+                break
+    finally:
+        index.close()
+
+    sys.stdout.flush()
+    if cursor:
+        print(f"next cursor: {cursor}", file=sys.stderr)
+    print(f"✅ {total} CAP record(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,7 +6,11 @@ Recalculates the SHA256 hash of a given schema file and updates the
 canonical FalconForge Integrity Manifest. Use only after human approval.
 """
 
-import hashlib, json, sys, os
+import json, sys, os
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from hash_engine import sha256_file
 
 if len(sys.argv) < 3:
     print("Usage: update_manifest_hash.py <schema_file> <manifest_file>")
@@ -15,8 +19,7 @@ if len(sys.argv) < 3:
 schema_file, manifest_file = sys.argv[1], sys.argv[2]
 
 # Compute new SHA256 hash for the schema
-with open(schema_file, "rb") as f:
-    new_hash = hashlib.sha256(f.read()).hexdigest()
+new_hash = sha256_file(schema_file)
 
 # Load manifest and update the hash
 with open(manifest_file, "r+", encoding="utf-8") as f:
@@ -3,38 +3,244 @@
 validate_cap_payloads.py
 ----------------------------------------
 Validates CAP payloads (JSON files) against the canonical schema.
+
+The schema is checked and compiled once per worker process; payloads are
+discovered recursively (CAP_LOGS/<year>/<month>/...) or read from a segment
+ledger (ledger_store.py), screened by a cheap required-field / top-level-type
+pre-check, and only then run through the full validator. Results stream as
+they arrive.
+
+Usage: validate_cap_payloads.py <schema_file> <payload_dir>
+           [--jobs N] [--format text|json|junit] [--output FILE] [--no-fast-path]
 """
 
-import json, os, sys
-from jsonschema import validate, ValidationError
+import json, os, sys, shutil, tempfile, argparse
+from pathlib import Path
+from xml.sax.saxutils import quoteattr, escape
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from hash_engine import parallel_map
+from ledger_archive import ColdTier, iter_hot_files
+from ledger_store import SegmentLedger, is_segment_ledger
+
+JUNIT_SPOOL_BYTES = 8 << 20  # test cases held in memory before the JUnit spool moves to disk
+
+_JSON_TYPES = {
+    "object": dict, "array": list, "string": str, "boolean": bool,
+    "number": (int, float), "integer": int, "null": type(None),
+}
+
+# ---------------------------------------------------------------------
+# Compiled validator (one per worker process)
+# ---------------------------------------------------------------------
+_validator = None
+_precheck = None
+
+def compile_schema(schema, fast_path=True):
+    """Check the schema once and build the reusable validator + pre-check."""
+    global _validator, _precheck
+    from jsonschema.validators import validator_for
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    _validator = cls(schema)
+    _precheck = _build_precheck(schema) if fast_path else None
+
+def _build_precheck(schema):
+    """Required keys, top-level types and additionalProperties, straight from the schema."""
+    required = tuple(schema.get("required", ()))
+    types = {}
+    for name, prop in schema.get("properties", {}).items():
+        t = prop.get("type") if isinstance(prop, dict) else None
+        if isinstance(t, str) and t in _JSON_TYPES:
+            types[name] = (t, _JSON_TYPES[t])
+    closed = schema.get("additionalProperties") is False and "patternProperties" not in schema
+    allowed = frozenset(schema.get("properties", {}))
+    return required, types, closed, allowed
+
+def _precheck_errors(data):
+    required, types, closed, allowed = _precheck
+    if not isinstance(data, dict):
+        return f"{data!r} is not of type 'object'"
+    for key in required:
+        if key not in data:
+            return f"'{key}' is a required property"
+    for key, (tname, pytype) in types.items():
+        value = data.get(key)
+        if key not in data:
+            continue
+        if tname == "integer" and isinstance(value, float) and value.is_integer():
+            continue
+        if not isinstance(value, pytype) or (isinstance(value, bool) and tname in ("number", "integer")):
+            return f"{value!r} is not of type '{tname}'"
+    if closed:
+        extra = [k for k in data if k not in allowed]
+        if extra:
+            return f"Additional properties are not allowed ({', '.join(repr(k) for k in extra)} were unexpected)"
+    return None
+
+def validate_file(item):
+    """
+    `item` is a file path, or a (path, bytes) pair for records read from a
+    segment ledger. Returns (path, status, message); status is
+    valid | invalid | skipped.
+    """
+    path, raw = item if isinstance(item, tuple) else (item, None)
+    try:
+        if raw is None:
+            with open(path, "rb") as f:
+                raw = f.read()
+        data = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        return path, "skipped", "non-JSON file"
+    except OSError as e:
+        return path, "skipped", str(e)
+    return (path,) + validate_record(data)
+
+def validate_record(data):
+    """(status, message) for an already-parsed payload, with the validator compile_schema() built."""
+    from jsonschema.exceptions import best_match
+    if _precheck is not None:
+        message = _precheck_errors(data)
+        if message:
+            return "invalid", message
+    error = best_match(_validator.iter_errors(data))
+    if error is not None:
+        return "invalid", error.message
+    return "valid", None
+
+# ---------------------------------------------------------------------
+# Reporters (stream one result at a time)
+# ---------------------------------------------------------------------
+class TextReporter:
+    def __init__(self, out, root):
+        self.out, self.root = out, root
+
+    def result(self, path, status, message):
+        name = os.path.relpath(path, self.root)
+        if status == "valid":
+            line = f"✅ Valid: {name}"
+        elif status == "invalid":
+            line = f"❌ Invalid: {name} — {message}"
+        else:
+            line = f"⚠️ Skipped non-JSON file: {name}"
+        print(line, file=self.out, flush=True)
+
+    def close(self, counts):
+        if counts["invalid"]:
+            print(f"❌ {counts['invalid']} CAP payloads failed validation.", file=self.out)
+        else:
+            print("✅ All CAP payloads conform to schema.", file=self.out)
 
-if len(sys.argv) < 3:
-    print("Usage: validate_cap_payloads.py <schema_file> <payload_dir>")
-    sys.exit(1)
 
-schema_file, payload_dir = sys.argv[1], sys.argv[2]
+class JsonReporter:
+    """NDJSON: one object per payload, then a {"summary": ...} line."""
 
-with open(schema_file, "r", encoding="utf-8") as f:
-    schema = json.load(f)
+    def __init__(self, out, root):
+        self.out, self.root = out, root
 
-errors = []
-for filename in os.listdir(payload_dir):
-    if not filename.endswith(".json"):
-        continue
-    path = os.path.join(payload_dir, filename)
+    def result(self, path, status, message):
+        rec = {"file": os.path.relpath(path, self.root), "status": status}
+        if message:
+            rec["message"] = message
+        self.out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+    def close(self, counts):
+        self.out.write(json.dumps({"summary": counts}) + "\n")
+
+
+class JUnitReporter:
+    """
+    JUnit XML. <testsuite> needs its counts and <properties> before the
+    test cases, so cases are spooled (to disk past JUNIT_SPOOL_BYTES) and
+    copied out after the header once the run is done.
+    """
+
+    def __init__(self, out, root):
+        self.out, self.root = out, root
+        self.cases = tempfile.SpooledTemporaryFile(max_size=JUNIT_SPOOL_BYTES, mode="w+", encoding="utf-8")
+
+    def result(self, path, status, message):
+        name = quoteattr(os.path.relpath(path, self.root))
+        self.cases.write(f'    <testcase classname="cap_payloads" name={name}>')
+        if status == "invalid":
+            self.cases.write(f"<failure message={quoteattr(message)}>{escape(message)}</failure>")
+        elif status == "skipped":
+            self.cases.write(f"<skipped message={quoteattr(message)}/>")
+        self.cases.write("</testcase>\n")
+
+    def close(self, counts):
+        self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                       f'<testsuites tests="{counts["total"]}" failures="{counts["invalid"]}" errors="0">\n'
+                       f'  <testsuite name="cap_payloads" tests="{counts["total"]}" failures="{counts["invalid"]}"'
+                       f' errors="0" skipped="{counts["skipped"]}">\n'
+                       "    <properties>\n")
+        for key, value in counts.items():
+            self.out.write(f'      <property name="{key}" value="{value}"/>\n')
+        self.out.write("    </properties>\n")
+        self.cases.seek(0)
+        shutil.copyfileobj(self.cases, self.out)
+        self.cases.close()
+        self.out.write("  </testsuite>\n</testsuites>\n")
+
+
+REPORTERS = {"text": TextReporter, "json": JsonReporter, "junit": JUnitReporter}
+
+def iter_payloads(payload_dir):
+    """
+    File paths under a CAP_LOGS-style tree (plus (name, bytes) pairs for
+    archived months), or (name, bytes) pairs from a segment ledger.
+    """
+    if not is_segment_ledger(payload_dir):
+        cold = ColdTier(payload_dir)
+        try:
+            for name, raw in cold.iter_raw():
+                yield os.path.join(payload_dir, name), raw
+        finally:
+            cold.close()
+        yield from iter_hot_files(payload_dir)
+        return
+    ledger = SegmentLedger(payload_dir)
+    for entry in ledger.iter_chain():
+        raw = ledger.read_raw(entry)
+        yield os.path.join(payload_dir, entry.name), raw
+
+# ---------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate CAP payloads against the canonical schema.")
+    parser.add_argument("schema_file")
+    parser.add_argument("payload_dir")
+    parser.add_argument("--jobs", "-j", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("--format", choices=sorted(REPORTERS), default="text")
+    parser.add_argument("--output", "-o", help="write results here instead of stdout")
+    parser.add_argument("--no-fast-path", action="store_true", help="skip the required-field/type pre-check")
+    args = parser.parse_args(argv)
+
+    with open(args.schema_file, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    fast_path = not args.no_fast_path
+    compile_schema(schema, fast_path)  # fail early on a broken schema
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    reporter = REPORTERS[args.format](out, args.payload_dir)
+    counts = {"total": 0, "valid": 0, "invalid": 0, "skipped": 0}
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        validate(instance=data, schema=schema)
-        print(f"✅ Valid: {filename}")
-    except ValidationError as e:
-        print(f"❌ Invalid: {filename} — {e.message}")
-        errors.append(filename)
-    except json.JSONDecodeError:
-        print(f"⚠️ Skipped non-JSON file: {filename}")
-
-if errors:
-    print(f"❌ {len(errors)} CAP payloads failed validation.")
-    sys.exit(1)
-else:
-    print("✅ All CAP payloads conform to schema.")
+        results = parallel_map(validate_file, iter_payloads(args.payload_dir), jobs=args.jobs,
+                               processes=True, chunksize=256,
+                               initializer=compile_schema, initargs=(schema, fast_path))
+        for path, status, message in results:
+            counts["total"] += 1
+            counts[status] += 1
+            reporter.result(path, status, message)
+        reporter.close(counts)
+    finally:
+        if args.output:
+            out.close()
+
+    return 1 if counts["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+verify_merkle_proof.py
+----------------------------------------
+Offline check of the Merkle proofs served by the bridge (/merkle/proof/...).
+Needs no access to the ledger: O(log N) hashes per proof.
+
+  inclusion    the record (or leaf hash) sits at leaf_index of the tree
+               with root_hash. --record recomputes the leaf from a CAP file.
+  consistency  the tree of size `second` is an append-only extension of the
+               tree of size `first`. --trusted-root pins the earlier root you
+               already hold.
+
+With --key (or MERKLE_SIGNING_KEY) the signed tree head in the proof is
+checked too.
+
+Usage: verify_merkle_proof.py inclusion <proof.json> [--record cap.json] [--key KEY]
+       verify_merkle_proof.py consistency <proof.json> [--trusted-root HEX] [--key KEY]
+"""
+
+import os, sys, json, argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from merkle_log import leaf_hash, record_digest, verify_inclusion, verify_consistency, verify_tree_head
+
+
+def check_head(proof, root_hex, size, key):
+    head = proof.get("tree_head")
+    if not key:
+        return True
+    if not head:
+        print("⚠️ Proof carries no signed tree head; signature not checked.")
+        return True
+    if head["tree_size"] != size or head["root_hash"] != root_hex:
+        print("❌ Signed tree head does not match the proof's tree.")
+        return False
+    if not verify_tree_head(head, key):
+        print("❌ Tree head signature is invalid.")
+        return False
+    print(f"✅ Tree head signature valid (size {size}, signed {head['timestamp']}).")
+    return True
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Verify a CAP ledger Merkle proof offline.")
+    ap.add_argument("kind", choices=["inclusion", "consistency"])
+    ap.add_argument("proof", help="proof JSON as returned by the bridge ('-' for stdin)")
+    ap.add_argument("--record", help="CAP record file to recompute the leaf hash from (inclusion)")
+    ap.add_argument("--trusted-root", help="previously trusted root hash for tree `first` (consistency)")
+    ap.add_argument("--key", default=os.environ.get("MERKLE_SIGNING_KEY", ""), help="tree head signing key")
+    args = ap.parse_args(argv)
+
+    f = sys.stdin if args.proof == "-" else open(args.proof, "r", encoding="utf-8")
+    with f:
+        proof = json.load(f)
+
+    if args.kind == "inclusion":
+        if args.record:
+            with open(args.record, "r", encoding="utf-8") as rf:
+                leaf = leaf_hash(record_digest(json.load(rf)))
+            if leaf.hex() != proof.get("leaf_hash", leaf.hex()):
+                print("❌ Record does not hash to the proof's leaf_hash.")
+                return 1
+        else:
+            leaf = bytes.fromhex(proof["leaf_hash"])
+        ok = verify_inclusion(leaf, proof["leaf_index"], proof["tree_size"],
+                              [bytes.fromhex(h) for h in proof["audit_path"]], bytes.fromhex(proof["root_hash"]))
+        if not ok:
+            print(f"❌ Inclusion proof for leaf {proof['leaf_index']} does not verify.")
+            return 1
+        print(f"✅ Leaf {proof['leaf_index']} ({proof.get('cap_id')}) is included in tree "
+              f"{proof['tree_size']} with root {proof['root_hash']}.")
+        return 0 if check_head(proof, proof["root_hash"], proof["tree_size"], args.key) else 1
+
+    if args.trusted_root and args.trusted_root.lower() != proof["first_root"]:
+        print("❌ first_root differs from the trusted root.")
+        return 1
+    ok = verify_consistency(proof["first"], proof["second"], bytes.fromhex(proof["first_root"]),
+                            bytes.fromhex(proof["second_root"]), [bytes.fromhex(h) for h in proof["proof"]])
+    if not ok:
+        print(f"❌ Tree {proof['second']} is not a consistent extension of tree {proof['first']}.")
+        return 1
+    print(f"✅ Tree {proof['second']} extends tree {proof['first']} append-only.")
+    return 0 if check_head(proof, proof["second_root"], proof["second"], args.key) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
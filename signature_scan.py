@@ -0,0 +1,379 @@
+# signature_scan.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Incremental missing-signature scan. Remembers every record's
+#          signature gaps and which of them were already alerted on, so each
+#          run only parses new or changed records and only reports new gaps.
+#
+# Usage:
+#   python signature_scan.py scan <payload_dir>      # ingest and list outstanding gaps
+#   python signature_scan.py rebuild <payload_dir>   # re-check every record
+
+import os, json, sqlite3, argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from hash_engine import parallel_map
+from ledger_index import LEDGER_STATE_DIR
+from ledger_archive import COLD_DIR, ColdTier, iter_hot_files
+from ledger_scan import changed_dirs
+from ledger_store import is_segment_ledger
+from canonical_json import verify_ethics_signature
+
+REBUILD_BATCH = 50000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    path      TEXT PRIMARY KEY,          -- relative to the payload root
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    version   TEXT NOT NULL              -- 'v3.4' (bridge records) or 'v3.5'
+);
+CREATE TABLE IF NOT EXISTS gaps (
+    path         TEXT NOT NULL,
+    gap          TEXT NOT NULL,          -- the missing or invalid signature field
+    reported_at  TEXT,                   -- NULL until an alert went out
+    PRIMARY KEY (path, gap)
+);
+CREATE INDEX IF NOT EXISTS gaps_unreported ON gaps (path) WHERE reported_at IS NULL;
+CREATE TABLE IF NOT EXISTS dirs (
+    path      TEXT PRIMARY KEY,
+    mtime_ns  INTEGER NOT NULL
+);
+"""
+
+# ---------------------------------------------------------------------
+# Checking one record
+# ---------------------------------------------------------------------
+def schema_version(data):
+    """'v3.5' for schema-conformant records (integrity block), else 'v3.4' (bridge.py / sign_cap.js)."""
+    return "v3.5" if isinstance(data.get("integrity"), dict) else "v3.4"
+
+def check_record(data):
+    """(version, [gaps]) for one CAP record, using the signature fields its schema version carries."""
+    version = schema_version(data)
+    gaps = []
+    signatures = data.get("validator_signatures")
+    signatures = signatures if isinstance(signatures, dict) else {}
+    if version == "v3.5":
+        status = data["integrity"].get("signature_status")
+        if not status or status == "unsigned":
+            gaps.append("integrity.signature_status")
+        elif status in ("sealed", "validated"):
+            bridge = (data.get("cap_extensions") or {}).get("bridge_metadata")
+            if not isinstance(bridge, dict) or not bridge.get("validation_signature"):
+                gaps.append("bridge_metadata.validation_signature")
+    else:
+        for field in ("ethics_signature", "empathy_signature"):
+            if not signatures.get(field):
+                gaps.append(field)
+    signature = signatures.get("ethics_signature")
+    if isinstance(signature, str) and signature.startswith("SHA256:") and not verify_ethics_signature(data):
+        gaps.append("valid ethics_signature")
+    return version, gaps
+
+def _row(rel, mtime_ns, size, raw):
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    version, gaps = check_record(data)
+    return rel, mtime_ns, size, version, tuple(gaps)
+
+def scan_record(job):
+    """(rel, mtime_ns, size, version, gaps) for one CAP file, or None if unreadable (runs in workers)."""
+    root, rel = job
+    full = os.path.join(root, rel)
+    try:
+        st = os.stat(full)
+        with open(full, "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    return _row(rel, st.st_mtime_ns, st.st_size, raw)
+
+def cold_rows(archive):
+    """scan_record()-shaped rows for one cold archive (keyed by each record's original path)."""
+    for i in range(archive.count):
+        raw = archive.read_raw(i)
+        row = _row(archive.entry(i).path, 0, len(raw), raw)
+        if row is not None:
+            yield row
+
+# ---------------------------------------------------------------------
+# Signature store
+# ---------------------------------------------------------------------
+class SignatureStore:
+    """
+    SQLite store of each record's signature gaps and whether they were
+    alerted on. ingest() re-checks only records in directories whose mtime
+    moved (on a segment ledger, only records appended since the last run);
+    a gap that is fixed drops out, and comes back unreported if it reappears.
+    Archived months (ledger_archive.py) keep their rows and report state.
+    """
+
+    def __init__(self, payload_dir, db_path=None, jobs=None):
+        self.root = Path(payload_dir)
+        self.jobs = jobs
+        self.db_path = Path(db_path or Path(LEDGER_STATE_DIR) / "signature_scan.sqlite3")
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    # -----------------------------------------------------------------
+    # Ingest
+    # -----------------------------------------------------------------
+    def ingest(self, rescan=False):
+        """Re-check new and changed records and drop deleted ones; returns the number of changes."""
+        if self._meta("root") != str(self.root.resolve()):
+            return self.rebuild()
+        if is_segment_ledger(self.root):
+            return self._ingest_segments()
+        stored_dirs, stored_cold = {}, {}
+        for d, mtime_ns in self._db.execute("SELECT path, mtime_ns FROM dirs"):
+            (stored_cold if d.startswith(COLD_DIR + "/") else stored_dirs)[d] = mtime_ns
+        changed, seen = changed_dirs(self.root, {} if rescan else stored_dirs)
+        vanished = [d for d in stored_dirs if d not in seen]
+        cold = ColdTier(self.root)
+        archived = cold.months()
+        cold_now = {f"{COLD_DIR}/{a.name}": (a, os.stat(a.path).st_mtime_ns) for a in cold.archives()}
+        cold_new = [k for k, (_, m) in cold_now.items() if stored_cold.get(k) != m]
+        cold_gone = [k for k in stored_cold if k not in cold_now]
+        if not changed and not vanished and not cold_new and not cold_gone:
+            cold.close()
+            return 0
+
+        stale, todo = [], []
+        for k in cold_gone:
+            stale += self._indexed_in(k[len(COLD_DIR) + 1:-len(".capa")].replace("-", "/"))
+        for d, _, on_disk in changed:
+            if d in archived:
+                continue  # hot leftovers of an interrupted archival: the archive is authoritative
+            indexed = self._indexed_in(d)
+            for rel in on_disk:
+                try:
+                    st = os.stat(self.root / rel)
+                except FileNotFoundError:
+                    continue
+                if indexed.pop(rel, None) != (st.st_mtime_ns, st.st_size):
+                    todo.append(rel)
+            stale += indexed  # listed in the store but no longer on disk
+        for d in vanished:
+            if d not in archived:
+                stale += self._indexed_in(d)
+
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for rel in stale:
+                self._forget(rel)
+            root = str(self.root)
+            for rel, row in zip(todo, parallel_map(scan_record, [(root, r) for r in todo], jobs=self.jobs,
+                                                   processes=True, chunksize=256)):
+                if row is None:
+                    self._forget(rel)
+                else:
+                    self._update(row)
+            for k in cold_new:
+                for row in cold_rows(cold_now[k][0]):
+                    self._update(row)
+                    todo.append(row[0])
+            for d, mtime_ns, _ in changed:
+                self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (d, mtime_ns))
+            for k in cold_new:
+                self._db.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?)", (k, cold_now[k][1]))
+            for d in vanished + cold_gone:
+                self._db.execute("DELETE FROM dirs WHERE path = ?", (d,))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        finally:
+            cold.close()
+        return len(stale) + len(todo)
+
+    def rebuild(self):
+        """Re-check every record in parallel. Report state survives for gaps that are still there."""
+        if is_segment_ledger(self.root):
+            with self._replacing():
+                return self._load_segments(after_position=0)
+        root = str(self.root)
+        rels = (os.path.relpath(p, root).replace(os.sep, "/") for p in iter_hot_files(root))
+        cold = ColdTier(self.root)
+        try:
+            with self.reloading() as load:
+                count = load(r for r in parallel_map(scan_record, ((root, rel) for rel in rels), jobs=self.jobs,
+                                                     processes=True, chunksize=256) if r is not None)
+                for archive in cold.archives():
+                    count += load(cold_rows(archive))
+        finally:
+            cold.close()
+        return count
+
+    @contextmanager
+    def reloading(self):
+        """
+        Replace every record, in one transaction, with the rows passed to the
+        yielded load(rows) (scan_record()-shaped, archived records included;
+        call it any number of times). Files ledgers only; used by rebuild()
+        and by scripts/nightly_pipeline.py, which pushes rows it already parsed.
+        """
+        # Snapshot directories first: files written during the load show up as changes.
+        changed, _ = changed_dirs(self.root, {})
+        cold = ColdTier(self.root)
+        archives = [(f"{COLD_DIR}/{a.name}", os.stat(a.path).st_mtime_ns) for a in cold.archives()]
+        cold.close()
+        with self._replacing():
+            yield self._load_rows
+            self._db.executemany("INSERT INTO dirs VALUES (?, ?)", archives)
+            self._db.executemany("INSERT INTO dirs VALUES (?, ?)", ((d, m) for d, m, _ in changed))
+
+    @contextmanager
+    def _replacing(self):
+        """Transaction that empties the store and restores report state of the gaps reloaded into it."""
+        same_root = self._meta("root") == str(self.root.resolve())
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            reported = {}
+            if same_root:
+                reported = {(p, g): at for p, g, at in self._db.execute(
+                    "SELECT path, gap, reported_at FROM gaps WHERE reported_at IS NOT NULL")}
+            for table in ("records", "gaps", "dirs", "meta"):
+                self._db.execute(f"DELETE FROM {table}")
+            yield
+            self._db.executemany("UPDATE gaps SET reported_at = ? WHERE path = ? AND gap = ?",
+                                 ((at, p, g) for (p, g), at in reported.items()))
+            self._db.execute("INSERT INTO meta VALUES ('root', ?)", (str(self.root.resolve()),))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _ingest_segments(self):
+        """Segment records are immutable: check the ones after the last record checked."""
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            count = self._load_segments(after_position=int(self._meta("position") or 0))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return count
+
+    def _load_segments(self, after_position):
+        from ledger_store import SegmentLedger
+        ledger = SegmentLedger(self.root)
+        last = after_position
+
+        def rows():
+            nonlocal last
+            for entry in ledger.iter_chain(after_position=after_position):
+                last = entry.position
+                raw = ledger.read_raw(entry)  # also fills in entry.name
+                row = _row(entry.name, 0, entry.length, raw)
+                if row is not None:
+                    yield row
+
+        count = self._load_rows(rows())
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('position', ?)", (str(last),))
+        return count
+
+    def _load_rows(self, rows):
+        count, batch = 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == REBUILD_BATCH:
+                count += self._load_batch(batch)
+                batch = []
+        return count + self._load_batch(batch)
+
+    def _load_batch(self, batch):
+        if not batch:
+            return 0
+        self._db.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", (r[:4] for r in batch))
+        self._db.executemany("INSERT OR IGNORE INTO gaps (path, gap) VALUES (?, ?)",
+                             ((r[0], gap) for r in batch for gap in r[4]))
+        return len(batch)
+
+    def _update(self, row):
+        """Store a re-checked record, keeping the report state of gaps it still has."""
+        rel, gaps = row[0], row[4]
+        self._db.execute("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", row[:4])
+        if gaps:
+            self._db.execute("DELETE FROM gaps WHERE path = ? AND gap NOT IN (%s)" % ",".join("?" * len(gaps)),
+                             (rel,) + gaps)
+            self._db.executemany("INSERT OR IGNORE INTO gaps (path, gap) VALUES (?, ?)",
+                                 ((rel, gap) for gap in gaps))
+        else:
+            self._db.execute("DELETE FROM gaps WHERE path = ?", (rel,))
+
+    def _forget(self, rel):
+        self._db.execute("DELETE FROM records WHERE path = ?", (rel,))
+        self._db.execute("DELETE FROM gaps WHERE path = ?", (rel,))
+
+    # -----------------------------------------------------------------
+    # Reporting
+    # -----------------------------------------------------------------
+    def gaps(self, new_only=True):
+        """[(path, gap)] in path order: only those not alerted on yet, or every outstanding one."""
+        where = " WHERE reported_at IS NULL" if new_only else ""
+        return list(self._db.execute(f"SELECT path, gap FROM gaps{where} ORDER BY path, gap"))
+
+    def outstanding(self):
+        """{gap: count} over every record that still has gaps, reported or not."""
+        return dict(self._db.execute("SELECT gap, COUNT(*) FROM gaps GROUP BY gap ORDER BY gap"))
+
+    def mark_reported(self, gaps, when=None):
+        when = when or datetime.now(timezone.utc).isoformat()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.executemany("UPDATE gaps SET reported_at = ? WHERE path = ? AND gap = ?",
+                                 ((when, path, gap) for path, gap in gaps))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def count(self):
+        return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    # -----------------------------------------------------------------
+    # Internals
+    # -----------------------------------------------------------------
+    def _meta(self, key):
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _indexed_in(self, d):
+        """{path: (mtime_ns, size)} for stored records directly inside directory `d`."""
+        prefix = "" if d == "." else d + "/"
+        like = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return {r[0]: (r[1], r[2]) for r in self._db.execute(
+            "SELECT path, mtime_ns, size FROM records WHERE path LIKE ? ESCAPE '\\' "
+            "AND path NOT LIKE ? ESCAPE '\\'", (like + "%", like + "%/%"))}
+
+# ---------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the missing-signature store.")
+    parser.add_argument("cmd", choices=["scan", "rebuild"])
+    parser.add_argument("payload_dir", nargs="?", default=os.environ.get("LEDGER_PATH", "./CAP_LOGS"))
+    parser.add_argument("--jobs", "-j", type=int, default=None)
+    args = parser.parse_args()
+
+    store = SignatureStore(args.payload_dir, jobs=args.jobs)
+    changes = store.rebuild() if args.cmd == "rebuild" else store.ingest()
+    for gap, n in store.outstanding().items():
+        print(f"⚠️ {n} record(s) missing {gap}")
+    print(f"✅ {changes} record(s) checked, {store.count()} tracked")
+    store.close()
@@ -0,0 +1,449 @@
+# telemetry.py
+# Athena CAP Ledger – FalconForgeAI Implementation
+# Purpose: Dependency-free Prometheus metrics (counters, gauges, histograms in
+#          the text exposition format) and opt-in, sampled per-request span
+#          timing, shared by app.py and bridge.py.
+#
+# Metrics are per process: with several gunicorn/uvicorn workers each one
+# reports its own series (scrape them individually, or run one worker).
+#
+# Tracing is off unless TRACE_SAMPLE_RATE (0..1) is set. TRACE_CONTROL_FILE,
+# if set, names a file holding the rate; it is re-read when it changes, so
+# sampling can be turned up or down in production without a restart. With
+# TRACE_FORCE_TOKEN set, a request carrying "X-Athena-Trace: <token>" is
+# always traced. Traced responses carry a Server-Timing header, print one
+# [TRACE] line and are kept in a small per-process ring (recent_traces()).
+
+import os, json, time, random, bisect, threading, contextvars
+from collections import deque
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")  # optional bearer token for /metrics
+
+# ---------------------------------------------------------------------
+# Metric types
+# ---------------------------------------------------------------------
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+        self.fn = fn  # optional scrape-time callback: a number, or {label tuple: number}
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _label_text(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in pairs) + "}"
+
+    def samples(self):
+        if self.fn is not None:
+            return self._callback_samples()
+        with self._lock:
+            return [(self.name, self._label_text(k), v) for k, v in sorted(self._values.items())]
+
+    def _callback_samples(self):
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"[WARN] Metric {self.name} callback failed: {e}")
+            return []
+        if not isinstance(value, dict):
+            return [(self.name, "", value)] if value is not None else []
+        return [(self.name, self._label_text(tuple(map(str, k))), v) for k, v in sorted(value.items())]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += [f"{name}{labels} {_number(value)}" for name, labels, value in self.samples()]
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonic count; inc(amount, **labels)."""
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Point-in-time value; set() directly or read from a callback at scrape time."""
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution (cumulative buckets, _sum and _count on render)."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                running += n
+                out.append((self.name + "_bucket", self._label_text(key, ("le", _number(bound))), running))
+            out.append((self.name + "_sum", self._label_text(key), total))
+            out.append((self.name + "_count", self._label_text(key), count))
+        return out
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value)) if value else "0"
+    return repr(value) if isinstance(value, float) else str(value)
+
+# ---------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labels=(), fn=None):
+        return self._bind(self._add(Counter(name, help_text, labels)), fn)
+
+    def gauge(self, name, help_text, labels=(), fn=None):
+        return self._bind(self._add(Gauge(name, help_text, labels)), fn)
+
+    @staticmethod
+    def _bind(metric, fn):
+        if fn is not None:
+            metric.fn = fn  # re-registering (e.g. a reloaded app) rebinds the callback
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+# Shared metric families (labels keep cardinality bounded: route templates, not URLs)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "athena_http_request_duration_seconds", "HTTP request latency by route.",
+    ("app", "method", "route", "status"))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "athena_http_requests_in_flight", "Requests currently being served.", ("app",))
+GITHUB_REQUEST_SECONDS = REGISTRY.histogram(
+    "athena_github_request_duration_seconds", "Outbound GitHub API call latency by call and status.",
+    ("call", "status"))
+LEDGER_OP_SECONDS = REGISTRY.histogram(
+    "athena_ledger_operation_duration_seconds",
+    "Ledger hot-path durations (index sync/rebuild, hashing, verification, appends, JSON parsing).",
+    ("op",))
+CACHE_REQUESTS = REGISTRY.counter(
+    "athena_cache_requests_total", "Cache lookups by cache and result (hit / miss).", ("cache", "result"))
+PROCESS_START = REGISTRY.gauge(
+    "athena_process_start_time_seconds", "Unix time this worker process started.")
+PROCESS_START.set(time.time())
+
+def cache_result(cache, hit, n=1):
+    if n:
+        CACHE_REQUESTS.inc(n, cache=cache, result="hit" if hit else "miss")
+
+def authorized(authorization_header):
+    """True if /metrics may be served for this Authorization header value."""
+    return not METRICS_TOKEN or authorization_header == f"Bearer {METRICS_TOKEN}"
+
+# ---------------------------------------------------------------------
+# Tracing
+# ---------------------------------------------------------------------
+_current = contextvars.ContextVar("athena_trace", default=None)
+
+
+class Trace:
+    """Spans recorded while serving one sampled request."""
+
+    __slots__ = ("name", "start", "wall", "spans")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.wall = time.time()
+        self.spans = []
+
+    def add(self, name, t0, t1):
+        self.spans.append((name, t0 - self.start, t1 - t0))
+
+    def server_timing(self, total=None):
+        parts = [f"{_token(n)};dur={d * 1000:.2f}" for n, _, d in self.spans[:30]]
+        if total is not None:
+            parts.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(parts)
+
+    def as_dict(self, total=None, status=None):
+        return {"name": self.name, "timestamp": self.wall, "status": status,
+                "total_ms": round(total * 1000, 3) if total is not None else None,
+                "spans": [{"name": n, "start_ms": round(s * 1000, 3), "duration_ms": round(d * 1000, 3)}
+                          for n, s, d in self.spans]}
+
+
+def _token(name):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name) or "span"
+
+
+class Tracer:
+    """Decides which requests to trace and keeps the most recent traces."""
+
+    def __init__(self, sample_rate=None, control_file=None, force_token=None, keep=100):
+        self.sample_rate = float(sample_rate if sample_rate is not None
+                                 else os.environ.get("TRACE_SAMPLE_RATE", "0") or 0)
+        self.control_file = control_file or os.environ.get("TRACE_CONTROL_FILE")
+        self.force_token = force_token or os.environ.get("TRACE_FORCE_TOKEN")
+        self.recent = deque(maxlen=keep)
+        self._control_stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def rate(self):
+        """Current sample rate, re-reading the control file at most once a second."""
+        if self.control_file:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + 1.0
+                self._reload()
+        return self.sample_rate
+
+    def _reload(self):
+        try:
+            st = os.stat(self.control_file)
+        except OSError:
+            return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._control_stamp:
+            return
+        self._control_stamp = stamp
+        try:
+            with open(self.control_file, "r", encoding="utf-8") as f:
+                self.sample_rate = min(1.0, max(0.0, float(f.read().strip() or 0)))
+            print(f"[TRACE] Sample rate set to {self.sample_rate} from {self.control_file}")
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Ignoring trace control file {self.control_file}: {e}")
+
+    def start(self, name, force_header=None):
+        """Begin a trace for this request if sampled (or forced); returns a reset token or None."""
+        forced = bool(self.force_token) and force_header == self.force_token
+        rate = self.rate()
+        if not forced and (rate <= 0 or random.random() >= rate):
+            return None
+        return _current.set(Trace(name))
+
+    def finish(self, token, status=None):
+        """End the trace started by start(); returns (trace, total seconds)."""
+        trace = _current.get()
+        _current.reset(token)
+        if trace is None:
+            return None, None
+        total = time.perf_counter() - trace.start
+        record = trace.as_dict(total, status)
+        with self._lock:
+            self.recent.append(record)
+        print(f"[TRACE] {json.dumps(record, separators=(',', ':'))}")
+        return trace, total
+
+    def recent_traces(self, limit=20):
+        with self._lock:
+            return list(self.recent)[-limit:][::-1]
+
+
+tracer = Tracer()
+
+def current_trace():
+    return _current.get()
+
+@contextmanager
+def span(name):
+    """Record a span on the current trace (no-op when the request is not traced)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, t0, time.perf_counter())
+
+@contextmanager
+def timed(op):
+    """Time a ledger hot-path operation: always into the histogram, and as a span if traced."""
+    trace = _current.get()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t1 = time.perf_counter()
+        LEDGER_OP_SECONDS.observe(t1 - t0, op=op)
+        if trace is not None:
+            trace.add(op, t0, t1)
+
+
+class _Call:
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = "error"
+
+
+@contextmanager
+def github_call(call):
+    """
+    Time an outbound GitHub request; set .status on the yielded object to the
+    HTTP status. Exceptions are recorded with status="error".
+    """
+    result = _Call()
+    trace = _current.get()
+    t0 = time.perf_counter()
+    try:
+        yield result
+    finally:
+        t1 = time.perf_counter()
+        GITHUB_REQUEST_SECONDS.observe(t1 - t0, call=call, status=result.status)
+        if trace is not None:
+            trace.add(f"github.{call}", t0, t1)
+
+# ---------------------------------------------------------------------
+# Framework hooks
+# ---------------------------------------------------------------------
+def instrument_flask(flask_app, app_name):
+    """Per-route latency, in-flight gauge and sampled tracing for a Flask app."""
+    from flask import g, request
+
+    @flask_app.before_request
+    def _telemetry_start():
+        g._telemetry = (time.perf_counter(), tracer.start(request.path, request.headers.get("X-Athena-Trace")))
+        HTTP_IN_FLIGHT.inc(app=app_name)
+
+    @flask_app.after_request
+    def _telemetry_finish(response):
+        state = g.pop("_telemetry", None)
+        if state is None:
+            return response
+        t0, token = state
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        if token is not None:
+            trace, total = tracer.finish(token, response.status_code)
+            response.headers["Server-Timing"] = trace.server_timing(total)
+        HTTP_IN_FLIGHT.dec(app=app_name)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - t0, app=app_name, method=request.method,
+                                     route=route, status=response.status_code)
+        return response
+
+    @flask_app.teardown_request
+    def _telemetry_teardown(exc):
+        state = g.pop("_telemetry", None)  # only left over if after_request never ran
+        if state is not None:
+            HTTP_IN_FLIGHT.dec(app=app_name)
+            if state[1] is not None:
+                tracer.finish(state[1], 500)
+
+
+class ASGIMetricsMiddleware:
+    """Per-route latency, in-flight gauge and sampled tracing for an ASGI (FastAPI) app."""
+
+    def __init__(self, app, app_name):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or ())
+        force = headers.get(b"x-athena-trace")
+        t0 = time.perf_counter()
+        token = tracer.start(scope.get("path", ""), force.decode("latin-1") if force else None)
+        trace = _current.get() if token is not None else None
+        state = {"status": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                if trace is not None:
+                    message = dict(message, headers=list(message.get("headers", [])) + [
+                        (b"server-timing", trace.server_timing(time.perf_counter() - t0).encode("latin-1"))])
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(app=self.app_name)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec(app=self.app_name)
+            route = scope.get("route")
+            route = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - t0, app=self.app_name,
+                                         method=scope.get("method", ""), route=route,
+                                         status=state["status"])
+            if token is not None:
+                tracer.finish(token, state["status"])